@@ -1,6 +1,6 @@
-from sentence_transformers import SentenceTransformer, util
+import hashlib
 import json
-from Attack.key_word_v2 import ToolSemanticProcessor
+import numpy as np
 
 PURPLE = "\033[35m"
 CYAN = "\033[36m"
@@ -11,36 +11,112 @@ WHITE = "\033[97m"
 RESET = "\033[0m"
 
 
-def expand_similar_tools(tool_datas, embeddings, start_index, threshold):
-    queue = [start_index]
-    visited = set([start_index])
-
-    while queue:
-        idx = queue.pop(0)
-        for j in range(len(tool_datas)):
-            if j not in visited:
-                sim = float(util.cos_sim(embeddings[idx], embeddings[j]))
-                if sim >= threshold:
-                    visited.add(j)
-                    queue.append(j)
-    return visited
-
-def Relevant_Tool_Selection(target_tool_name, tool_datas, threshold):
-    model_name = "sentence-transformers/all-mpnet-base-v2"
-    model = SentenceTransformer(model_name)
-
-    # Encode all descriptions
+DEFAULT_TOOL_MODEL = "sentence-transformers/all-mpnet-base-v2"
+
+# 进程级缓存：工具描述向量按 (模型, 描述内容哈希) 缓存
+_EMBEDDING_CACHE = {}
+_ADJACENCY_CACHE = {}
+_EMBEDDING_CACHE_SIZE = 8
+
+
+def get_sentence_model(model_name=DEFAULT_TOOL_MODEL):
+    # 与工具共用进程级资源池（tools.registry），同名模型只加载一次
+    from tools.registry import shared_sentence_model
+    return shared_sentence_model(model_name)
+
+
+def _descriptions_key(model_name, descriptions):
+    h = hashlib.sha1(model_name.encode("utf-8"))
+    for d in descriptions:
+        h.update(b"\x00")
+        h.update(str(d).encode("utf-8"))
+    return h.hexdigest()
+
+
+def encode_tool_descriptions(tool_datas, model_name=DEFAULT_TOOL_MODEL):
+    """
+    编码全部工具描述，返回 (cache_key, L2 归一化的 float32 矩阵 [T, D])。
+    归一化后余弦相似度即为点积。
+    """
     descriptions = [t["description"] for t in tool_datas]
-    embeddings = model.encode(descriptions, convert_to_tensor=True)
+    key = _descriptions_key(model_name, descriptions)
+    embeddings = _EMBEDDING_CACHE.get(key)
+    if embeddings is None:
+        model = get_sentence_model(model_name)
+        embeddings = model.encode(descriptions, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+        if len(_EMBEDDING_CACHE) >= _EMBEDDING_CACHE_SIZE:
+            _EMBEDDING_CACHE.pop(next(iter(_EMBEDDING_CACHE)))
+        _EMBEDDING_CACHE[key] = embeddings
+    return key, embeddings
+
+
+def _to_normalized_numpy(embeddings):
+    if hasattr(embeddings, "detach"):
+        embeddings = embeddings.detach().cpu().numpy()
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def build_similarity_adjacency(embeddings, threshold, block_size=2048):
+    """
+    分块计算 [T, T] 余弦相似度矩阵并按阈值稀疏化为 CSR 邻接结构 (indptr, indices)。
+    每块只占用 block_size * T 的内存，10k 级工具目录也不会一次性物化完整稠密矩阵。
+    """
+    embeddings = _to_normalized_numpy(embeddings)
+    n = embeddings.shape[0]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    chunks = []
+    for start in range(0, n, block_size):
+        sims = embeddings[start:start + block_size] @ embeddings.T
+        rows, cols = np.nonzero(sims >= threshold)
+        chunks.append(cols.astype(np.int64))
+        indptr[start + 1:start + sims.shape[0] + 1] = np.bincount(rows, minlength=sims.shape[0])
+    np.cumsum(indptr, out=indptr)
+    indices = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+    return indptr, indices
+
+
+def connected_component(indptr, indices, start_index):
+    """在 CSR 邻接结构上做按层 BFS（每层一次向量化的邻居收集），返回 start_index 所在连通分量"""
+    visited = np.zeros(len(indptr) - 1, dtype=bool)
+    visited[start_index] = True
+    frontier = np.array([start_index], dtype=np.int64)
+    while frontier.size:
+        starts, ends = indptr[frontier], indptr[frontier + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            break
+        # 拼接 frontier 中所有节点的邻居区间
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        neighbors = indices[offsets + np.arange(lengths.sum())]
+        neighbors = np.unique(neighbors)
+        frontier = neighbors[~visited[neighbors]]
+        visited[frontier] = True
+    return set(np.flatnonzero(visited).tolist())
+
+
+def expand_similar_tools(tool_datas, embeddings, start_index, threshold):
+    indptr, indices = build_similarity_adjacency(embeddings, threshold)
+    return connected_component(indptr, indices, start_index)
+
+def Relevant_Tool_Selection(target_tool_name, tool_datas, threshold, model_name=DEFAULT_TOOL_MODEL):
+    # Encode all descriptions (model & embeddings are cached across calls)
+    key, embeddings = encode_tool_descriptions(tool_datas, model_name)
 
     # Find target index
     target_idx = next(i for i, t in enumerate(tool_datas) if t["name"] == target_tool_name)
-    related_idx = expand_similar_tools(tool_datas, embeddings, target_idx, threshold)
+    adjacency = _ADJACENCY_CACHE.get((key, threshold))
+    if adjacency is None:
+        adjacency = build_similarity_adjacency(embeddings, threshold)
+        _ADJACENCY_CACHE.clear()
+        _ADJACENCY_CACHE[(key, threshold)] = adjacency
+    related_idx = connected_component(*adjacency, target_idx)
 
-    scores = []
-    for i in related_idx:
-        sim = float(util.cos_sim(embeddings[target_idx], embeddings[i]))
-        scores.append((tool_datas[i]["name"], sim))
+    related = np.fromiter(related_idx, dtype=np.int64, count=len(related_idx))
+    sims = embeddings[related] @ embeddings[target_idx]
+    scores = [(tool_datas[i]["name"], float(sim)) for i, sim in zip(related.tolist(), sims.tolist())]
 
     relevant_tool = sorted(scores, key=lambda x: x[1], reverse=True)
     return relevant_tool
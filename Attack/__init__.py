@@ -8,49 +8,56 @@ This package provides:
 - Unified exporting of LLM classes
 """
 
-# ------------------------
-# Re-export LLM classes
-# ------------------------
-from llms import OllamaLLM, OpenAILLM, DeepseekLLM
-
-# ------------------------
-# extract.py exports
-# ------------------------
-from Attack.extract import (
-    extract_system_prompt,
-    parse_to_dict,
-    keyword_extra,
-    keyword_base_update,
-)
-
-# ------------------------
-# generate.py exports
-# ------------------------
-from Attack.generate import (
-    attack_system_prompt,
-    attack_prompt_generate,
-)
-
-# ------------------------
-# TCL.py exports
-# ------------------------
-from Attack.TCL import (
-    expand_similar_tools,
-    Relevant_Tool_Selection,
-    PURPLE,
-    CYAN,
-    BRIGHT_GREEN,
-    BRIGHT_YELLOW,
-    BRIGHT_RED,
-    WHITE,
-    RESET,
-)
-
-from Attack.key_word_v2 import ToolSemanticProcessor
-
-# ------------------------
-# key_word_v2 exports
-# ------------------------
+import importlib
+
+# 名称 → 所在模块。按需导入（PEP 562 模块级 __getattr__）：
+# 仅使用 extract / TCL 的脚本不会在 import 时触发 key_word_v2 的 NLTK 下载与模型加载
+_LAZY_ATTRS = {
+    # Re-export LLM classes
+    "OllamaLLM": "llms",
+    "OpenAILLM": "llms",
+    "DeepseekLLM": "llms",
+
+    # extract.py exports
+    "extract_system_prompt": "Attack.extract",
+    "parse_to_dict": "Attack.extract",
+    "keyword_extra": "Attack.extract",
+    "keyword_base_update": "Attack.extract",
+
+    # generate.py exports
+    "attack_system_prompt": "Attack.generate",
+    "attack_prompt_generate": "Attack.generate",
+
+    # TCL.py exports
+    "expand_similar_tools": "Attack.TCL",
+    "Relevant_Tool_Selection": "Attack.TCL",
+    "get_sentence_model": "Attack.TCL",
+    "encode_tool_descriptions": "Attack.TCL",
+    "build_similarity_adjacency": "Attack.TCL",
+    "connected_component": "Attack.TCL",
+    "PURPLE": "Attack.TCL",
+    "CYAN": "Attack.TCL",
+    "BRIGHT_GREEN": "Attack.TCL",
+    "BRIGHT_YELLOW": "Attack.TCL",
+    "BRIGHT_RED": "Attack.TCL",
+    "WHITE": "Attack.TCL",
+    "RESET": "Attack.TCL",
+
+    # key_word_v2 exports
+    "ToolSemanticProcessor": "Attack.key_word_v2",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module 'Attack' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name]), name)
+    globals()[name] = value  # 缓存，之后的访问不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
 
 
 __all__ = [
@@ -72,6 +79,10 @@ __all__ = [
     # TCL.py utilities
     "expand_similar_tools",
     "Relevant_Tool_Selection",
+    "get_sentence_model",
+    "encode_tool_descriptions",
+    "build_similarity_adjacency",
+    "connected_component",
 
     # Color constants
     "PURPLE",
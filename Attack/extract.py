@@ -2,7 +2,7 @@ from llms import OllamaLLM
 from llms import OpenAILLM
 from llms import DeepseekLLM
 import json
-import re
+from prompt_convert import parse_to_dict
 
 extract_system_prompt = '''
 # Role
@@ -46,62 +46,6 @@ Text: {{ text }}
 Keywords: {{ keywords }}
 '''
 
-import json
-import ast
-
-def parse_to_dict(s: str):
-    """
-    通用解析（增强版）：
-    1. 自动去掉 ```json ... ``` 或 ``` ... ``` 代码块
-    2. 自动去掉 json/JSON 等无效前缀
-    3. 尝试 JSON 解析
-    4. JSON 失败后 fallback 到 ast.literal_eval
-    5. 自动定位字符串里唯一的 {} / [] 段，提高容错率
-    """
-
-    if not isinstance(s, str):
-        raise ValueError("parse_to_dict 输入必须是字符串")
-
-    # ---------- 1. 去掉 Markdown 代码块 ----------
-    s = s.strip()
-
-    if s.startswith("```"):
-        # 移除所有 ``` 开头的行
-        s = "\n".join(
-            line for line in s.splitlines()
-            if not line.strip().startswith("```")
-        ).strip()
-
-    # ---------- 2. 去掉 json/JSON 前缀 ----------
-    for prefix in ("json", "JSON"):
-        if s.startswith(prefix):
-            s = s[len(prefix):].strip()
-
-    # ---------- 3. 尝试直接按 JSON 解析 ----------
-    try:
-        return json.loads(s)
-    except Exception:
-        pass
-
-    # ---------- 4. 从字符串中提取唯一的 JSON/Python 对象 ----------
-    match = re.search(r"(\{.*\}|\[.*\])", s, flags=re.DOTALL)
-    if match:
-        s = match.group(1).strip()
-
-        # 再次尝试 JSON
-        try:
-            return json.loads(s)
-        except Exception:
-            pass
-
-        # 再尝试 literal_eval
-        try:
-            return ast.literal_eval(s)
-        except Exception as e:
-            # raise ValueError(f"解析失败（在提取主体后）: {e}")
-            return 3
-
-
 def keyword_extra(llm, text, keywords, prompt):
 
     # ----- Step 1: Prepare prompt -----
@@ -112,7 +56,8 @@ def keyword_extra(llm, text, keywords, prompt):
     response = llm.generate(final_prompt)[0]
 
     # ----- Step 3: Parse structured content -----
-    parsed = parse_to_dict(response)
+    # 解析失败时返回 None，keyword_base_update 会忽略非 list / dict 的结果
+    parsed = parse_to_dict(response, strict=False)
 
     print("[INFO] Parsed result as Python object:")
     print(json.dumps(parsed, indent=2, ensure_ascii=False))
@@ -1,27 +1,197 @@
+import base64
+import hashlib
+import json
+import os
+import threading
 import numpy as np
-from typing import List, Dict, Set, Tuple
-import nltk
-from nltk.corpus import stopwords
-from sentence_transformers import SentenceTransformer, util
-from keybert import KeyBERT
-
-# --- 初始化加载区 ---
-try:
-    STOP_WORDS = list(stopwords.words('english'))
-except LookupError:
-    nltk.download('stopwords')
-    STOP_WORDS = list(stopwords.words('english'))
-
-try:
-    nltk.data.find("tokenizers/punkt")
-except LookupError:
-    nltk.download("punkt")
-    nltk.download("punkt_tab")
-
-print("🔄 正在加载 Embedding 模型 (all-MiniLM-L6-v2)...")
-SENTENCE_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
-KEYBERT_MODEL = KeyBERT(model=SENTENCE_MODEL)
-print("✅ 模型加载完毕！\n")
+from typing import List, Dict, Optional, Set, Tuple
+
+# --- 延迟初始化区 ---
+# NLTK 数据下载、Embedding 模型与 KeyBERT 的构建都推迟到第一次使用时，
+# import 本模块（以及 Attack 包）不再产生数秒的启动开销。
+# 旧代码中的 STOP_WORDS / SENTENCE_MODEL / KEYBERT_MODEL 仍可作为模块属性访问（PEP 562）。
+SENTENCE_MODEL_NAME = 'all-MiniLM-L6-v2'
+_INIT_LOCK = threading.Lock()
+_STOP_WORDS = None
+_KEYBERT_MODEL = None
+
+
+def get_stop_words() -> List[str]:
+    global _STOP_WORDS
+    if _STOP_WORDS is None:
+        with _INIT_LOCK:
+            if _STOP_WORDS is None:
+                import nltk
+                from nltk.corpus import stopwords
+                try:
+                    words = list(stopwords.words('english'))
+                except LookupError:
+                    nltk.download('stopwords')
+                    words = list(stopwords.words('english'))
+
+                try:
+                    nltk.data.find("tokenizers/punkt")
+                except LookupError:
+                    nltk.download("punkt")
+                    nltk.download("punkt_tab")
+                _STOP_WORDS = words
+    return _STOP_WORDS
+
+
+def get_sentence_model():
+    # 与 TCL 共用进程级模型缓存
+    from Attack.TCL import get_sentence_model as _get_model
+    return _get_model(SENTENCE_MODEL_NAME)
+
+
+def get_keybert_model():
+    global _KEYBERT_MODEL
+    if _KEYBERT_MODEL is None:
+        with _INIT_LOCK:
+            if _KEYBERT_MODEL is None:
+                from keybert import KeyBERT
+                print(f"🔄 正在加载 Embedding 模型 ({SENTENCE_MODEL_NAME})...")
+                _KEYBERT_MODEL = KeyBERT(model=get_sentence_model())
+                print("✅ 模型加载完毕！\n")
+    return _KEYBERT_MODEL
+
+
+def __getattr__(name):
+    if name == "STOP_WORDS":
+        return get_stop_words()
+    if name == "SENTENCE_MODEL":
+        return get_sentence_model()
+    if name == "KEYBERT_MODEL":
+        return get_keybert_model()
+    raise AttributeError(f"module 'Attack.key_word_v2' has no attribute '{name}'")
+
+DEFAULT_KEYPHRASE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".keyphrase_cache.json")
+
+
+class KeyphraseCache:
+    """
+    关键短语的内容哈希缓存：hash(模型, 提取参数, 描述) → (短语, 归一化短语向量)。
+    持久化为 JSON，描述未变化的工具在之后的运行中不会重新提取 / 编码。
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_KEYPHRASE_CACHE):
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    @staticmethod
+    def key(description: str, params: Tuple) -> str:
+        h = hashlib.sha1(repr(params).encode("utf-8"))
+        h.update(b"\x00")
+        h.update(description.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[List[str], np.ndarray]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        emb = np.frombuffer(base64.b64decode(entry["embeddings"]), dtype=np.float32)
+        return entry["phrases"], emb.reshape(len(entry["phrases"]), -1) if entry["phrases"] else emb.reshape(0, entry["dim"])
+
+    def put(self, key: str, phrases: List[str], embeddings: np.ndarray):
+        self._entries[key] = {
+            "phrases": list(phrases),
+            "dim": int(embeddings.shape[1]),
+            "embeddings": base64.b64encode(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes()).decode("ascii"),
+        }
+        self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def batch_extract_keyphrases(descriptions: List[str],
+                             keyphrase_ngram_range: Tuple[int, int] = (1, 3),
+                             top_n: int = 10,
+                             diversity: float = 0.3,
+                             cache: Optional[KeyphraseCache] = None,
+                             doc_embeddings: Optional[np.ndarray] = None) -> List[Tuple[List[str], np.ndarray]]:
+    """
+    对整个工具目录批量提取关键短语（KeyBERT + MMR）。
+
+    - 未命中缓存的描述一起交给 KeyBERT：所有候选 n-gram 只编码一次
+    - 入选短语的向量直接取自 MMR 阶段已计算的候选向量，不再重复编码
+    - doc_embeddings（与 descriptions 对齐）可由调用方传入以复用
+
+    Returns:
+        List[Tuple[List[str], np.ndarray]]: 每个描述的 (短语列表, 归一化短语向量 [p, D])。
+    """
+    params = (SENTENCE_MODEL_NAME, tuple(keyphrase_ngram_range), top_n, diversity)
+    keys = [KeyphraseCache.key(d, params) for d in descriptions]
+    results: List[Optional[Tuple[List[str], np.ndarray]]] = [None] * len(descriptions)
+    misses = []
+    for i, key in enumerate(keys):
+        hit = cache.get(key) if cache is not None else None
+        if hit is not None:
+            results[i] = hit
+        else:
+            misses.append(i)
+
+    if misses:
+        from sklearn.feature_extraction.text import CountVectorizer
+        model = get_sentence_model()
+        docs = [descriptions[i] for i in misses]
+        dim = model.get_sentence_embedding_dimension()
+        try:
+            vectorizer = CountVectorizer(ngram_range=keyphrase_ngram_range, stop_words=get_stop_words()).fit(docs)
+            words = list(vectorizer.get_feature_names_out())
+        except ValueError:  # 词表为空（描述全是停用词）
+            words = []
+        if words:
+            if doc_embeddings is not None:
+                miss_doc_emb = np.asarray(doc_embeddings)[misses]
+            else:
+                miss_doc_emb = model.encode(docs, convert_to_numpy=True)
+            word_emb = model.encode(words, convert_to_numpy=True)
+            keywords = get_keybert_model().extract_keywords(
+                docs,
+                vectorizer=vectorizer,
+                use_mmr=True, # Max Marginal Relevance 保证多样性
+                diversity=diversity,
+                top_n=top_n,
+                doc_embeddings=miss_doc_emb,
+                word_embeddings=word_emb,
+            )
+            if len(docs) == 1:  # KeyBERT 对单个文档返回扁平列表
+                keywords = [keywords]
+            norms = np.linalg.norm(word_emb, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            word_emb = (word_emb / norms).astype(np.float32)
+            word_index = {w: j for j, w in enumerate(words)}
+        else:
+            keywords = [[] for _ in docs]
+
+        for i, kws in zip(misses, keywords):
+            # 过滤掉过短的词 (长度<=2)，保留由 n-gram 产生的有意义短语
+            phrases = [p for p, _ in kws if len(p) > 2]
+            emb = word_emb[[word_index[p] for p in phrases]] if phrases else np.zeros((0, dim), dtype=np.float32)
+            results[i] = (phrases, emb)
+            if cache is not None:
+                cache.put(keys[i], phrases, emb)
+        if cache is not None:
+            cache.save()
+    return results
+
 
 # 常用颜色 ANSI 转义码
 RED = "\033[31m"
@@ -37,7 +207,9 @@ class ToolSemanticProcessor:
                  target_tool_name: str,
                  keybert_top_n: int = 10,
                  keyphrase_ngram_range: Tuple[int, int] = (1, 3),
-                 conflict_threshold: float = 0.70): # 阈值：越低越严格，越高越宽松
+                 conflict_threshold: float = 0.70, # 阈值：越低越严格，越高越宽松
+                 verbose: bool = True, # 是否逐条打印冲突裁决（工具数很多时可关闭）
+                 cache_path: Optional[str] = DEFAULT_KEYPHRASE_CACHE): # 关键短语缓存文件，None 表示不缓存
 
         if not any(tool['name'] == target_tool_name for tool in tools):
             raise ValueError(f"错误: 目标工具 '{target_tool_name}' 不在工具列表中。")
@@ -45,69 +217,86 @@ class ToolSemanticProcessor:
         self.tools_data = {tool['name']: {'description': tool['description']} for tool in tools}
         self.target_tool_name = target_tool_name
         self.non_target_tool_names = [name for name in self.tools_data if name != target_tool_name]
+        self.tool_names = list(self.tools_data)
+        self.tool_index = {name: i for i, name in enumerate(self.tool_names)}
 
         self.keybert_top_n = keybert_top_n
         self.keyphrase_ngram_range = keyphrase_ngram_range
         self.conflict_threshold = conflict_threshold
+        self.verbose = verbose
+        self.cache = KeyphraseCache(cache_path) if cache_path else None
 
-        self.doc_embeddings = {} 
-        for name, data in self.tools_data.items():
-            self.doc_embeddings[name] = SENTENCE_MODEL.encode(data['description'], convert_to_tensor=True)
+        # 所有工具描述一次性批量编码为归一化矩阵 [T, D]，余弦相似度即点积
+        self.doc_embeddings = get_sentence_model().encode(
+            [self.tools_data[name]['description'] for name in self.tool_names],
+            convert_to_numpy=True, normalize_embeddings=True
+        )
+
+        # 全部短语堆叠后的矩阵，由 _extract_keyphrases 填充
+        self.all_phrases: List[str] = []
+        self.phrase_owner = np.zeros(0, dtype=np.int64)      # [P_all] 每个短语所属工具的下标
+        self.phrase_embeddings = np.zeros((0, self.doc_embeddings.shape[1]), dtype=np.float32)  # [P_all, D]
+        self.phrase_relevance = np.zeros(0, dtype=np.float32)  # [P_all] 短语与其所属工具描述的契合度
 
     def _extract_keyphrases(self):
         print("--- 步骤 1: 提取所有工具的关键短语 ---")
-        for name, data in self.tools_data.items():
-            # KeyBERT 提取
-            phrases = KEYBERT_MODEL.extract_keywords(
-                data['description'],
-                keyphrase_ngram_range=self.keyphrase_ngram_range,
-                stop_words=STOP_WORDS,
-                use_mmr=True, # Max Marginal Relevance 保证多样性
-                diversity=0.3,
-                top_n=self.keybert_top_n
-            )
-            # 过滤掉过短的词 (长度<=2)，保留由 n-gram 产生的有意义短语
-            data['phrases'] = [p for p, s in phrases if len(p) > 2]
-            
-            # 预计算该工具提取出的短语的向量 (加速比对)
-            if data['phrases']:
-                data['phrase_embeddings'] = SENTENCE_MODEL.encode(data['phrases'], convert_to_tensor=True)
-            else:
-                data['phrase_embeddings'] = None
+        # 整个工具目录一次批量提取；短语向量来自 MMR 阶段的候选向量或缓存
+        extracted = batch_extract_keyphrases(
+            [self.tools_data[name]['description'] for name in self.tool_names],
+            keyphrase_ngram_range=self.keyphrase_ngram_range,
+            top_n=self.keybert_top_n,
+            diversity=0.3,
+            cache=self.cache,
+            doc_embeddings=self.doc_embeddings,
+        )
+        owners = []
+        embedding_blocks = []
+        for name, (phrases, phrase_embeddings) in zip(self.tool_names, extracted):
+            data = self.tools_data[name]
+            data['phrases'] = phrases
+            data['phrase_slice'] = slice(len(self.all_phrases), len(self.all_phrases) + len(phrases))
+            self.all_phrases.extend(phrases)
+            owners.extend([self.tool_index[name]] * len(phrases))
+            embedding_blocks.append(phrase_embeddings)
             
             # 打印预览
             print(f"  🔹 [{name}] 初步提取 ({len(data['phrases'])}个): {data['phrases'][:3]}...")
 
+        self.phrase_owner = np.asarray(owners, dtype=np.int64)
+        if self.all_phrases:
+            self.phrase_embeddings = np.vstack(embedding_blocks).astype(np.float32)
+            # 预计算每个短语对其所属工具描述的契合度（逐行点积）
+            self.phrase_relevance = np.einsum("pd,pd->p", self.phrase_embeddings, self.doc_embeddings[self.phrase_owner])
+        for data in self.tools_data.values():
+            data['phrase_embeddings'] = self.phrase_embeddings[data['phrase_slice']] if data['phrases'] else None
+
     def _find_semantic_conflicts(self):
         print(f"\n--- 步骤 2: 语义冲突扫描 (相似度阈值 > {self.conflict_threshold}) ---")
         
-        target_data = self.tools_data[self.target_tool_name]
-        if target_data['phrase_embeddings'] is None:
+        target_slice = self.tools_data[self.target_tool_name]['phrase_slice']
+        target_idx = np.arange(target_slice.start, target_slice.stop)
+        if target_idx.size == 0:
             return []
 
-        conflicts = [] 
-
-        # 扫描所有非目标工具
-        for other_name in self.non_target_tool_names:
-            other_data = self.tools_data[other_name]
-            if other_data['phrase_embeddings'] is None:
-                continue
-
-            # ⚡ 矩阵计算: Target短语 x Other短语
-            similarity_matrix = util.cos_sim(target_data['phrase_embeddings'], other_data['phrase_embeddings'])
-
-            # 遍历矩阵，找出相似度超标的对子
-            for i, target_phrase in enumerate(target_data['phrases']):
-                for j, other_phrase in enumerate(other_data['phrases']):
-                    score = similarity_matrix[i][j].item()
-                    
-                    if score > self.conflict_threshold:
-                        conflicts.append({
-                            "target_phrase": target_phrase,
-                            "competitor_phrase": other_phrase,
-                            "competitor_tool": other_name,
-                            "similarity": score
-                        })
+        # ⚡ 一次矩阵计算: Target短语 x 全部短语 [P_target, P_all]，再屏蔽目标工具自身的列
+        similarity_matrix = self.phrase_embeddings[target_idx] @ self.phrase_embeddings.T
+        mask = (similarity_matrix > self.conflict_threshold) & (self.phrase_owner != self.tool_index[self.target_tool_name])[None, :]
+        rows, cols = np.nonzero(mask)
+        # 按 (竞品工具, 目标短语, 竞品短语) 排序，与逐工具扫描的顺序一致
+        order = np.lexsort((cols, rows, self.phrase_owner[cols]))
+        rows, cols = rows[order], cols[order]
+
+        conflicts = [
+            {
+                "target_phrase": self.all_phrases[target_idx[i]],
+                "competitor_phrase": self.all_phrases[j],
+                "competitor_tool": self.tool_names[self.phrase_owner[j]],
+                "similarity": float(similarity_matrix[i, j]),
+                "target_index": int(target_idx[i]),
+                "competitor_index": int(j),
+            }
+            for i, j in zip(rows.tolist(), cols.tolist())
+        ]
 
         if conflicts:
             print(f"  ⚠️ 发现 {len(conflicts)} 组语义接近的冲突。")
@@ -116,39 +305,39 @@ class ToolSemanticProcessor:
             
         return conflicts
 
-    def _calculate_relevance(self, phrase, tool_name):
-        """计算：某个短语 vs 某个工具描述 的语义契合度"""
-        phrase_emb = SENTENCE_MODEL.encode(phrase, convert_to_tensor=True)
-        doc_emb = self.doc_embeddings[tool_name]
-        return util.cos_sim(phrase_emb, doc_emb).item()
-
     def _resolve_conflicts(self, conflicts):
         print("\n--- 步骤 3: 冲突智能裁决 ---")
         
         # 记录待删除名单 (Tool -> Set of phrases)
         removal_plan = {name: set() for name in self.tools_data}
 
-        for c in conflicts:
+        # 裁判进场：用预计算的契合度向量一次性比较所有冲突对
+        target_idx = np.fromiter((c['target_index'] for c in conflicts), dtype=np.int64, count=len(conflicts))
+        competitor_idx = np.fromiter((c['competitor_index'] for c in conflicts), dtype=np.int64, count=len(conflicts))
+        score_target = self.phrase_relevance[target_idx]
+        score_competitor = self.phrase_relevance[competitor_idx]
+        target_wins = score_target >= score_competitor
+
+        for c, s_t, s_c, win in zip(conflicts, score_target.tolist(), score_competitor.tolist(), target_wins.tolist()):
             t_phrase = c['target_phrase']
             o_phrase = c['competitor_phrase']
             o_tool = c['competitor_tool']
-            
-            # 裁判进场：分别计算短语对各自工具的契合度
-            score_target = self._calculate_relevance(t_phrase, self.target_tool_name)
-            score_competitor = self._calculate_relevance(o_phrase, o_tool)
 
-            print(f"⚔️  冲突: Target['{t_phrase}'] vs {o_tool}['{o_phrase}'] (相似度: {c['similarity']:.2f})")
-            
             # 谁的分数低，谁就放弃这个词
-            if score_target >= score_competitor:
-                print(f"    🏆 目标工具胜出 ({score_target:.3f} vs {score_competitor:.3f})")
-                print(f"    🗑️  移除 {o_tool} 的 '{o_phrase}'")
+            if win:
                 removal_plan[o_tool].add(o_phrase)
             else:
-                print(f"    🛡️ 竞品工具胜出 ({score_competitor:.3f} vs {score_target:.3f})")
-                print(f"    🗑️  移除 Target 的 '{t_phrase}'")
                 removal_plan[self.target_tool_name].add(t_phrase)
 
+            if self.verbose:
+                print(f"⚔️  冲突: Target['{t_phrase}'] vs {o_tool}['{o_phrase}'] (相似度: {c['similarity']:.2f})")
+                if win:
+                    print(f"    🏆 目标工具胜出 ({s_t:.3f} vs {s_c:.3f})")
+                    print(f"    🗑️  移除 {o_tool} 的 '{o_phrase}'")
+                else:
+                    print(f"    🛡️ 竞品工具胜出 ({s_c:.3f} vs {s_t:.3f})")
+                    print(f"    🗑️  移除 Target 的 '{t_phrase}'")
+
         # 执行删除操作
         for tool_name, phrases_to_remove in removal_plan.items():
             original_list = self.tools_data[tool_name]['phrases']
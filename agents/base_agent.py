@@ -4,9 +4,12 @@
 所有的具体Agent类型都应该继承自这个基类。
 """
 
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from prompt_convert import  CORE_AGENT_SYSTEM_PROMPT,BASE_SYSTEM_PROMPT
-from prompt_convert import get_converter
+from prompt_convert import get_converter, StreamingJsonParser
+from monitor import REGISTRY
+from agents.memory import AgentMemory, estimate_tokens
 
 class BaseAgent:
     """
@@ -14,7 +17,7 @@ class BaseAgent:
     定义了Agent的基本结构和规划流程。
     """
 
-    def __init__(self, name: str, llm, tools: Dict[str, Any] = None, system_prompt: str = BASE_SYSTEM_PROMPT):
+    def __init__(self, name: str, llm, tools: Dict[str, Any] = None, system_prompt: str = BASE_SYSTEM_PROMPT, speculator=None, memory: AgentMemory = None):
         """
         初始化BaseAgent。
 
@@ -23,12 +26,15 @@ class BaseAgent:
             llm (Any): 用于生成文本的LLM实例。
             tools (Dict[str, Any], optional): Agent可以使用的工具字典，键为工具名称，值为工具实例。默认为None。
             system_prompt (str): Agent的系统提示词。默认为空字符串。
+            speculator (SpeculativeExecutor, optional): 推测式工具执行器，在 LLM 思考期间预取工具结果。默认为None。
+            memory (AgentMemory, optional): 结构化交互历史（token 预算窗口 + 旧步骤摘要 + 文档去重）。默认新建一个。
         """
         self.name = name
         self.llm = llm
         self.tools = tools if tools is not None else []
         self.system_prompt = system_prompt
-        self.memory: str=None #用于存储Agent的交互历史
+        self.memory: AgentMemory = memory if memory is not None else AgentMemory() #用于存储Agent的交互历史
+        self.speculator = speculator
         tool_descriptions_list = []
         if self.system_prompt == BASE_SYSTEM_PROMPT:
             if len(self.tools) != 0:
@@ -78,7 +84,61 @@ class BaseAgent:
         Returns:
             str: LLM生成的响应。
         """
-        return self.llm.generate(prompt)
+        with REGISTRY.timer("llm_call_seconds", "LLM 调用耗时", agent=self.name):
+            result = self.llm.generate(prompt)
+        REGISTRY.counter("llm_calls_total", "LLM 调用次数").inc(agent=self.name)
+        # generate 返回 (text, tokens)，tokens 来自 converter.from_llm_output
+        if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], (int, float)):
+            REGISTRY.counter("llm_tokens_total", "LLM 消耗的 token 总数").inc(result[1], agent=self.name)
+        return result
+
+    def _call_llm_stream(self, prompt: str, stop_when: Optional[Callable[[StreamingJsonParser], bool]] = None) -> Tuple[str, int, StreamingJsonParser]:
+        """
+        流式调用LLM，边接收边增量解析顶层 JSON 字段。
+
+        Args:
+            prompt (str): 发送给LLM的提示。
+            stop_when (Callable, optional): 每收到一块文本后调用，返回 True 时立即停止接收，
+                                            关闭流以取消剩余的生成（例如冗长的尾部思考）。
+
+        Returns:
+            Tuple[str, int, StreamingJsonParser]: 已接收的文本、token 数（后端未返回 usage 时为估算值）、解析器（含已完成的字段）。
+        """
+        parser = StreamingJsonParser()
+        chunks = []
+        start = time.perf_counter()
+        stream = self.llm.stream(prompt)
+        try:
+            for delta in stream:
+                chunks.append(delta)
+                parser.feed(delta)
+                if stop_when is not None and stop_when(parser):
+                    REGISTRY.histogram("llm_time_to_action_seconds", "流式响应中 Action 就绪所需时间").observe(time.perf_counter() - start, agent=self.name)
+                    REGISTRY.counter("llm_stream_early_stops_total", "流式响应提前派发工具调用次数").inc(agent=self.name)
+                    break
+        finally:
+            stream.close()
+        elapsed = time.perf_counter() - start
+        REGISTRY.histogram("llm_call_seconds", "LLM 调用耗时").observe(elapsed, agent=self.name)
+        REGISTRY.counter("llm_calls_total", "LLM 调用次数").inc(agent=self.name)
+        tokens = getattr(self.llm, "last_stream_tokens", 0) or 0
+        text = "".join(chunks)
+        if not tokens:
+            # usage 只在流的最后一块返回（OpenAI include_usage / Ollama 最终消息），提前停止时收不到：
+            # 按 prompt + 已接收文本估算，而不是记为 0
+            tokens = estimate_tokens(self._prompt_text(prompt)) + estimate_tokens(text)
+            REGISTRY.counter("llm_tokens_estimated_total", "流式调用中按文本估算的 token 数").inc(tokens, agent=self.name)
+        REGISTRY.counter("llm_tokens_total", "LLM 消耗的 token 总数").inc(tokens, agent=self.name)
+        return text, tokens, parser
+
+    @staticmethod
+    def _prompt_text(prompt: Any) -> str:
+        """prompt 可能是字符串或 [{"role", "content"}, ...] 消息列表"""
+        if isinstance(prompt, str):
+            return prompt
+        if isinstance(prompt, (list, tuple)):
+            return "\n".join(str(m.get("content", "")) if isinstance(m, dict) else str(m) for m in prompt)
+        return str(prompt)
 
     def _execute_tool(self, tool_name: str, arguments: str) -> Any:
         """
@@ -91,10 +151,34 @@ class BaseAgent:
         Returns:
             str: 工具执行的结果。
         """
-        for tool in self.tools:
-            if tool.name == tool_name:
-                return tool.run(arguments)
-        return f"Error: Tool '{tool_name}' not found."
+        tool = next((t for t in self.tools if t.name == tool_name), None)
+        if tool is None:
+            # Agent 自身没有的工具即使被推测执行过也不能返回其结果
+            if self.speculator is not None:
+                self.speculator.discard()
+            REGISTRY.counter("tool_calls_total", "工具调用次数").inc(tool=tool_name, status="not_found")
+            return f"Error: Tool '{tool_name}' not found."
+        # 只有 speculator 持有的正是 Agent 的这个工具实例时，推测结果与工具锁才有效
+        speculative = self.speculator is not None and self.speculator.tools.get(tool_name) is tool
+        if speculative:
+            result = self.speculator.take(tool_name, arguments)
+            if not self.speculator.is_miss(result):
+                REGISTRY.counter("tool_calls_total", "工具调用次数").inc(tool=tool_name, status="speculative")
+                return result
+        elif self.speculator is not None:
+            self.speculator.discard()
+        with REGISTRY.timer("tool_run_seconds", "工具 run 耗时", tool=tool_name):
+            if speculative:
+                result = self.speculator.run(tool_name, arguments)
+            else:
+                result = tool.run(arguments)
+        REGISTRY.counter("tool_calls_total", "工具调用次数").inc(tool=tool_name, status="ok")
+        return result
+
+    def _speculate(self, task: Any):
+        """在调用 LLM 之前，让推测执行器预取可能被选中的工具调用（与 LLM 延迟重叠）"""
+        if self.speculator is not None:
+            self.speculator.speculate(task, self.memory)
 
     def plan(self, task: str) -> str:
         """
@@ -109,15 +193,22 @@ class BaseAgent:
         raise NotImplementedError("Subclasses must implement the plan method.")
     def add_memory(self, memory: str):
         """
-        向Agent的内存中添加新的交互历史。
+        向Agent的内存中添加一段非结构化的交互历史。
 
         Args:
-            memory (List[str]): 要添加的交互历史。
+            memory (str): 要添加的交互历史。
+        """
+        self.memory.add_text(memory)
+    def add_step(self, step: int, thought: Any, action: Any, action_input: Any):
+        """
+        记录一个 ReAct 步骤（Thought / Action / Action Input）。
+        """
+        self.memory.add_step(step, thought, action, action_input)
+    def add_observation(self, observation: Any):
+        """
+        把工具返回的 observation 挂到最近一步，已出现过的文档按 id 去重。
         """
-        if self.memory is None:
-            self.memory = memory
-        else:
-            self.memory+=memory
+        self.memory.add_observation(observation)
     def run(self, task: str) -> str:
         """
         执行Agent的主要流程。
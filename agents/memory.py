@@ -0,0 +1,205 @@
+import hashlib
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+"""结构化 Agent 记忆：按步骤记录、token 预算窗口、旧步骤摘要、按文档 id 去重 observation"""
+
+# 工具输出中每个文档块的分隔行，例如 "--- Document 2 (ID: 17) ---" / "--- Email 1 (ID: hr_101) ---"
+_BLOCK_HEADER = re.compile(r"^--- .+? ---$", re.MULTILINE)
+_BLOCK_ID = re.compile(r"\(ID:\s*([^)]+)\)")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    无需分词器的 token 估算：ASCII 约 4 字符 / token，非 ASCII（中文等）约 1 字符 / token。
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (len(text) - non_ascii) // 4 + non_ascii + 1
+
+
+def _doc_key(header: str, body: str) -> str:
+    match = _BLOCK_ID.search(header)
+    if match:
+        return "id:" + match.group(1).strip()
+    return "sha1:" + hashlib.sha1(body.strip().encode("utf-8")).hexdigest()
+
+
+class StepRecord:
+    """单个 ReAct 步骤：Thought / Action / Action Input，以及（去重后的）Observation"""
+
+    __slots__ = ("step", "thought", "action", "action_input", "observation", "doc_keys", "text")
+
+    def __init__(self, step: Optional[int] = None, thought: Any = None, action: Any = None,
+                 action_input: Any = None, text: Optional[str] = None):
+        self.step = step
+        self.thought = thought
+        self.action = action
+        self.action_input = action_input
+        self.observation: Optional[str] = None
+        self.doc_keys: List[str] = []
+        # 非结构化的原始记忆文本（兼容 add_memory(str)）
+        self.text = text
+
+    def render(self) -> str:
+        if self.text is not None:
+            parts = [self.text]
+        else:
+            parts = [f"\nStep {self.step}:\nThought: {self.thought}\nAction: {self.action}\nAction Input: {self.action_input}"]
+        if self.observation is not None:
+            parts.append(f"\nObservation: {self.observation}")
+        return "".join(parts)
+
+    def summarize(self) -> str:
+        if self.text is not None:
+            return " ".join(self.text.split())[:120]
+        line = f"Step {self.step}: Action={self.action}, Action Input={self.action_input}"
+        if self.doc_keys:
+            line += f", retrieved {len(self.doc_keys)} docs"
+        elif self.observation is not None:
+            line += ", observation received"
+        return line
+
+
+class AgentMemory:
+    """
+    有界的 Agent 交互历史：
+    - 每一步保存为 StepRecord，而不是一条不断增长的字符串
+    - 渲染时从最新步骤往前按 token 预算保留原文，更早的步骤压缩为一行摘要
+    - observation 按文档 id（无 id 时按内容哈希）去重，重复文档只保留引用
+    - 渲染结果按版本缓存；str(memory) 即可直接填入各 Agent 的 prompt 模板
+    """
+
+    def __init__(self, max_tokens: int = 3000, summary_max_tokens: int = 500,
+                 summarizer: Optional[Callable[[List[StepRecord]], str]] = None):
+        """
+        Args:
+            max_tokens (int): 最近步骤原文部分的 token 预算（估算值），总长度约为 max_tokens + summary_max_tokens。
+            summary_max_tokens (int): 旧步骤摘要部分的 token 上限。
+            summarizer (Callable, optional): 自定义摘要函数（例如调用 LLM），输入被压缩的步骤列表。
+        """
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer
+        self.records: List[StepRecord] = []
+        self._seen_docs: Dict[str, Optional[int]] = {}
+        self._version = 0
+        self._rendered: Optional[str] = None
+        self._rendered_version = -1
+
+    # ========= 写入 =========
+    def add_step(self, step: int, thought: Any, action: Any, action_input: Any) -> StepRecord:
+        record = StepRecord(step, thought, action, action_input)
+        self.records.append(record)
+        self._version += 1
+        return record
+
+    def add_text(self, text: str) -> StepRecord:
+        record = StepRecord(text=text)
+        self.records.append(record)
+        self._version += 1
+        return record
+
+    def add_observation(self, observation: Any):
+        """把 observation 挂到最近一步；其中已出现过的文档替换为引用"""
+        if not self.records:
+            self.add_text("")
+        record = self.records[-1]
+        text, keys = self._dedup(str(observation), record.step)
+        record.observation = text if record.observation is None else record.observation + "\n" + text
+        record.doc_keys.extend(keys)
+        self._version += 1
+
+    def _dedup(self, observation: str, step: Optional[int]):
+        headers = list(_BLOCK_HEADER.finditer(observation))
+        if not headers:
+            return observation, []
+        parts = [observation[:headers[0].start()]]
+        keys = []
+        for i, match in enumerate(headers):
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(observation)
+            header = match.group(0)
+            body = observation[match.end():end]
+            key = _doc_key(header, body)
+            keys.append(key)
+            if key in self._seen_docs:
+                seen_step = self._seen_docs[key]
+                where = f"Step {seen_step}" if seen_step is not None else "an earlier step"
+                parts.append(f"{header}\n[duplicate, already retrieved in {where}]\n")
+            else:
+                self._seen_docs[key] = step
+                parts.append(header + body)
+        return "".join(parts), keys
+
+    def clear(self):
+        self.records.clear()
+        self._seen_docs.clear()
+        self._version += 1
+
+    # ========= 渲染 =========
+    def _summary(self, records: List[StepRecord]) -> str:
+        if self.summarizer is not None:
+            return self.summarizer(records)
+        lines = [r.summarize() for r in records]
+        # 摘要本身也受预算约束：超出时只保留最近的若干行
+        kept: List[str] = []
+        used = 0
+        for line in reversed(lines):
+            cost = estimate_tokens(line)
+            if kept and used + cost > self.summary_max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        kept.reverse()
+        omitted = len(lines) - len(kept)
+        if omitted:
+            kept.insert(0, f"... ({omitted} earlier steps omitted)")
+        return "\n".join(kept)
+
+    def render(self) -> Optional[str]:
+        if self._rendered_version == self._version:
+            return self._rendered
+        if not self.records:
+            rendered = None
+        else:
+            recent: List[str] = []
+            used = 0
+            cut = len(self.records)
+            for record in reversed(self.records):
+                text = record.render()
+                cost = estimate_tokens(text)
+                if recent and used + cost > self.max_tokens:
+                    break
+                if not recent and cost > self.max_tokens:
+                    # 最新一步单独超出预算：截断其 observation 尾部
+                    text = text[:self.max_tokens * 4] + "\n...[truncated]"
+                    cost = self.max_tokens
+                recent.append(text)
+                used += cost
+                cut -= 1
+            recent.reverse()
+            if cut:
+                summary = self._summary(self.records[:cut])
+                rendered = f"\nEarlier steps (summarized):\n{summary}" + "".join(recent)
+            else:
+                rendered = "".join(recent)
+        self._rendered = rendered
+        self._rendered_version = self._version
+        return rendered
+
+    def token_count(self) -> int:
+        return estimate_tokens(self.render() or "")
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __bool__(self) -> bool:
+        return bool(self.records)
+
+    def __str__(self) -> str:
+        rendered = self.render()
+        return "None" if rendered is None else rendered
+
+    def __format__(self, spec: str) -> str:
+        return format(str(self), spec)
@@ -45,7 +45,7 @@ class RAGAgent(BaseAgent):
             response,tokens = self._call_llm([{'role':'system','content':self.system_prompt},{'role':'user','content':prompt}])
             total_tokens+=tokens
             if observation is not None:
-                self.add_memory(f"\nObservation: {observation}")
+                self.add_observation(observation)
             print(response)
             trace["thought"] = response
             try:
@@ -57,7 +57,6 @@ class RAGAgent(BaseAgent):
                 json_data.append({"Action":action})
                 action_input = action_info.get("Action Input", {})
                 status = action_info.get("Status","End")
-                iteration_memory =f'\nStep {iteration}:\nThought: {thought}\nAction: {action}\nAction Input: {action_input}'
                 if action != "None":
                     observation_dict = self._execute_tool(action, action_input)
                     observation = observation_dict.get("data")
@@ -68,7 +67,7 @@ class RAGAgent(BaseAgent):
                     observation = None
                 if status and status == "End":
                     return traces,f"\nFinal Answer:{action_info.get('Final Answer')}",total_tokens,iteration
-                self.add_memory(iteration_memory)
+                self.add_step(iteration, thought, action, action_input)
                 traces.append(trace)
             except json.JSONDecodeError:
                 return "Error",f"错误：LLM的响应格式不正确: {response}",total_tokens,iteration
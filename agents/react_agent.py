@@ -1,74 +1,19 @@
 from agents.base_agent import BaseAgent
+from monitor import REGISTRY
 import json 
 from prompt_convert import REACT_PLANNER_PROMPT,REACT_USER_PROMPT
 from typing import Dict, Any, List
-import ast
-#from streaming_json_parser import IterativeStateMachine,StreamingJsonParser
-import re
+from prompt_convert import StreamingJsonParser, parse_to_dict
 
-def parse_to_dict(s: str):
-    """
-    通用解析（增强版）：
-    1. 自动去掉 ```json ... ``` 或 ``` ... ``` 代码块
-    2. 自动去掉 json/JSON 等无效前缀
-    3. 尝试 JSON 解析
-    4. JSON 失败后 fallback 到 ast.literal_eval
-    5. 自动定位字符串里唯一的 {} / [] 段，提高容错率
-    """
-
-    if not isinstance(s, str):
-        raise ValueError("parse_to_dict 输入必须是字符串")
-
-    # ---------- 1. 去掉 Markdown 代码块 ----------
-    s = s.strip()
-
-    if s.startswith("```"):
-        # 移除所有 ``` 开头的行
-        s = "\n".join(
-            line for line in s.splitlines()
-            if not line.strip().startswith("```")
-        ).strip()
-
-    # ---------- 2. 去掉 json/JSON 前缀 ----------
-    for prefix in ("json", "JSON"):
-        if s.startswith(prefix):
-            s = s[len(prefix):].strip()
-
-    # ---------- 3. 尝试直接按 JSON 解析 ----------
-    try:
-        return json.loads(s)
-    except Exception:
-        pass
-
-    # ---------- 4. 从字符串中提取唯一的 JSON/Python 对象 ----------
-    match = re.search(r"(\{.*\}|\[.*\])", s, flags=re.DOTALL)
-    if match:
-        s = match.group(1).strip()
-
-        # 再次尝试 JSON
-        try:
-            return json.loads(s)
-        except Exception:
-            pass
-
-        # 再尝试 literal_eval
-        try:
-            return ast.literal_eval(s)
-        except Exception as e:
-            raise ValueError(f"解析失败（在提取主体后）: {e}")
-
-    # ---------- 5. 最终 fallback：literal_eval ----------
-    try:
-        return ast.literal_eval(s)
-    except Exception as e:
-        raise ValueError(f"无法解析字符串为字典/列表: {e}")
 class ReactAgent(BaseAgent):
     """
     实现了 React (Reason-Act-Observe-Reason) 规划策略的Agent。
     更详细地展示了工具的思考、选择和执行流程。
     """
-    def __init__(self, llm, name="ReactAgent", tools=None, system_prompt: str = REACT_PLANNER_PROMPT,user_prompt: str = REACT_USER_PROMPT):
-        super().__init__(name, llm, tools, system_prompt)
+    def __init__(self, llm, name="ReactAgent", tools=None, system_prompt: str = REACT_PLANNER_PROMPT,user_prompt: str = REACT_USER_PROMPT, stream: bool = False, speculator=None, memory=None):
+        super().__init__(name, llm, tools, system_prompt, speculator=speculator, memory=memory)
+        # stream=True 时流式接收 LLM 输出，Action / Action Input 一旦完整即派发工具调用
+        self.stream = stream
         tool_descriptions_list = []
         self.tool_names_list = []
         self.user_prompt = user_prompt
@@ -80,6 +25,13 @@ class ReactAgent(BaseAgent):
             tool_descriptions_str = "\n".join(tool_descriptions_list)
             tool_names_str = ", ".join(self.tool_names_list)
             self.system_prompt = self.system_prompt.format(tool_names = tool_names_str,tool_descriptions=tool_descriptions_str)
+    @staticmethod
+    def _action_ready(parser: StreamingJsonParser) -> bool:
+        """
+        Prompt 约束 Action 非 'None' 时 Status 必为 'Execute'，
+        因此 Action 与 Action Input 都完整后即可停止接收并派发工具调用。
+        """
+        return parser.has("Action", "Action Input") and parser.fields["Action"] not in ("None", None)
     def generate_prompt(self, query: Any = None,history: str = None, observation: Any = None) -> str:
         return self.user_prompt.format(query=query,history=history,observation=observation)
     def plan(self, task: Any) -> str:
@@ -102,18 +54,32 @@ class ReactAgent(BaseAgent):
             else:
                 prompt = self.generate_prompt(query=task,history=self.memory,observation=observation)
                 #print(prompt)
-            response,tokens = self._call_llm([{'role':'system','content':self.system_prompt},{'role':'user','content':prompt}])
+            self._speculate(task)
+            messages = [{'role':'system','content':self.system_prompt},{'role':'user','content':prompt}]
+            parser = None
+            if self.stream:
+                response,tokens,parser = self._call_llm_stream(messages, stop_when=self._action_ready)
+            else:
+                response,tokens = self._call_llm(messages)
             total_tokens+=tokens
             print(response)
             trace["thought"] = response
             try:
                 try:
-                    action_info = parse_to_dict(response)
+                    if parser is not None and (parser.done or self._action_ready(parser)):
+                        # 流式解析已拿到所需字段，无需再对完整文本做 parse_to_dict
+                        action_info = parser.result()
+                        if not parser.done:
+                            action_info.setdefault("Status", "Execute")
+                    else:
+                        with REGISTRY.timer("parse_seconds", "Action JSON 解析耗时", agent=self.name):
+                            action_info = parse_to_dict(response, expect="{")
                 except Exception as e:
+                    REGISTRY.counter("parse_failures_total", "Action JSON 解析失败次数").inc(agent=self.name)
                     iteration-=1
                     continue
                 if observation is not None:
-                    self.add_memory(f"\nObservation: {observation}")
+                    self.add_observation(observation)
                 thought = action_info.get("Thought", "I was thinking...")
                 action = action_info.get("Action","None")
                 json_data.append({"Thought":thought})
@@ -121,7 +87,6 @@ class ReactAgent(BaseAgent):
                 json_data.append({"Action":action})
                 action_input = action_info.get("Action Input", {})
                 status = action_info.get("Status","End")
-                iteration_memory =f'\nStep {iteration}:\nThought: {thought}\nAction: {action}\nAction Input: {action_input}'
                 if action != "None":
                     if action == self.tool_names_list[0]:
                         asr_c = 1
@@ -139,7 +104,7 @@ class ReactAgent(BaseAgent):
                     if asr_c and asr_o:
                         asr_o_f = 1
                     return f"\nFinal Answer:{action_info.get('Final Answer')}",asr_c,asr_o_f
-                self.add_memory(iteration_memory)
+                self.add_step(iteration, thought, action, action_input)
                 traces.append(trace)
             except json.JSONDecodeError:
                 return "Error",f"错误：LLM的响应格式不正确: {response}",total_tokens,iteration
@@ -1,73 +1,17 @@
 from agents.base_agent import BaseAgent
+from monitor import REGISTRY
 import json
 from typing import Dict, Any, List
 from prompt_convert import SELF_REFINE_INITIAL_PROMPT,SELF_REFINE_CRITIQUE_PROMPT,SELF_REFINE_USER_PROMPT,SELF_REFINE_USER_CRITIQUE_PROMPT
-import re
-import ast
+from prompt_convert import parse_to_dict
 
-def parse_to_dict(s: str):
-    """
-    通用解析（增强版）：
-    1. 自动去掉 ```json ... ``` 或 ``` ... ``` 代码块
-    2. 自动去掉 json/JSON 等无效前缀
-    3. 尝试 JSON 解析
-    4. JSON 失败后 fallback 到 ast.literal_eval
-    5. 自动定位字符串里唯一的 {} / [] 段，提高容错率
-    """
-
-    if not isinstance(s, str):
-        raise ValueError("parse_to_dict 输入必须是字符串")
-
-    # ---------- 1. 去掉 Markdown 代码块 ----------
-    s = s.strip()
-
-    if s.startswith("```"):
-        # 移除所有 ``` 开头的行
-        s = "\n".join(
-            line for line in s.splitlines()
-            if not line.strip().startswith("```")
-        ).strip()
-
-    # ---------- 2. 去掉 json/JSON 前缀 ----------
-    for prefix in ("json", "JSON"):
-        if s.startswith(prefix):
-            s = s[len(prefix):].strip()
-
-    # ---------- 3. 尝试直接按 JSON 解析 ----------
-    try:
-        return json.loads(s)
-    except Exception:
-        pass
-
-    # ---------- 4. 从字符串中提取唯一的 JSON/Python 对象 ----------
-    match = re.search(r"(\{.*\}|\[.*\])", s, flags=re.DOTALL)
-    if match:
-        s = match.group(1).strip()
-
-        # 再次尝试 JSON
-        try:
-            return json.loads(s)
-        except Exception:
-            pass
-
-        # 再尝试 literal_eval
-        try:
-            return ast.literal_eval(s)
-        except Exception as e:
-            raise ValueError(f"解析失败（在提取主体后）: {e}")
-
-    # ---------- 5. 最终 fallback：literal_eval ----------
-    try:
-        return ast.literal_eval(s)
-    except Exception as e:
-        raise ValueError(f"无法解析字符串为字典/列表: {e}")
 class SelfRefineAgent(BaseAgent):
     """
     实现了 Self-Refine (Reason-Act-Observe-Feedback-Reason) 规划策略的Agent。
     使用同一个LLM进行反馈。
     """
-    def __init__(self, name="SelfRefineAgent", llm=None, tools=None, system_prompt: str = SELF_REFINE_INITIAL_PROMPT, user_prompt: str = SELF_REFINE_USER_PROMPT,system_feedback_prompt: str = SELF_REFINE_CRITIQUE_PROMPT,feedback_prompt: str = SELF_REFINE_USER_CRITIQUE_PROMPT):
-        super().__init__(name, llm, tools, system_prompt)
+    def __init__(self, name="SelfRefineAgent", llm=None, tools=None, system_prompt: str = SELF_REFINE_INITIAL_PROMPT, user_prompt: str = SELF_REFINE_USER_PROMPT,system_feedback_prompt: str = SELF_REFINE_CRITIQUE_PROMPT,feedback_prompt: str = SELF_REFINE_USER_CRITIQUE_PROMPT, speculator=None, memory=None):
+        super().__init__(name, llm, tools, system_prompt, speculator=speculator, memory=memory)
         tool_descriptions_list = []
         tool_names_list = []
         self.tool_names_list = []
@@ -106,6 +50,7 @@ class SelfRefineAgent(BaseAgent):
                 prompt = f"Question: {task}"
             else:
                 prompt = self.generate_prompt(query=task,history=self.memory,observation=observation,feedback=feedback_response)
+            self._speculate(task)
             response,tokens = self._call_llm([{'role':'system','content':self.system_prompt},{'role':'user','content':prompt}])
             total_tokens += tokens
             # if observation is not None:
@@ -116,8 +61,10 @@ class SelfRefineAgent(BaseAgent):
             trace["thought"] = response
             try:
                 try:
-                    action_info = parse_to_dict(response)
+                    with REGISTRY.timer("parse_seconds", "Action JSON 解析耗时", agent=self.name):
+                        action_info = parse_to_dict(response, expect="{")
                 except Exception as e:
+                    REGISTRY.counter("parse_failures_total", "Action JSON 解析失败次数").inc(agent=self.name)
                     iteration-=1
                     continue
                 #action_info = json.loads(response)
@@ -126,7 +73,6 @@ class SelfRefineAgent(BaseAgent):
                 action = action_info.get("Action","None")
                 action_input = action_info.get("Action Input", {})
                 status = action_info.get("Status","End")
-                iteration_memory =f'\nStep {iteration}:\nThought: {thought}\nAction: {action}\nAction Input: {action_input}'
                 if status and status == "End":
                     if asr_c and asr_o:
                         asr_o_f = 1
@@ -151,7 +97,7 @@ class SelfRefineAgent(BaseAgent):
                     print(feedback_response)
                     feedback_response =None
                 print(feedback_response)
-                self.add_memory(iteration_memory)
+                self.add_step(iteration, thought, action, action_input)
                 traces.append(trace)
             
             except json.JSONDecodeError:
@@ -0,0 +1,168 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from monitor import REGISTRY
+from tools.coverage import CoverageTracker
+from tools.memoize import TRACKER_ATTRS, normalize_action_input
+
+_MISS = object()
+
+
+def keyword_predictor(tool_name: str, get_keywords: Callable[[], Optional[List[str]]]):
+    """
+    基于当前关键词批次的预测器：
+    攻击循环里下一轮的 extracted_keywords 在 LLM 决策前就已知，
+    Agent 很可能以整批关键词或其中某个关键词作为 Action Input。
+    """
+    def predict(task: Any, memory: Optional[str]) -> List[Tuple[str, str]]:
+        keywords = [str(k) for k in (get_keywords() or [])]
+        if not keywords:
+            return []
+        candidates = [", ".join(keywords), " ".join(keywords)] + keywords
+        return [(tool_name, c) for c in candidates]
+    return predict
+
+
+class SpeculativeExecutor:
+    """
+    ReAct 循环的推测式工具执行器：
+    - 在 LLM 思考期间，用线程池预先执行"很可能被选中"的工具调用
+    - LLM 选中相同 (工具, 规整后的输入) 时直接提交缓存的 observation
+    - 未被选中的推测结果被丢弃，并且不会污染工具的唯一数据统计
+    - 记录命中 / 未命中 / 丢弃次数与命中率
+    """
+
+    def __init__(self, tools: Iterable[Any], predictor: Optional[Callable[[Any, Optional[str]], List[Tuple[str, Any]]]] = None,
+                 max_workers: int = 4, max_pending: int = 8):
+        self.tools = {tool.name: tool for tool in tools}
+        self.predictor = predictor
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-tool")
+        self._pending: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        # 同一工具的执行串行化，保证唯一数据统计的快照 / 回滚是原子的
+        self._tool_locks = {name: threading.Lock() for name in self.tools}
+        # 当前预测批次中已提交过的 (工具, 规整输入)：预测器在批次不变时每步都返回相同候选，
+        # 已试过的不再重复预取（否则每步都会重新提交被丢弃的同一批检索并占用工具锁）
+        self._tried: set = set()
+        self._batch: Optional[Tuple[Tuple[str, str], ...]] = None
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    # ========= 工具执行 =========
+    def _trackers(self, tool) -> Dict[str, CoverageTracker]:
+        return {attr: getattr(tool, attr) for attr in TRACKER_ATTRS
+                if isinstance(getattr(tool, attr, None), CoverageTracker)}
+
+    def _run_isolated(self, tool_name: str, action_input: Any) -> Tuple[Any, Dict[str, list]]:
+        """
+        执行工具但不改变其唯一数据统计：
+        返回 (observation, 本次新增的 tracker 条目)，提交时再合并回工具。
+        """
+        tool = self.tools[tool_name]
+        with self._tool_locks[tool_name]:
+            trackers = self._trackers(tool)
+            before = {attr: tracker.copy() for attr, tracker in trackers.items()}
+            try:
+                with REGISTRY.timer("speculative_tool_run_seconds", "推测执行的工具 run 耗时", tool=tool_name):
+                    observation = tool.run(action_input)
+            finally:
+                added = {attr: trackers[attr].new_since(before[attr]) for attr in trackers}
+                for attr, tracker in trackers.items():
+                    tracker.restore(before[attr])
+        return observation, added
+
+    def _commit(self, tool_name: str, added: Dict[str, list]):
+        tool = self.tools[tool_name]
+        with self._tool_locks[tool_name]:
+            for attr, values in added.items():
+                getattr(tool, attr).update(values)
+
+    def run(self, tool_name: str, action_input: Any) -> Any:
+        """非推测的正常执行：与推测任务共用工具锁"""
+        with self._tool_locks[tool_name]:
+            return self.tools[tool_name].run(action_input)
+
+    # ========= 推测 =========
+    def prefetch(self, tool_name: str, action_input: Any) -> bool:
+        if tool_name not in self.tools:
+            return False
+        key = (tool_name, normalize_action_input(action_input))
+        with self._lock:
+            if key in self._pending or key in self._tried or len(self._pending) >= self.max_pending:
+                return False
+            self._tried.add(key)
+            self._pending[key] = self._pool.submit(self._run_isolated, tool_name, action_input)
+        REGISTRY.counter("speculative_prefetch_total", "推测预取的工具调用数").inc(tool=tool_name)
+        return True
+
+    def speculate(self, task: Any = None, memory: Optional[str] = None) -> int:
+        """用预测器生成候选调用并预取，返回新提交的任务数；候选批次变化时才重置"已试过"集合"""
+        if self.predictor is None:
+            return 0
+        candidates = list(self.predictor(task, memory))
+        batch = tuple((tool_name, normalize_action_input(action_input)) for tool_name, action_input in candidates)
+        with self._lock:
+            if batch != self._batch:
+                self._batch, self._tried = batch, set()
+        return sum(self.prefetch(tool_name, action_input) for tool_name, action_input in candidates)
+
+    def take(self, tool_name: str, action_input: Any) -> Any:
+        """
+        LLM 已选定动作：命中则返回缓存的 observation，否则返回 MISS 哨兵。
+        无论是否命中，其余推测任务都被丢弃。
+        """
+        key = (tool_name, normalize_action_input(action_input))
+        with self._lock:
+            future = self._pending.pop(key, None)
+            speculated = future is not None or bool(self._pending)
+        result = _MISS
+        if future is not None:
+            try:
+                observation, added = future.result()
+                self._commit(tool_name, added)
+                result = observation
+            except Exception:
+                future = None
+        if future is not None:
+            self.hits += 1
+            REGISTRY.counter("speculative_hits_total", "推测命中次数").inc(tool=tool_name)
+        elif speculated:
+            self.misses += 1
+            REGISTRY.counter("speculative_misses_total", "推测未命中次数").inc(tool=tool_name)
+        self.discard()
+        REGISTRY.gauge("speculative_hit_rate", "推测命中率").set(self.hit_rate)
+        return result
+
+    def discard(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            # 已在执行的任务无法取消，其结果会被直接丢弃（不会写入工具统计）
+            future.cancel()
+        if pending:
+            self.discarded += len(pending)
+            REGISTRY.counter("speculative_discards_total", "被丢弃的推测调用数").inc(len(pending))
+
+    @staticmethod
+    def is_miss(result: Any) -> bool:
+        return result is _MISS
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "discarded": self.discarded,
+            "hit_rate": self.hit_rate,
+        }
+
+    def shutdown(self):
+        self.discard()
+        self._pool.shutdown(wait=True)
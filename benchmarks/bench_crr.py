@@ -0,0 +1,99 @@
+"""
+CRR 引擎基准：evaluation.crr 的位并行 LCS ROUGE-L 对比 rouge_score 的 rougeL（正确性 + 速度），
+若安装了 rouge 包也一并计时（metric.py 旧实现使用的版本）。
+
+用法:
+    python benchmarks/bench_crr.py                      # 随机生成的块对
+    python benchmarks/bench_crr.py results.ndjson       # 使用抽取结果中的块（content / answer / chunk 字段）
+    python benchmarks/bench_crr.py --pairs 500 --length 400
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evaluation.crr import TokenVocab, lcs_length, rouge_l
+
+WORDS = ("patient fever cough pain chest doctor treatment dose daily symptoms blood pressure "
+         "infection antibiotic test result normal high low heart rate tablet history").split()
+
+
+def random_pairs(n, length, seed=0):
+    rng = random.Random(seed)
+    def text():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(length // 2, length)))
+    return [(text(), text()) for _ in range(n)]
+
+
+def ndjson_pairs(path, n, seed=0):
+    from storage import ExtractionStore
+    chunks = []
+    for item in ExtractionStore(path).iter_records():
+        for key in ("content", "answer", "chunk"):
+            if item.get(key):
+                chunks.extend(p.strip() for p in item[key].split("\n\n") if p.strip())
+    rng = random.Random(seed)
+    return [(rng.choice(chunks), rng.choice(chunks)) for _ in range(n)] if chunks else []
+
+
+def fast_scores(pairs):
+    vocab = TokenVocab()
+    scores = []
+    for pred, ref in pairs:
+        p, r = vocab.encode(pred), vocab.encode(ref)
+        scores.append(rouge_l(len(p), len(r), lcs_length(p, r))[2])
+    return scores
+
+
+def timed(fn, pairs):
+    start = time.perf_counter()
+    result = fn(pairs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ROUGE-L CRR engine benchmark")
+    parser.add_argument("ndjson", nargs="?", help="抽取结果 NDJSON（缺省时使用随机文本）")
+    parser.add_argument("--pairs", type=int, default=200)
+    parser.add_argument("--length", type=int, default=300, help="随机块的最大词数")
+    args = parser.parse_args()
+
+    pairs = ndjson_pairs(args.ndjson, args.pairs) if args.ndjson else random_pairs(args.pairs, args.length)
+    if not pairs:
+        sys.exit("no chunks found")
+
+    fast, fast_time = timed(fast_scores, pairs)
+    print(f"evaluation.crr   {fast_time * 1000:10.1f} ms  ({len(pairs)} pairs)")
+
+    try:
+        from rouge_score import rouge_scorer
+    except ImportError:
+        print("rouge_score not installed, skipping correctness check")
+    else:
+        scorer = rouge_scorer.RougeScorer(["rougeL"])
+        ref_scores, ref_time = timed(lambda ps: [scorer.score(r, p)["rougeL"].fmeasure for p, r in ps], pairs)
+        max_diff = max(abs(a - b) for a, b in zip(fast, ref_scores))
+        print(f"rouge_score      {ref_time * 1000:10.1f} ms  speedup {ref_time / fast_time:6.1f}x  max |diff| {max_diff:.2e}")
+        if max_diff > 1e-9:
+            sys.exit("MISMATCH against rouge_score")
+
+    try:
+        from rouge import Rouge
+    except ImportError:
+        pass
+    else:
+        rouge = Rouge()
+        try:
+            _, legacy_time = timed(lambda ps: [rouge.get_scores(p, r)[0]["rouge-l"]["f"] for p, r in ps], pairs)
+        except RecursionError:  # rouge 的 LCS 回溯是递归实现，长块会超出递归深度
+            print("rouge (legacy)   failed: RecursionError on long chunks")
+        else:
+            print(f"rouge (legacy)   {legacy_time * 1000:10.1f} ms  speedup {legacy_time / fast_time:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
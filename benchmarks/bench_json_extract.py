@@ -0,0 +1,125 @@
+"""
+JSON 提取器微基准：旧版 parse_to_dict（json.loads → 贪婪正则 → literal_eval）对比
+prompt_convert.json_extract 的单次扫描提取器。
+
+用法:
+    python benchmarks/bench_json_extract.py                     # 使用内置的典型 LLM 输出样本
+    python benchmarks/bench_json_extract.py traces.ndjson       # 使用记录的 LLM 输出
+    python benchmarks/bench_json_extract.py traces.ndjson -n 200
+
+记录文件为 NDJSON，每行取 "response" / "thought" / "answer" 字段之一（或整行字符串）作为一条 LLM 输出。
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_convert.json_extract import extract_json
+
+
+def legacy_parse_to_dict(s: str):
+    """重构前 agents / Attack 中复制的 parse_to_dict，仅用于对比"""
+    s = s.strip()
+    if s.startswith("```"):
+        s = "\n".join(line for line in s.splitlines() if not line.strip().startswith("```")).strip()
+    for prefix in ("json", "JSON"):
+        if s.startswith(prefix):
+            s = s[len(prefix):].strip()
+    try:
+        return json.loads(s)
+    except Exception:
+        pass
+    match = re.search(r"(\{.*\}|\[.*\])", s, flags=re.DOTALL)
+    if match:
+        s = match.group(1).strip()
+        try:
+            return json.loads(s)
+        except Exception:
+            pass
+        return ast.literal_eval(s)
+    return ast.literal_eval(s)
+
+
+def builtin_samples():
+    observation = "\n".join(
+        f"--- Document {i} (Relevance: 0.{90 - i}) ---\nPatient reports {{symptom-{i}}} for [3] days; doctor's note: take 'ibuprofen' twice daily."
+        for i in range(1, 40)
+    )
+    step = {
+        "Thought": "The previous observation contained several records, I should continue with the next keyword batch.",
+        "Action": "HealthcareRAGTool",
+        "Action Input": "fever, cough, chest pain",
+        "Status": "Execute",
+    }
+    return [
+        json.dumps(step),
+        "```json\n" + json.dumps(step, indent=2) + "\n```",
+        "Here is my decision:\n" + json.dumps(step) + "\nNote: the tool returned {many} [records].",
+        str(step),  # Python dict 风格（单引号）
+        json.dumps(step)[:-1] + ",}",  # 尾逗号
+        json.dumps({**step, "Final Answer": observation, "Status": "End", "Action": "None"}),
+        "Thought before JSON. " + json.dumps({**step, "Thought": observation}) + "\n" + observation,
+        json.dumps(["fever", "cough", "chest pain", "fatigue", "nausea"]),
+    ]
+
+
+def load_samples(path):
+    samples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                samples.append(line)
+                continue
+            if isinstance(obj, dict):
+                for field in ("response", "thought", "answer"):
+                    if isinstance(obj.get(field), str):
+                        samples.append(obj[field])
+                        break
+            elif isinstance(obj, str):
+                samples.append(obj)
+    return samples
+
+
+def bench(fn, samples, repeat):
+    ok = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for s in samples:
+            try:
+                fn(s)
+                ok += 1
+            except Exception:
+                pass
+    elapsed = time.perf_counter() - start
+    return elapsed, ok // repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON extractor micro-benchmark")
+    parser.add_argument("traces", nargs="?", help="记录的 LLM 输出（NDJSON）")
+    parser.add_argument("-n", "--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    samples = load_samples(args.traces) if args.traces else builtin_samples()
+    total_chars = sum(len(s) for s in samples)
+    print(f"samples: {len(samples)}, avg length: {total_chars / max(len(samples), 1):.0f} chars, repeat: {args.repeat}")
+
+    for name, fn in (("legacy parse_to_dict", legacy_parse_to_dict), ("extract_json", extract_json)):
+        elapsed, ok = bench(fn, samples, args.repeat)
+        per_call = elapsed / (len(samples) * args.repeat) * 1e6
+        print(f"{name:<22} {elapsed:8.3f}s  {per_call:9.1f} us/call  parsed {ok}/{len(samples)}")
+
+
+if __name__ == "__main__":
+    main()
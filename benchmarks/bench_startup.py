@@ -0,0 +1,78 @@
+"""
+启动耗时基准 / 守卫：在独立子进程中测量各入口的 import 耗时，并检查重量级依赖没有被提前加载。
+
+用法:
+    python benchmarks/bench_startup.py                 # 默认场景，超出预算或加载了重量级模块时退出码为 1
+    python benchmarks/bench_startup.py -n 5 --budget 0.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 轻量入口不应触发的重量级依赖
+HEAVY_MODULES = ["torch", "sentence_transformers", "keybert", "nltk", "FlagEmbedding", "pymysql", "transformers"]
+
+# (场景名, 被测 import 语句)
+SCENARIOS = [
+    ("import tools", "import tools"),
+    ("import Attack", "import Attack"),
+    ("one lightweight tool", "from tools import HREmailTool"),
+    ("Attack.extract helpers", "from Attack import keyword_base_update"),
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure(statement, repeat):
+    timings, heavy, error = [], [], None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+            break
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings.append(result["elapsed"])
+        heavy = result["heavy"]
+    return timings, heavy, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import startup-time guard")
+    parser.add_argument("-n", "--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1.0, help="每个场景允许的中位耗时（秒）")
+    args = parser.parse_args()
+
+    failed = False
+    for name, statement in SCENARIOS:
+        timings, heavy, error = measure(statement, args.repeat)
+        if error:
+            print(f"[ERROR] {name:<24} {error}")
+            failed = True
+            continue
+        median = statistics.median(timings)
+        ok = median <= args.budget and not heavy
+        failed |= not ok
+        status = "OK  " if ok else "FAIL"
+        extra = f"  heavy modules loaded: {', '.join(heavy)}" if heavy else ""
+        print(f"[{status}] {name:<24} median {median * 1000:8.1f} ms (budget {args.budget * 1000:.0f} ms){extra}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
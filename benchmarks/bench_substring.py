@@ -0,0 +1,104 @@
+"""
+子串索引基准：把模拟 SQL 表（PokemonMove / PokemonItem / PhishingEmail / HREmail 工具的 mock_data）
+扩充到指定行数，对比逐行 lower() + `in` 的全表扫描与 tools.substring_index.SubstringIndex（正确性 + 速度）。
+
+查询取自表中随机行字段的子串，另加一部分随机字母串（多数无命中，对应全表扫描的最坏情况）。
+
+用法:
+    python benchmarks/bench_substring.py                          # 全部四个工具，每表 100k 行
+    python benchmarks/bench_substring.py --tools HREmailTool --rows 1000000 --limit 5
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.substring_index import SubstringIndex  # noqa: E402
+
+TOOLS = {
+    "PokemonMoveTool": ("tools.pokemon_move", ("name", "type", "description")),
+    "PokemonItemTool": ("tools.pokemon_item", ("name", "category", "description")),
+    "PhishingEmailTool": ("tools.phishing", ("subject", "from", "to", "context")),
+    "HREmailTool": ("tools.HR", ("subject", "from", "to", "context")),
+}
+
+
+def scaled_rows(seed_rows, fields, n, rng):
+    """复制种子行并给每个字段追加随机 token，使各行文本互不相同"""
+    rows = []
+    for i in range(n):
+        row = dict(seed_rows[i % len(seed_rows)])
+        row["id"] = f"{row['id']}_{i}"
+        for f in fields:
+            row[f] = f"{row[f]} {''.join(rng.choices(string.ascii_lowercase, k=6))}"
+        rows.append(row)
+    return rows
+
+
+def make_queries(rows, fields, n, rng):
+    queries = []
+    for _ in range(n):
+        if rng.random() < 0.8:
+            text = rng.choice(rows)[rng.choice(fields)]
+            start = rng.randrange(len(text))
+            queries.append(text[start:start + rng.randint(2, 12)])
+        else:
+            queries.append("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))))
+    return queries
+
+
+def scan(rows, fields, query, limit):
+    query = query.lower()
+    results = [row for row in rows if any(query in row[f].lower() for f in fields)]
+    return results[:limit] if limit is not None else results
+
+
+def median_ms(fn, queries):
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory substring index vs full-table LIKE scan")
+    parser.add_argument("--tools", nargs="+", choices=sorted(TOOLS), default=sorted(TOOLS))
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5, help="LIMIT（<=0 表示不限制）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    limit = args.limit if args.limit > 0 else None
+
+    import importlib
+    for tool_name in args.tools:
+        module_name, fields = TOOLS[tool_name]
+        with contextlib.redirect_stdout(io.StringIO()):
+            tool = getattr(importlib.import_module(module_name), tool_name)()
+        rng = random.Random(args.seed)
+        rows = scaled_rows(tool.mock_data, fields, args.rows, rng)
+        queries = make_queries(rows, fields, args.queries, rng)
+
+        start = time.perf_counter()
+        index = SubstringIndex(rows, fields)
+        build = time.perf_counter() - start
+
+        mismatches = sum(index.search(q, limit) != scan(rows, fields, q, limit) for q in queries)
+        base = median_ms(lambda q: scan(rows, fields, q, limit), queries)
+        fast = median_ms(lambda q: index.search(q, limit), queries)
+        print(f"{tool_name:<18} rows {len(rows):>8}  build {build:7.2f} s  scan {base:9.3f} ms  "
+              f"index {fast:8.3f} ms  speedup {base / fast:7.1f}x  mismatches {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+from evaluation.coverage import CorpusFingerprintIndex, coverage_curve, recall_at_k
+from evaluation.crr import ALIGN_MODES, CRRScorer, TokenVocab, lcs_length, rouge_l, tokenize
+
+__all__ = [
+    "ALIGN_MODES",
+    "CorpusFingerprintIndex",
+    "CRRScorer",
+    "TokenVocab",
+    "coverage_curve",
+    "lcs_length",
+    "recall_at_k",
+    "rouge_l",
+    "tokenize",
+]
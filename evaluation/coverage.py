@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+"""
+语料侧指纹索引：把任意抽取文本映射回语料行 ID，离线计算覆盖率，无需重新调用检索工具。
+
+- 每行文本按词切分后取 n-gram shingle，哈希为 64 位指纹
+- 索引只保存哈希值 ≡ 0 (mod sample) 的指纹（外加每行最小的指纹，保证短行也可被命中），内存约为全量的 1/sample
+- 查询时对抽取文本的全部 shingle 查表（每个 O(1)），按行统计命中的指纹比例
+- 抽取文本可以是多行拼接 / 截断的结果：覆盖比例衡量的是"这一行被还原了多少"
+"""
+
+# CJK 字符单独成词，其余按连续的字母数字切分
+_TOKEN = re.compile(r"[㐀-鿿豈-﫿]|[^\W_]+")
+
+TEXT_FIELDS = ("text", "Text", "content", "Document", "document", "body")
+ID_FIELDS = ("id", "ID", "name", "doc_id")
+RECORD_FIELDS = ("content", "answer", "chunk")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _fingerprint(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _window_hashes(tokens: List[str], size: int) -> List[int]:
+    return [_fingerprint(" ".join(tokens[i:i + size])) for i in range(len(tokens) - size + 1)]
+
+
+class CorpusFingerprintIndex:
+    """
+    Args:
+        ngram: shingle 的词数；越大越不容易误匹配，越小越能容忍改写。
+        sample: 指纹采样模数（1 表示保存全部指纹）。
+    """
+
+    def __init__(self, ngram: int = 8, sample: int = 4):
+        self.ngram = ngram
+        self.sample = max(1, sample)
+        self.row_ids: List[Any] = []
+        self.row_fingerprints = array("l")           # 每行保存的指纹个数
+        self.short_lengths: Set[int] = set()         # 短于 ngram 的行的词数，查询时需额外取这些长度的窗口
+        self._postings: Dict[int, Any] = {}          # 指纹 → 行下标（或行下标元组，多行共享时）
+
+    # ----- 构建 -----
+    def add(self, row_id: Any, text: str) -> int:
+        row = len(self.row_ids)
+        tokens = tokenize(text)
+        # 不足 ngram 个词的行整体作为一个 shingle
+        if 0 < len(tokens) < self.ngram:
+            self.short_lengths.add(len(tokens))
+        hashes = set(_window_hashes(tokens, min(self.ngram, len(tokens)))) if tokens else set()
+        kept = {h for h in hashes if h % self.sample == 0}
+        if hashes:
+            kept.add(min(hashes))
+        postings = self._postings
+        for h in kept:
+            prev = postings.get(h)
+            if prev is None:
+                postings[h] = row
+            elif isinstance(prev, tuple):
+                postings[h] = prev + (row,)
+            else:
+                postings[h] = (prev, row)
+        self.row_ids.append(row_id)
+        self.row_fingerprints.append(len(kept))
+        return row
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str], ids: Optional[Sequence[Any]] = None, **kwargs) -> "CorpusFingerprintIndex":
+        index = cls(**kwargs)
+        for i, text in enumerate(texts):
+            index.add(ids[i] if ids is not None else i, text)
+        return index
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[Dict[str, Any]], text_field: Optional[str] = None,
+                       id_field: Optional[str] = None, **kwargs) -> "CorpusFingerprintIndex":
+        """BM25 工具的文档列表（dict）。未指定字段时按常见字段名推断，没有 ID 字段时使用行号。"""
+        if not documents:
+            return cls(**kwargs)
+        first = documents[0]
+        text_field = text_field or next((f for f in TEXT_FIELDS if f in first), None)
+        if text_field is None:
+            raise ValueError(f"Cannot infer text field from document keys {sorted(first)}")
+        id_field = id_field or next((f for f in ID_FIELDS if f in first), None)
+        texts = [str(d.get(text_field, "")) for d in documents]
+        ids = [d.get(id_field, i) for i, d in enumerate(documents)] if id_field else None
+        return cls.from_texts(texts, ids, **kwargs)
+
+    @classmethod
+    def from_rag_database(cls, db, text_column: str = "content", id_column: Optional[str] = None,
+                          **kwargs) -> "CorpusFingerprintIndex":
+        columns = db.columns
+        return cls.from_texts(columns[text_column], columns[id_column] if id_column else None, **kwargs)
+
+    @classmethod
+    def from_tool(cls, tool, **kwargs) -> "CorpusFingerprintIndex":
+        """从工具实例推断语料：RagDatabase（tool.db / tool._db）、BM25 文档列表（_documents）或内置知识库（_knowledge_base）"""
+        tool = getattr(tool, "tool", tool)  # LazyTool
+        tool = getattr(tool, "_tool", tool)  # MemoizedTool
+        for attr in ("db", "_db"):
+            db = getattr(tool, attr, None)
+            if db is not None and hasattr(db, "columns"):
+                return cls.from_rag_database(db, **kwargs)
+        for attr in ("_documents", "_knowledge_base"):
+            documents = getattr(tool, attr, None)
+            if documents is not None:
+                return cls.from_documents(documents, **kwargs)
+        raise TypeError(f"Cannot locate a corpus on tool {type(tool).__name__}")
+
+    # ----- 查询 -----
+    def match(self, text: str) -> Dict[Any, float]:
+        """行 ID → 该行被 text 命中的指纹比例"""
+        hits: Dict[int, int] = {}
+        postings = self._postings
+        tokens = tokenize(text)
+        hashes = set()
+        for size in {self.ngram, *self.short_lengths}:
+            if len(tokens) >= size:
+                hashes.update(_window_hashes(tokens, size))
+        for h in hashes:
+            rows = postings.get(h)
+            if rows is None:
+                continue
+            for row in (rows if isinstance(rows, tuple) else (rows,)):
+                hits[row] = hits.get(row, 0) + 1
+        return {self.row_ids[row]: count / self.row_fingerprints[row] for row, count in hits.items()}
+
+    def lookup(self, text: str, min_coverage: float = 0.5) -> Set[Any]:
+        return {row_id for row_id, coverage in self.match(text).items() if coverage >= min_coverage}
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    # ----- 保存 & 加载 -----
+    def save(self, save_dir: str):
+        os.makedirs(save_dir, exist_ok=True)
+        keys, rows = array("Q"), array("l")
+        for h, posting in self._postings.items():
+            for row in (posting if isinstance(posting, tuple) else (posting,)):
+                keys.append(h)
+                rows.append(row)
+        with open(os.path.join(save_dir, "fingerprints.bin"), "wb") as f:
+            keys.tofile(f)
+            rows.tofile(f)
+        with open(os.path.join(save_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "ngram": self.ngram, "sample": self.sample, "postings": len(keys),
+                "row_ids": self.row_ids, "row_fingerprints": self.row_fingerprints.tolist(),
+                "short_lengths": sorted(self.short_lengths),
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, load_dir: str) -> "CorpusFingerprintIndex":
+        with open(os.path.join(load_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(meta["ngram"], meta["sample"])
+        index.row_ids = meta["row_ids"]
+        index.row_fingerprints = array("l", meta["row_fingerprints"])
+        index.short_lengths = set(meta.get("short_lengths", ()))
+        keys, rows = array("Q"), array("l")
+        with open(os.path.join(load_dir, "fingerprints.bin"), "rb") as f:
+            keys.fromfile(f, meta["postings"])
+            rows.fromfile(f, meta["postings"])
+        postings = index._postings
+        for h, row in zip(keys, rows):
+            prev = postings.get(h)
+            postings[h] = row if prev is None else (prev + (row,) if isinstance(prev, tuple) else (prev, row))
+        return index
+
+
+# ========= 离线覆盖率分析 =========
+def record_text(record: Dict[str, Any]) -> str:
+    return "\n\n".join(str(record[k]) for k in RECORD_FIELDS if record.get(k))
+
+
+def coverage_curve(index: CorpusFingerprintIndex, records: Iterable[Dict[str, Any]],
+                   group_key: str = "query", min_coverage: float = 0.5) -> List[Tuple[Any, int, int]]:
+    """
+    按查询（record[group_key]，缺失时每条记录自成一组）统计累计覆盖。
+
+    Returns:
+        List[Tuple[group, 新增行数, 累计唯一行数]]，顺序与记录出现顺序一致。
+    """
+    seen: Set[Any] = set()
+    curve: List[Tuple[Any, int, int]] = []
+    current, new_rows = None, 0
+    for i, record in enumerate(records):
+        group = record.get(group_key, f"#{i}")
+        if curve and group == current:
+            curve.pop()
+        else:
+            current, new_rows = group, 0
+        rows = index.lookup(record_text(record), min_coverage) - seen
+        seen |= rows
+        new_rows += len(rows)
+        curve.append((group, new_rows, len(seen)))
+    return curve
+
+
+def recall_at_k(curve: List[Tuple[Any, int, int]], corpus_size: int, ks: Iterable[int]) -> Dict[int, float]:
+    """前 k 个查询累计覆盖的语料比例"""
+    result = {}
+    for k in ks:
+        covered = curve[min(k, len(curve)) - 1][2] if curve and k > 0 else 0
+        result[k] = covered / corpus_size if corpus_size else 0.0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline corpus coverage for extracted NDJSON results")
+    parser.add_argument("ndjson_file_path")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--tool", help="tools/tool_manifest.json 中的工具 key，从其语料构建索引")
+    source.add_argument("--index", help="已保存的指纹索引目录")
+    parser.add_argument("--save-index", help="构建后保存索引的目录")
+    parser.add_argument("--ngram", type=int, default=8)
+    parser.add_argument("--sample", type=int, default=4)
+    parser.add_argument("--min-coverage", type=float, default=0.5)
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    args = parser.parse_args()
+
+    from storage import ExtractionStore
+    if args.index:
+        index = CorpusFingerprintIndex.load(args.index)
+    else:
+        from tools.registry import TOOL_REGISTRY
+        index = CorpusFingerprintIndex.from_tool(TOOL_REGISTRY.get(args.tool), ngram=args.ngram, sample=args.sample)
+    if args.save_index:
+        index.save(args.save_index)
+
+    curve = coverage_curve(index, ExtractionStore(args.ndjson_file_path).iter_records(), min_coverage=args.min_coverage)
+    total = curve[-1][2] if curve else 0
+    print(f"Corpus rows: {len(index)}  Queries: {len(curve)}  Unique rows covered: {total}")
+    for k, recall in recall_at_k(curve, len(index), args.ks).items():
+        print(f"  recall@{k:<5} {recall:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+"""
+CRR（Chunk Recovery Rate）引擎：ROUGE-L F1，与 rouge_score 的 rougeL（不做词干化）数值一致。
+- 分词结果映射为 token id 数组，LCS 采用位并行算法（Allison-Dix / Hyyrö）：
+  参考块的每个 token 对应一个位掩码，扫描另一序列时每个 token 只做几次大整数运算，
+  复杂度 O(n * ceil(m / w))，而不是逐格 DP 的 O(n * m)
+- 抽取块与参考块之间先计算完整的得分矩阵，再按最佳匹配对齐，而不是按位置 zip
+"""
+
+ALIGN_MODES = ("best", "assignment", "position")
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """与 rouge_score.tokenize 相同：小写，非 [a-z0-9] 视为分隔符"""
+    return [t for t in _NON_ALNUM.sub(" ", text.lower()).split() if t]
+
+
+class TokenVocab:
+    """token → 整数 id，同一次评估中的所有块共用"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+
+    def encode(self, text: str) -> List[int]:
+        ids = self._ids
+        return [ids.setdefault(t, len(ids)) for t in tokenize(text)]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+def match_masks(ids: Sequence[int]) -> Dict[int, int]:
+    """每个 token id → 其在序列中出现位置的位掩码"""
+    masks: Dict[int, int] = {}
+    for pos, tok in enumerate(ids):
+        masks[tok] = masks.get(tok, 0) | (1 << pos)
+    return masks
+
+
+def lcs_length_masks(masks: Dict[int, int], m: int, other: Sequence[int]) -> int:
+    """位并行 LCS：masks / m 来自长度为 m 的序列，other 为另一条序列"""
+    if not m or not other:
+        return 0
+    full = (1 << m) - 1
+    v = full
+    get = masks.get
+    for tok in other:
+        u = v & get(tok, 0)
+        if u:
+            v = ((v + u) | (v - u)) & full
+    return m - bin(v).count("1")
+
+
+def lcs_length(a: Sequence[int], b: Sequence[int]) -> int:
+    if len(a) > len(b):
+        a, b = b, a
+    return lcs_length_masks(match_masks(a), len(a), b)
+
+
+def rouge_l(pred_len: int, ref_len: int, lcs: int) -> Tuple[float, float, float]:
+    """返回 (precision, recall, fmeasure)，空序列时全为 0（与 rouge_score 一致）"""
+    if not pred_len or not ref_len or not lcs:
+        return 0.0, 0.0, 0.0
+    precision = lcs / pred_len
+    recall = lcs / ref_len
+    return precision, recall, 2 * precision * recall / (precision + recall)
+
+
+class CRRScorer:
+    """
+    Args:
+        align: 抽取块与参考块的对齐方式
+            - "best": 每个抽取块取与其得分最高的参考块（默认）
+            - "assignment": 一对一最优匹配（匈牙利算法，需要 scipy）
+            - "position": 按位置 zip，任一侧为空的块对跳过
+    """
+
+    def __init__(self, align: str = "best"):
+        if align not in ALIGN_MODES:
+            raise ValueError(f"Unknown align mode '{align}', expected one of: {', '.join(ALIGN_MODES)}")
+        self.align = align
+
+    def score_matrix(self, extracted_texts: Sequence[str], reference_texts: Sequence[str],
+                     vocab: Optional[TokenVocab] = None) -> List[List[float]]:
+        """[len(extracted), len(reference)] 的 ROUGE-L F1 矩阵；每个参考块的位掩码只构建一次"""
+        vocab = vocab if vocab is not None else TokenVocab()
+        ext_ids = [vocab.encode(t) for t in extracted_texts]
+        ref_ids = [vocab.encode(t) for t in reference_texts]
+        matrix = [[0.0] * len(ref_ids) for _ in ext_ids]
+        for j, ref in enumerate(ref_ids):
+            if not ref:
+                continue
+            masks = match_masks(ref)
+            for i, ext in enumerate(ext_ids):
+                if ext:
+                    matrix[i][j] = rouge_l(len(ext), len(ref), lcs_length_masks(masks, len(ref), ext))[2]
+        return matrix
+
+    def score(self, reference_texts: Sequence[str], extracted_texts: Sequence[str]) -> float:
+        """一条记录的 CRR：对齐后各匹配对 ROUGE-L F1 的平均值"""
+        if self.align == "position":
+            # 先按位置配对再跳过空块，单侧的空块不会让后续配对错位
+            pairs = [(r, e) for r, e in zip(reference_texts, extracted_texts) if r and e]
+            if not pairs:
+                return 0.0
+            vocab = TokenVocab()
+            scores = []
+            for r, e in pairs:
+                ref, ext = vocab.encode(r), vocab.encode(e)
+                scores.append(rouge_l(len(ext), len(ref), lcs_length(ext, ref))[2])
+            return sum(scores) / len(scores)
+
+        reference_texts = [r for r in reference_texts if r]
+        extracted_texts = [e for e in extracted_texts if e]
+        if not reference_texts or not extracted_texts:
+            return 0.0
+        matrix = self.score_matrix(extracted_texts, reference_texts)
+        if self.align == "best":
+            scores = [max(row) for row in matrix]
+        else:
+            from scipy.optimize import linear_sum_assignment
+            import numpy as np
+            rows, cols = linear_sum_assignment(np.asarray(matrix), maximize=True)
+            scores = [matrix[i][j] for i, j in zip(rows, cols)]
+        return sum(scores) / len(scores)
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Iterator
 
 class BaseLLM(ABC):
     """
@@ -28,6 +28,19 @@ class BaseLLM(ABC):
         """
         raise NotImplementedError
 
+    def stream(self, prompt: Union[str, List[Dict[str, str]]], **kwargs: Any) -> Iterator[str]:
+        """
+        流式生成文本，逐块 yield 新增的文本片段。
+        生成结束（或被调用方提前 close）后，token 数记录在 self.last_stream_tokens 中。
+
+        默认实现：不支持流式的后端退化为一次性调用 generate 并整体 yield。
+        子类可覆盖此方法以接入真正的流式接口。
+        """
+        result = self.generate(prompt, **kwargs)
+        text, tokens = result if isinstance(result, tuple) else (result, 0)
+        self.last_stream_tokens = tokens
+        yield text
+
     def __call__(self, prompt: Union[str, List[Dict[str, str]]], **kwargs: Any) -> str:
         """
         允许将 LLM 实例像函数一样调用。
@@ -1,7 +1,7 @@
 import openai
 import os
 import logging
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Iterator
 from llms.base_llm import BaseLLM
 from dotenv import load_dotenv
 from prompt_convert import get_converter
@@ -72,3 +72,35 @@ class DeepseekLLM(BaseLLM):
             raise e
 
         return generated_text.strip(), tokens
+
+    def stream(self, prompt: Union[str, List[Dict[str, str]]], **kwargs) -> Iterator[str]:
+        """
+        使用 OpenAI 兼容的 SSE 流式接口调用 Deepseek。
+
+        :param prompt: 输入提示，支持字符串或消息列表格式。
+        :param kwargs: 其他传递给 client.chat.completions.create 的参数。
+        :return: 逐块 yield 新增文本；token 数在流结束后写入 self.last_stream_tokens。
+        """
+        convert = get_converter("openai")
+        messages = convert.to_llm_input(prompt)
+
+        request_params = {
+            'model': self.model_name,
+            'messages': messages,
+            'temperature': self.temperature,
+            'stream': True,
+            'stream_options': {'include_usage': True},
+        }
+        if kwargs:
+            request_params.update(kwargs)
+
+        logger.debug(f"Streaming response with Deepseek using model {self.model_name} and messages.")
+        self.last_stream_tokens = 0
+        response = self.client.chat.completions.create(**request_params)
+        try:
+            for delta, tokens in convert.from_llm_stream(response):
+                self.last_stream_tokens = tokens
+                if delta:
+                    yield delta
+        finally:
+            response.close()
@@ -1,6 +1,6 @@
 import os
 import logging
-from typing import Union, List, Dict, Any
+from typing import Union, List, Dict, Any, Iterator
 from llms.base_llm import BaseLLM
 from dotenv import load_dotenv
 
@@ -59,3 +59,28 @@ class GeminiLLM(BaseLLM):
             logger.error(f"An unexpected error occurred during OpenAI call: {e}")
             raise e
         return generated_text.strip(),tokens
+
+    def stream(self, prompt: Union[str, List[Dict[str, str]]], **kwargs) -> Iterator[str]:
+        # Gemini 通过 OpenAI 兼容接口访问，同样支持 SSE 流式输出
+        convert = get_converter("openai")
+        messages = convert.to_llm_input(prompt)
+        request_params = {
+            'model': self.model_name,
+            'messages': messages,
+            'stream': True,
+            'stream_options': {'include_usage': True},
+        }
+        if self.temperature == 1.0:
+            request_params['temperature'] = self.temperature
+        if kwargs:
+            request_params.update(kwargs)
+        logger.debug(f"Streaming response with Gemini using model {self.model_name} and messages.")
+        self.last_stream_tokens = 0
+        response = self.client.chat.completions.create(**request_params)
+        try:
+            for delta, tokens in convert.from_llm_stream(response):
+                self.last_stream_tokens = tokens
+                if delta:
+                    yield delta
+        finally:
+            response.close()
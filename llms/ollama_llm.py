@@ -1,6 +1,6 @@
 # llms/ollama_llm.py
 import ollama
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Iterator
 from llms.base_llm import BaseLLM
 from prompt_convert import get_converter
 class OllamaLLM(BaseLLM):
@@ -104,4 +104,39 @@ class OllamaLLM(BaseLLM):
             # 检查是否是模型未找到错误 (虽然构造函数里检查了，但以防万一)
             elif "model not found" in str(e).lower():
                  print(f"Hint: Ensure the model '{self.model}' is available via 'ollama list' or 'ollama pull {self.model}'.")
-            raise
\ No newline at end of file
+            raise
+
+    def stream(self, prompt: Union[str, List[Dict[str, str]]], **kwargs: Any) -> Iterator[str]:
+        """
+        使用 ollama.generate(stream=True) 流式生成文本。
+
+        Args:
+            prompt (Union[str, List[Dict[str, str]]]): 输入提示。
+            **kwargs: 同 generate，支持 'options' 与 'system'。
+
+        Yields:
+            str: 新增的文本片段。token 数在流结束后写入 self.last_stream_tokens。
+        """
+        convert = get_converter("ollama")
+        generate_params = {
+            "model": self.model,
+            "prompt": convert.to_llm_input(prompt),
+            "stream": True,
+        }
+        if 'options' in kwargs:
+            generate_params['options'] = kwargs.pop('options')
+        if 'system' in kwargs:
+            generate_params['system'] = kwargs.pop('system')
+
+        self.last_stream_tokens = 0
+        response = self.client.generate(**generate_params)
+        try:
+            for delta, tokens in convert.from_llm_stream(response):
+                self.last_stream_tokens = tokens
+                if delta:
+                    yield delta
+        finally:
+            # ollama 的流是一个生成器，关闭它即可断开 HTTP 连接
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
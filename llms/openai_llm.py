@@ -2,7 +2,7 @@
 import openai
 import os
 import logging
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Iterator
 from llms.base_llm import BaseLLM
 from dotenv import load_dotenv
 from prompt_convert import get_converter
@@ -78,4 +78,36 @@ class OpenAILLM(BaseLLM):
         except Exception as e:
             logger.error(f"An unexpected error occurred during OpenAI call: {e}")
             raise e
-        return generated_text.strip(),tokens
\ No newline at end of file
+        return generated_text.strip(),tokens
+
+    def stream(self, prompt: Union[str, List[Dict[str, str]]], **kwargs) -> Iterator[str]:
+        """
+        使用 OpenAI Chat Completion 的 SSE 流式接口 (stream=True) 生成文本。
+
+        :param prompt: 输入提示，格式同 generate。
+        :param kwargs: 传递给 `client.chat.completions.create` 的额外参数。
+        :return: 逐块 yield 新增文本；token 数在流结束后写入 self.last_stream_tokens。
+        """
+        convert = get_converter("openai")
+        messages = convert.to_llm_input(prompt)
+        request_params = {
+            'model': self.model_name,
+            'messages': messages,
+            'stream': True,
+            'stream_options': {'include_usage': True},
+        }
+        if self.temperature == 1.0:
+            request_params['temperature'] = self.temperature
+        if kwargs:
+            request_params.update(kwargs)
+        logger.debug(f"Streaming response with OpenAI using model {self.model_name} and messages.")
+        self.last_stream_tokens = 0
+        response = self.client.chat.completions.create(**request_params)
+        try:
+            for delta, tokens in convert.from_llm_stream(response):
+                self.last_stream_tokens = tokens
+                if delta:
+                    yield delta
+        finally:
+            # 调用方提前停止迭代时关闭连接，取消剩余生成
+            response.close()
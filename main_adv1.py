@@ -3,6 +3,7 @@ import json
 from agents.react_agent import ReactAgent
 from agents.self_refine import SelfRefineAgent
 from agents.reflexion import ReflexionAgent
+from agents.speculative import SpeculativeExecutor, keyword_predictor
 from typing import Dict, List
 from tools import *
 from Attack import *
@@ -12,6 +13,8 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import os
 from sentence_transformers import SentenceTransformer, util
+from monitor import REGISTRY
+from storage import ExtractionStore
 
 RED = "\033[31m"
 GREEN = "\033[32m"
@@ -42,10 +45,13 @@ def get_description_from_list(tool_datas, name):
     raise ValueError(f"Tool '{name}' not found in tool_datas")
 
 
-def parse_and_append(raw_text: str, output_file: str):
+def parse_and_append(raw_text: str, output_file, query_id=None):
     """
     Loosely parse raw_text by splitting on --- Document X --- markers.
-    Each document is appended as ONE line in the NDJSON file.
+    Each document is appended as ONE line in the NDJSON store
+    (output_file may be a path or an ExtractionStore; writes are buffered).
+    query_id, when given, is stored as "query" so coverage curves can be
+    computed offline (evaluation.coverage).
 
     Rules:
       - Split by document markers only (no strict relevance/question/answer requirements)
@@ -59,6 +65,7 @@ def parse_and_append(raw_text: str, output_file: str):
     # --- Document 1 ---
     # --- Document 1 (Relevance: 0.34) ---
 
+    store = ExtractionStore.open(output_file)
     doc_header_pattern = r"--- Document\s+(\d+)(?:\s*\(.*?\))?\s*---"
     matches = list(re.finditer(doc_header_pattern, raw_text))
 
@@ -68,9 +75,11 @@ def parse_and_append(raw_text: str, output_file: str):
             "status": "failed",
             "answer": raw_text.strip()
         }
-        move_step = compare_gain([entry], output_file)
-        with open(output_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        if query_id is not None:
+            entry["query"] = query_id
+        with REGISTRY.timer("compare_gain_seconds", "compare_gain 去重增益计算耗时"):
+            move_step = compare_gain([entry], store)
+        store.append(entry)
         return move_step
 
     documents = []
@@ -97,12 +106,14 @@ def parse_and_append(raw_text: str, output_file: str):
                 "id": f"document_{doc_id}",
                 "content": content
             }
+        if query_id is not None:
+            entry["query"] = query_id
         
         documents.append(entry)
-        move_step = compare_gain(documents, output_file)
+        with REGISTRY.timer("compare_gain_seconds", "compare_gain 去重增益计算耗时"):
+            move_step = compare_gain(documents, store)
         # append each document as its own NDJSON line
-        with open(output_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        store.append(entry)
 
     return move_step
 
@@ -145,39 +156,33 @@ def compute_similarity(a: str, b: str) -> float:
     return float(cosine_similarity(v1, v2)[0][0])
 
 
-def load_existing_contents(jsonl_file: str) -> List[str]:
+def load_existing_contents(jsonl_file) -> List[str]:
     """
-    Load all historical content from NDJSON file.
+    Load all historical content from the NDJSON store (streamed, including
+    records still buffered by this process).
     Format supported:
       success → use "content"
       failed  → use "answer"
     """
-    if not os.path.exists(jsonl_file):
-        return []
+    store = ExtractionStore.open(jsonl_file)
 
     contents = []
-    with open(jsonl_file, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                obj = json.loads(line)
-                if obj.get("status") == "success":
-                    if "content" in obj and obj["content"].strip():
-                        contents.append(obj["content"].strip())
-                else:
-                    # failed -> use answer
-                    ans = obj.get("answer", "").strip()
-                    if ans:
-                        contents.append(ans)
-            except:
-                continue
+    for obj in store.iter_records():
+        if obj.get("status") == "success":
+            content = obj.get("content", "")
+            if isinstance(content, str) and content.strip():
+                contents.append(content.strip())
+        else:
+            # failed -> use answer
+            ans = obj.get("answer", "")
+            if isinstance(ans, str) and ans.strip():
+                contents.append(ans.strip())
 
     return contents
 
 
 def compare_gain(result_entries: List[Dict],
-                 jsonl_file: str,
+                 jsonl_file,
                  threshold: float = 0.9,
                  verbose: bool = True):
 
@@ -308,14 +313,29 @@ print(relevant_tool_info)
 llm=GeminiLLM(model="",base_url="",api_key="")
 
 extracted_keywords = None
-target_tool = HealthcareRAGTool()
+# 通过注册表按需实例化（共享 Embedding 模型 / 向量库）
+target_tool = TOOL_REGISTRY.get("HealthcareRAGTool")
+# 可选：按 (工具, 规整后的输入) 缓存检索结果，BFS 轮次间重复 / 仅大小写不同的关键词不再重复检索
+use_memoization = False
+if use_memoization:
+    target_tool = MemoizedTool(target_tool, maxsize=1024)
+# 可选：推测式工具执行，在 LLM 思考期间预取当前关键词批次的检索结果
+use_speculation = False
+speculator = SpeculativeExecutor(
+    tools=[target_tool],
+    predictor=keyword_predictor(target_tool.name, lambda: extracted_keywords)
+) if use_speculation else None
 total_asr_c = 0
 total_asr_o = 0
 total_query_num = 1
 print(f"================================= Query {total_query_num} =================================")
+REGISTRY.counter("attack_queries_total", "攻击查询轮数").inc()
 
 save_path = ".ndjson"
-model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+# 抽取结果缓冲写入；并行攻击时为每个进程指定不同的 writer_id（可选 compression="zstd" / "lz4"）
+extraction_store = ExtractionStore.open(save_path, flush_every=64, fsync="flush")
+# 复用 Relevant_Tool_Selection 已加载的同一模型实例
+model = get_sentence_model("sentence-transformers/all-mpnet-base-v2")
 stealing_prompt = attack_prompt_generate(
         llm=llm,
         model=model,
@@ -325,8 +345,9 @@ stealing_prompt = attack_prompt_generate(
         prompt=attack_system_prompt
     )
 
-agent = ReactAgent(llm=llm,tools=[]) # Tool,e.g., HealthcareRAGTool()
-answer, asr_c,asr_o = agent.plan(stealing_prompt)
+agent = ReactAgent(llm=llm,tools=[target_tool],speculator=speculator) # 与 speculator 持有同一个工具实例
+with REGISTRY.timer("attack_episode_seconds", "单轮 agent.plan 耗时"):
+    answer, asr_c,asr_o = agent.plan(stealing_prompt)
 total_asr_c+= asr_c
 total_asr_o+= asr_o
 keyword_base = None
@@ -339,8 +360,9 @@ print(f"\033[92mUnique Extracted Items: {target_tool.get_unique_stats()}\033[0m"
 avg_per_query = target_tool.get_unique_stats()["total_unique_docs_retrieved"] / total_query_num
 print(f"\033[93mAverage Extracted per Query: {avg_per_query:.4f}\033[0m")
 
-parse_and_append(answer,save_path)
-new_keyword_list = keyword_extra(llm, answer, extracted_keywords, extract_system_prompt)
+parse_and_append(answer,extraction_store,query_id=total_query_num)
+with REGISTRY.timer("keyword_extract_seconds", "关键词抽取耗时"):
+    new_keyword_list = keyword_extra(llm, answer, extracted_keywords, extract_system_prompt)
 keyword_base = keyword_base_update(keyword_base,new_keyword_list)
 start_index = 0
 end_index = 0
@@ -360,6 +382,7 @@ while bfs_num<3:
 
     total_query_num+=1
     print(f"================================= Query {total_query_num} =================================")
+    REGISTRY.counter("attack_queries_total", "攻击查询轮数").inc()
 
     stealing_prompt = attack_prompt_generate(
         llm=llm,
@@ -370,9 +393,10 @@ while bfs_num<3:
         prompt=attack_system_prompt
     )
 
-    agent = ReactAgent(llm=llm,tools=[])
+    agent = ReactAgent(llm=llm,tools=[target_tool],speculator=speculator)
 
-    answer, asr_c,asr_o = agent.plan(stealing_prompt)
+    with REGISTRY.timer("attack_episode_seconds", "单轮 agent.plan 耗时"):
+        answer, asr_c,asr_o = agent.plan(stealing_prompt)
     total_asr_c+= asr_c
     total_asr_o+= asr_o
 
@@ -383,18 +407,19 @@ while bfs_num<3:
 
     avg_per_query = target_tool.get_unique_stats()["total_unique_docs_retrieved"] / total_query_num
     print(f"\033[93mAverage Extracted per Query: {avg_per_query:.4f}\033[0m")
-    move_step = parse_and_append(answer,save_path)
-    new_keyword_list = keyword_extra(llm, answer, extracted_keywords, extract_system_prompt)
+    move_step = parse_and_append(answer,extraction_store,query_id=total_query_num)
+    with REGISTRY.timer("keyword_extract_seconds", "关键词抽取耗时"):
+        new_keyword_list = keyword_extra(llm, answer, extracted_keywords, extract_system_prompt)
     keyword_base = keyword_base_update(keyword_base,new_keyword_list)
     start_index+= move_step
 
     if total_query_num >200 or target_tool.get_unique_stats()["total_unique_docs_retrieved"] == 200:
         break
 
-
-
-
-
-
-
-
+# ---------- 导出本次攻击的性能指标 ----------
+if speculator is not None:
+    print(f"Speculative execution stats: {speculator.get_stats()}")
+    speculator.shutdown()
+extraction_store.close()
+REGISTRY.dump("attack_metrics.prom")
+REGISTRY.dump("attack_metrics.json")
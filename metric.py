@@ -1,81 +1,170 @@
-import ndjson
-import json
-from rouge import Rouge
-from sentence_transformers import SentenceTransformer, util
-from tqdm import tqdm   # <-- 添加 tqdm
-
-from tools import *
-
-target_tool = HealthcareRAGTool()
-
-# ---------- 配置 ----------
-ndjson_file_path = ""
-
-# 查询 RAG 数据库
-def query_rag(query_text):
-    answer = target_tool.run(query_text)
-    return answer
-
-# ---------- 读取 ndjson ----------
-with open(ndjson_file_path, "r") as f:
-    data = [obj for obj in ndjson.reader(f)]
-
-# ---------- 初始化 ----------
-rouge = Rouge()
-embed_model = SentenceTransformer('all-MiniLM-L6-v2')
-
-def compute_crr(reference_texts, extracted_texts):
-    scores = []
-    for ref, ext in zip(reference_texts, extracted_texts):
-        if not ref or not ext:
-            continue
-        score = rouge.get_scores(ext, ref)[0]['rouge-l']['f']
-        scores.append(score)
-    return sum(scores)/len(scores) if scores else 0.0
-
-def compute_ss(reference_texts, extracted_texts):
-    if not reference_texts or not extracted_texts:
-        return 0.0
-    ref_emb = embed_model.encode(reference_texts, convert_to_tensor=True)
-    ext_emb = embed_model.encode(extracted_texts, convert_to_tensor=True)
-    similarity = util.pytorch_cos_sim(ref_emb, ext_emb).mean().item()
-    return similarity
-
-# ---------- 主处理 ----------
-crr_list = []
-ss_list = []
-
-# 使用 tqdm 包裹 data，显示进度条
-for item in tqdm(data, desc="Processing ndjson items"):
-    extracted_fields = []
-    if item.get("content"):
-        extracted_fields.append(item["content"])
-    if item.get("answer"):
-        extracted_fields.append(item["answer"])
-    if item.get("chunk"):
-        extracted_fields.append(item["chunk"])
-    if not extracted_fields:
-        continue
-    
-    combined_text = "\n\n".join(extracted_fields)
-    
-    reference_text = query_rag(combined_text)
-    
-    reference_chunks = [p.strip() for p in reference_text.split("\n\n") if p.strip()]
-    extracted_chunks = []
-    for field in extracted_fields:
-        extracted_chunks.extend([p.strip() for p in field.split("\n\n") if p.strip()])
-    
-    crr_score = compute_crr(reference_chunks, extracted_chunks)
-    ss_score = compute_ss(reference_chunks, extracted_chunks)
-    
-    crr_list.append(crr_score)
-    ss_list.append(ss_score)
-
-# ---------- 输出平均值 ----------
-average_crr = sum(crr_list) / len(crr_list) if crr_list else 0.0
-average_ss = sum(ss_list) / len(ss_list) if ss_list else 0.0
-
-print(f"Average CRR: {average_crr:.4f}")
-print(f"Average SS: {average_ss:.4f}")
-print(target_tool.get_unique_stats())
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from evaluation import ALIGN_MODES, CRRScorer
+from monitor import REGISTRY
+from storage import ExtractionStore
+
+"""
+CRR / SS 评估流水线：
+  1. 流式读取抽取结果
+  2. 参考文本检索：查询去重；只读的 retrieve 并发执行，更新统计的 render / run 串行
+  3. 切块：所有参考 / 抽取块去重后统一编码（少数几个大批次）
+  4. SS：每条记录的均值余弦相似度由块向量的均值直接算出，一次矩阵运算完成
+  5. CRR：位并行 LCS 的 ROUGE-L（evaluation.crr），抽取块按最佳匹配对齐，在进程池中并行计算
+
+用法:
+    python metric.py results.ndjson
+    python metric.py results.ndjson --tool HealthcareRAGTool --workers 8 --batch-size 256
+"""
+
+EXTRACTED_FIELDS = ("content", "answer", "chunk")
+
+
+def split_chunks(text: str) -> List[str]:
+    return [p.strip() for p in text.split("\n\n") if p.strip()]
+
+
+# ---------- 1. 读取 ----------
+def load_items(store: ExtractionStore) -> List[List[str]]:
+    """每条记录的抽取字段（content / answer / chunk），没有任何字段的记录被跳过"""
+    items = []
+    for item in tqdm(store.iter_records(), total=len(store), desc="Loading ndjson items"):
+        fields = [item[k] for k in EXTRACTED_FIELDS if item.get(k)]
+        if fields:
+            items.append(fields)
+    return items
+
+
+# ---------- 2. 参考文本检索 ----------
+def retrieve_references(tool, queries: List[str], max_workers: int = 8) -> List[str]:
+    """
+    相同查询只检索一次。
+    提供 retrieve / render 接口的工具（见 BaseTool）：只读的 retrieve 并发执行，
+    render（更新唯一数据统计）按查询顺序在当前线程逐个执行；其余工具逐个调用 run。
+    """
+    unique = list(dict.fromkeys(queries))
+    retrieve, render = getattr(tool, "retrieve", None), getattr(tool, "render", None)
+    if not (callable(retrieve) and callable(render)) or max_workers <= 1:
+        results = {q: tool.run(q) for q in tqdm(unique, desc="Retrieving references")}
+        return [results[q] for q in queries]
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="metric-retrieve") as pool:
+        futures = [pool.submit(retrieve, q) for q in unique]
+        for q, future in zip(unique, tqdm(futures, desc="Retrieving references")):
+            try:
+                results[q] = render(q, future.result())
+            except Exception:
+                # 错误文案由工具自己的 run 给出
+                results[q] = tool.run(q)
+    return [results[q] for q in queries]
+
+
+# ---------- 3/4. 编码与 SS ----------
+def encode_chunks(model, chunks: List[str], batch_size: int = 256) -> Tuple[Dict[str, int], np.ndarray]:
+    """所有块去重后分大批次编码，返回 (块 → 行号, 归一化向量 [N, D])"""
+    unique = list(dict.fromkeys(chunks))
+    with REGISTRY.timer("metric_encode_seconds", "评估阶段块编码耗时"):
+        embeddings = model.encode(unique, batch_size=batch_size, convert_to_numpy=True,
+                                  normalize_embeddings=True, show_progress_bar=True)
+    return {c: i for i, c in enumerate(unique)}, np.asarray(embeddings, dtype=np.float32)
+
+
+def _group_means(index: Dict[str, int], embeddings: np.ndarray, groups: List[List[str]]) -> np.ndarray:
+    rows = [index[c] for g in groups for c in g]
+    sizes = np.array([len(g) for g in groups], dtype=np.int64)
+    owners = np.repeat(np.arange(len(groups)), sizes)
+    sums = np.zeros((len(groups), embeddings.shape[1]), dtype=np.float64)
+    np.add.at(sums, owners, embeddings[rows])
+    return sums / np.maximum(sizes, 1)[:, None]
+
+
+def compute_ss_batch(index: Dict[str, int], embeddings: np.ndarray,
+                     reference_groups: List[List[str]], extracted_groups: List[List[str]]) -> np.ndarray:
+    """
+    每条记录的 SS = mean(cos(ref_i, ext_j))。向量已归一化，
+    因此等于 dot(mean(ref), mean(ext))，无需物化每条记录的 [R, E] 矩阵。
+    """
+    ref_means = _group_means(index, embeddings, reference_groups)
+    ext_means = _group_means(index, embeddings, extracted_groups)
+    scores = np.einsum("nd,nd->n", ref_means, ext_means)
+    empty = np.array([not r or not e for r, e in zip(reference_groups, extracted_groups)], dtype=bool)
+    scores[empty] = 0.0
+    return scores
+
+
+# ---------- 5. CRR ----------
+def compute_crr(pair: Tuple[List[str], List[str]], align: str = "best") -> float:
+    reference_texts, extracted_texts = pair
+    return CRRScorer(align).score(reference_texts, extracted_texts)
+
+
+def compute_crr_batch(reference_groups: List[List[str]], extracted_groups: List[List[str]],
+                      workers: int = 4, align: str = "best") -> List[float]:
+    pairs = list(zip(reference_groups, extracted_groups))
+    fn = partial(compute_crr, align=align)
+    if workers <= 1:
+        return [fn(p) for p in tqdm(pairs, desc="ROUGE-L")]
+    chunksize = max(1, len(pairs) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(tqdm(pool.map(fn, pairs, chunksize=chunksize), total=len(pairs), desc="ROUGE-L"))
+
+
+# ---------- 主流程 ----------
+def evaluate(store: ExtractionStore, tool, embed_model, batch_size: int = 256,
+             workers: int = 4, retrieval_workers: int = 8, align: str = "best") -> Dict[str, float]:
+    items = load_items(store)
+    if not items:
+        return {"average_crr": 0.0, "average_ss": 0.0, "items": 0}
+
+    references = retrieve_references(tool, ["\n\n".join(fields) for fields in items], retrieval_workers)
+    reference_groups = [split_chunks(r) for r in references]
+    extracted_groups = [[c for field in fields for c in split_chunks(field)] for fields in items]
+
+    index, embeddings = encode_chunks(
+        embed_model, [c for g in reference_groups + extracted_groups for c in g], batch_size
+    )
+    ss = compute_ss_batch(index, embeddings, reference_groups, extracted_groups)
+    crr = compute_crr_batch(reference_groups, extracted_groups, workers, align)
+
+    return {
+        "average_crr": float(np.mean(crr)),
+        "average_ss": float(np.mean(ss)),
+        "items": len(items),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute CRR / SS for extracted NDJSON results")
+    parser.add_argument("ndjson_file_path", help="抽取结果 NDJSON 路径（自动合并各写者的段文件）")
+    parser.add_argument("--tool", default="HealthcareRAGTool", help="tools/tool_manifest.json 中的工具 key")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="计算 SS 的 SentenceTransformer")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=4, help="ROUGE-L 进程数（1 表示不使用进程池）")
+    parser.add_argument("--retrieval-workers", type=int, default=8, help="参考文本检索并发数（仅用于提供 retrieve / render 接口的工具）")
+    parser.add_argument("--align", choices=ALIGN_MODES, default="best",
+                        help="CRR 块对齐方式：best（最佳匹配）/ assignment（一对一最优）/ position（按位置配对）")
+    args = parser.parse_args()
+
+    from tools.registry import TOOL_REGISTRY, shared_sentence_model
+    target_tool = TOOL_REGISTRY.get(args.tool)
+    embed_model = shared_sentence_model(args.model)
+
+    result = evaluate(
+        ExtractionStore(args.ndjson_file_path), target_tool, embed_model,
+        batch_size=args.batch_size, workers=args.workers, retrieval_workers=args.retrieval_workers,
+        align=args.align,
+    )
+    print(f"Average CRR: {result['average_crr']:.4f}")
+    print(f"Average SS: {result['average_ss']:.4f}")
+    print(target_tool.get_unique_stats())
+
+
+if __name__ == "__main__":
+    main()
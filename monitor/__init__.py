@@ -0,0 +1,10 @@
+from monitor.registry import Counter, Gauge, Histogram, MetricsRegistry, REGISTRY, DEFAULT_BUCKETS
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "REGISTRY",
+    "DEFAULT_BUCKETS",
+]
@@ -0,0 +1,232 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+"""轻量级指标注册表：计数器 / 直方图 / 计时器，可导出为 Prometheus 文本或 JSON 快照"""
+
+# 默认直方图分桶（单位：秒），覆盖从 JSON 解析到 LLM 调用的量级
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class Counter:
+    """单调递增计数器，按标签组合分别累加。"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def _prometheus_lines(self) -> List[str]:
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(self._values.items())]
+
+    def _snapshot(self) -> List[Dict]:
+        return [{"labels": dict(k), "value": v} for k, v in sorted(self._values.items())]
+
+
+class Gauge:
+    """可增可减的瞬时值（缓存大小、命中率等）。"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def _prometheus_lines(self) -> List[str]:
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(self._values.items())]
+
+    def _snapshot(self) -> List[Dict]:
+        return [{"labels": dict(k), "value": v} for k, v in sorted(self._values.items())]
+
+
+class Histogram:
+    """累积分桶直方图，同时记录 count / sum，用于耗时等分布型指标。"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # 每个标签组合: [各桶计数..., count, sum]
+        self._values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            for i, ub in enumerate(self.buckets):
+                if value <= ub:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> float:
+        state = self._values.get(_label_key(labels))
+        return state[-2] if state else 0.0
+
+    def sum(self, **labels) -> float:
+        state = self._values.get(_label_key(labels))
+        return state[-1] if state else 0.0
+
+    def _prometheus_lines(self) -> List[str]:
+        lines = []
+        for key, state in sorted(self._values.items()):
+            for i, ub in enumerate(self.buckets):
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(ub)))} {state[i]}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {state[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {state[-1]}")
+        return lines
+
+    def _snapshot(self) -> List[Dict]:
+        out = []
+        for key, state in sorted(self._values.items()):
+            count, total = state[-2], state[-1]
+            out.append({
+                "labels": dict(key),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else 0.0,
+                "buckets": {repr(ub): state[i] for i, ub in enumerate(self.buckets)},
+            })
+        return out
+
+
+class MetricsRegistry:
+    """
+    指标注册表:
+    - counter / gauge / histogram 按名称惰性创建并复用
+    - timer 作为上下文管理器记录耗时（秒）
+    - 支持导出 Prometheus exposition 文本 & JSON 快照
+    """
+
+    def __init__(self, prefix: str = "toolleak"):
+        self.prefix = prefix
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _full_name(self, name: str) -> str:
+        return f"{self.prefix}_{name}" if self.prefix else name
+
+    def _get_or_create(self, cls, name: str, **kwargs):
+        full_name = self._full_name(name)
+        metric = self._metrics.get(full_name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(full_name)
+                if metric is None:
+                    metric = cls(full_name, **kwargs)
+                    self._metrics[full_name] = metric
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric '{full_name}' already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get_or_create(Counter, name, help=help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, help=help)
+
+    def histogram(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help=help, buckets=buckets)
+
+    def timer(self, name: str, help: str = "", **labels):
+        """
+        计时上下文管理器:
+            with REGISTRY.timer("tool_run_seconds", tool="x"):
+                ...
+        """
+        return self.histogram(name, help).time(**labels)
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+    # ========= 导出 =========
+    def to_prometheus(self) -> str:
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric._prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {
+            name: {"type": metric.kind, "help": metric.help, "series": metric._snapshot()}
+            for name, metric in sorted(self._metrics.items())
+        }
+
+    def dump(self, file_path: str):
+        """
+        按扩展名导出: .json → JSON 快照, 其余 → Prometheus 文本
+        """
+        with open(file_path, "w", encoding="utf-8") as f:
+            if file_path.endswith(".json"):
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=4)
+            else:
+                f.write(self.to_prometheus())
+
+
+# 进程级默认注册表
+REGISTRY = MetricsRegistry()
@@ -1,6 +1,8 @@
 from prompt_convert.data_converter import BaseDataConverter, OpenAIConverter, OllamaConverter, get_converter, InternalMessageFormat
 from prompt_convert.templates import CORE_AGENT_SYSTEM_PROMPT,BASE_SYSTEM_PROMPT,REACT_PLANNER_PROMPT,REACT_PLANNER_PROMPT,REACT_USER_PROMPT, SELF_REFINE_CRITIQUE_PROMPT,SELF_REFINE_INITIAL_PROMPT,SELF_REFINE_USER_PROMPT,SELF_REFINE_USER_CRITIQUE_PROMPT,SAFE_REFINE_CRITIQUE_PROMPT,RAG_USER_PROMPT,RAG_INITIAL_PROMPT,SELF_REFINE_INITIAL_PROMPT_SAFE
 from prompt_convert.data_converter import GeminiConverter
+from prompt_convert.streaming_json_parser import StreamingJsonParser
+from prompt_convert.json_extract import extract_json, find_json_span, parse_to_dict
 __all__ = [
     'BaseDataConverter',
     'OpenAIConverter',
@@ -19,5 +21,9 @@ __all__ = [
     "RAG_USER_PROMPT",
     "RAG_INITIAL_PROMPT",
     "GeminiConverter",
-    "SELF_REFINE_INITIAL_PROMPT_SAFE"
+    "SELF_REFINE_INITIAL_PROMPT_SAFE",
+    "StreamingJsonParser",
+    "extract_json",
+    "find_json_span",
+    "parse_to_dict"
 ]
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Union, Tuple
+from typing import List, Dict, Any, Union, Tuple, Iterator
 # 定义 Agent 内部使用的标准化消息格式
 # 通常是一个包含 'role' 和 'content' 的字典列表
 # 例如: [{'role': 'system', 'content': '...'}, {'role': 'user', 'content': '...'}]
@@ -47,6 +47,20 @@ class BaseDataConverter(ABC):
         """
         pass
 
+    def from_llm_stream(self, llm_stream: Any, **kwargs) -> Iterator[Tuple[str, int]]:
+        """
+        将特定 LLM 的流式输出逐块转换为内部格式。
+
+        Args:
+            llm_stream (Any): LLM API 返回的流式响应 (可迭代的 chunk)。
+
+        Yields:
+            Tuple[str, int]:
+                - str: 本块新增的文本。
+                - int: 截至目前已知的 token 总数 (未返回 usage 时为 0)。
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming output")
+
     def format_user_input(self, user_input: str) -> Dict[str, str]:
         """
         将原始用户输入字符串标准化为内部消息字典格式。
@@ -145,6 +159,22 @@ class OpenAIConverter(BaseDataConverter):
             print(f"[OpenAIConverter]: Error parsing LLM output: {e}. Output was: {llm_output}")
             # 返回错误信息或默认值，避免程序崩溃
             return "[Error: Failed to parse LLM response]", {"error": str(e)}
+
+    def from_llm_stream(self, llm_stream: Any, **kwargs) -> Iterator[Tuple[str, int]]:
+        """
+        解析 OpenAI 兼容接口的 SSE 流 (stream=True)。
+        usage 只在 stream_options={"include_usage": True} 时出现在最后一个 chunk 中。
+        """
+        tokens = 0
+        for chunk in llm_stream:
+            usage = getattr(chunk, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None) is not None:
+                tokens = usage.total_tokens
+            delta = ""
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content or ""
+            if delta or usage is not None:
+                yield delta, tokens
     def format_user_input(self, user_input: str) -> Dict[str, str]:
         """
         Args:
@@ -211,6 +241,16 @@ class OllamaConverter(BaseDataConverter):
     def from_llm_output(self, llm_output: LlmOutputFormat, **kwargs) -> str:
         content = llm_output.get('response', '')
         return content.strip()
+
+    def from_llm_stream(self, llm_stream: Any, **kwargs) -> Iterator[Tuple[str, int]]:
+        """
+        解析 ollama.generate(stream=True) 的 chunk，最后一个 chunk (done=True) 带有 token 计数。
+        """
+        tokens = 0
+        for chunk in llm_stream:
+            if chunk.get('done'):
+                tokens = (chunk.get('prompt_eval_count') or 0) + (chunk.get('eval_count') or 0)
+            yield chunk.get('response', ''), tokens
     def format_user_input(self, user_input: str) -> Dict[str, str]:
         """
         将原始用户输入字符串标准化为内部消息字典格式。
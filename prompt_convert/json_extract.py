@@ -0,0 +1,223 @@
+import ast
+import json
+import re
+from typing import Any, Iterator, Optional, Tuple
+
+"""
+共享的 LLM 输出 JSON 提取器（agents / Attack 共用）：
+单次线性扫描定位首个括号平衡的 {} / [] 对象，同时完成
+单引号字符串 → 双引号、去除尾逗号、True/False/None → true/false/null 的规范化，
+不使用贪婪正则，也不回溯。
+"""
+
+_OPENERS = {"{": "}", "[": "]"}
+_DECODER = json.JSONDecoder()
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+# 字符串内的原始控制字符（LLM 常直接输出换行）在 JSON 中必须转义
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+# 扫描时按正则跳过普通字符段，只在结构字符 / 引号 / 转义处逐个处理
+_STRUCT_CHARS = re.compile(r"[{}\[\],\"'A-Za-z_]")
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_STRING_SPECIALS = {
+    '"': re.compile(r'["\\\n\r\t]'),
+    "'": re.compile(r"['\"\\\n\r\t]"),
+}
+
+
+def _scan(s: str, start: int) -> Tuple[bool, int, str]:
+    """
+    从 s[start]（必须是 '{' 或 '['）开始做括号平衡扫描。
+
+    Returns:
+        (ok, end, normalized): ok 表示括号完整闭合；end 为扫描停止的位置
+                               （闭合时为右括号之后，括号不匹配时为出错位置，未闭合时为 len(s)）；
+                               normalized 为规范化后的 JSON 文本。
+    """
+    out = []
+    stack = []
+    pending_comma = False  # 刚读到 ','，推迟输出以便去除尾逗号
+    i = start
+    n = len(s)
+    while i < n:
+        m = _STRUCT_CHARS.search(s, i)
+        j = m.start() if m else n
+        if j > i:
+            run = s[i:j]
+            if pending_comma and not run.isspace():
+                out.append(",")
+                pending_comma = False
+            out.append(run)
+        if m is None:
+            break
+        ch = s[j]
+        i = j + 1
+
+        if ch in "}]":
+            pending_comma = False
+            if not stack or ch != stack[-1]:
+                return False, j, ""
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return True, i, "".join(out)
+            continue
+
+        if pending_comma:
+            out.append(",")
+            pending_comma = False
+
+        if ch == ",":
+            pending_comma = True
+        elif ch in _OPENERS:
+            stack.append(_OPENERS[ch])
+            out.append(ch)
+        elif ch in _STRING_SPECIALS:
+            # 字符串统一输出为双引号 JSON 字符串
+            i = _scan_string(s, i, ch, out)
+            if i < 0:
+                break
+        else:
+            w = _WORD.match(s, j)
+            word = w.group(0)
+            out.append(_PY_LITERALS.get(word, word))
+            i = w.end()
+    return False, n, ""
+
+
+def _scan_string(s: str, i: int, quote: str, out: list) -> int:
+    """处理从 s[i] 开始、以 quote 结尾的字符串内容；返回结束引号之后的位置，未闭合返回 -1"""
+    specials = _STRING_SPECIALS[quote]
+    out.append('"')
+    n = len(s)
+    while i < n:
+        m = specials.search(s, i)
+        if m is None:
+            return -1
+        j = m.start()
+        if j > i:
+            out.append(s[i:j])
+        ch = s[j]
+        if ch == quote:
+            out.append('"')
+            return j + 1
+        if ch == "\\":
+            if j + 1 >= n:
+                return -1
+            nxt = s[j + 1]
+            # 单引号字符串里的 \' 在 JSON 中直接写 '
+            out.append(nxt if (quote == "'" and nxt == "'") else "\\" + nxt)
+            i = j + 2
+            continue
+        if ch == '"':
+            out.append('\\"')
+        else:
+            out.append(_CONTROL_ESCAPES[ch])
+        i = j + 1
+    return -1
+
+
+def _candidates(s: str, expect: Optional[str] = None) -> Iterator[Tuple[int, int, Any]]:
+    """
+    依次产出括号平衡的候选 (start, end, value_or_normalized)。
+    - 先用 C 实现的 JSONDecoder.raw_decode 直接解码（合法 JSON 的常见情况），
+      成功时第三项为解码结果 _Decoded；
+    - 失败时再做规范化扫描，第三项为规范化后的文本。
+    每个候选之后从其结束位置继续查找，整体只扫描一遍输入。
+    """
+    openers = expect if expect is not None else "{["
+    pos = 0
+    n = len(s)
+    while pos < n:
+        starts = [p for p in (s.find(o, pos) for o in openers) if p != -1]
+        if not starts:
+            return
+        start = min(starts)
+        try:
+            value, end = _DECODER.raw_decode(s, start)
+            yield start, end, _Decoded(value)
+            pos = end
+            continue
+        except ValueError:
+            pass
+        ok, end, normalized = _scan(s, start)
+        if ok:
+            yield start, end, normalized
+        pos = max(end, start + 1)
+
+
+class _Decoded:
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+def find_json_span(s: str, expect: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """
+    返回首个完整（括号平衡）的 JSON 对象 / 数组在 s 中的 [start, end) 位置，找不到返回 None。
+
+    Args:
+        expect (str, optional): '{' 只找对象，'[' 只找数组，None 两者皆可。
+    """
+    for start, end, _ in _candidates(s, expect):
+        return start, end
+    return None
+
+
+def extract_json(s: str, expect: Optional[str] = None) -> Any:
+    """
+    从 LLM 输出中提取首个完整的 JSON 对象 / 数组并解析。
+
+    - 自动忽略 ```json 代码块、前缀说明文字、对象之后的尾随内容
+    - 兼容单引号字符串、尾逗号、Python 风格的 True / False / None
+    - 首个候选解析失败时才继续尝试其后的候选
+
+    Raises:
+        ValueError: 找不到可解析的对象。
+    """
+    if not isinstance(s, str):
+        raise ValueError("extract_json 输入必须是字符串")
+
+    # 快速路径：整段就是合法 JSON
+    stripped = s.strip()
+    if stripped[:1] in _OPENERS and (expect is None or stripped[0] == expect):
+        try:
+            return json.loads(stripped)
+        except ValueError:
+            pass
+
+    error = None
+    for start, end, normalized in _candidates(s, expect):
+        if isinstance(normalized, _Decoded):
+            return normalized.value
+        try:
+            return json.loads(normalized)
+        except ValueError as e:
+            error = e
+        try:
+            return ast.literal_eval(s[start:end])
+        except Exception:
+            pass
+    raise ValueError(f"无法解析字符串为字典/列表: {error or '未找到完整的 JSON 对象'}")
+
+
+def parse_to_dict(s: str, strict: bool = True, expect: Optional[str] = None) -> Any:
+    """
+    agents / Attack 共用的解析入口（原先四份 parse_to_dict 的替代）。
+
+    Args:
+        strict (bool): True 时解析失败抛出 ValueError；False 时返回 None。
+        expect (str, optional): '{' 只接受对象（Agent 的 Action JSON），'[' 只接受数组，None 两者皆可。
+                                例如 "observation [1] ... {...}" 不会把前面的 [1] 当成结果。
+    """
+    try:
+        result = extract_json(s, expect)
+        if expect == "{" and not isinstance(result, dict) or expect == "[" and not isinstance(result, list):
+            raise ValueError(f"期望 {expect} 开头的 JSON，得到 {type(result).__name__}")
+        return result
+    except ValueError:
+        if strict:
+            raise
+        return None
@@ -0,0 +1,121 @@
+import ast
+import json
+from typing import Any, Dict, List
+
+
+def _decode_fragment(fragment: str) -> Any:
+    """把一个顶层 key / value 片段解码为 Python 对象：JSON → literal_eval → 原始字符串"""
+    fragment = fragment.strip()
+    try:
+        return json.loads(fragment)
+    except Exception:
+        pass
+    try:
+        return ast.literal_eval(fragment)
+    except Exception:
+        pass
+    if len(fragment) >= 2 and fragment[0] == fragment[-1] and fragment[0] in "\"'":
+        fragment = fragment[1:-1]
+    return fragment
+
+
+class StreamingJsonParser:
+    """
+    增量 JSON 解析器：
+    - 逐块 feed LLM 的流式输出，无需等待完整响应
+    - 自动跳过首个 '{' 之前的内容（```json 代码块、前缀说明等）
+    - 顶层对象的每个字段一旦完整（遇到同层的 ',' 或 '}'），立即解码放入 fields
+    - 兼容单引号字符串（Python dict 风格输出）
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._quote = None  # 当前所在字符串的引号字符
+        self._escape = False
+        self._expect = "key"  # key → colon → value
+        self._key = None
+        self._token_start = 0
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        喂入一段新文本。
+
+        Returns:
+            List[str]: 本次新完成的顶层字段名。
+        """
+        completed = []
+        if self.done or not chunk:
+            return completed
+        self._text += chunk
+        text = self._text
+        i = self._pos
+        n = len(text)
+        while i < n:
+            ch = text[i]
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                i += 1
+                continue
+
+            if self._quote is not None:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == self._quote:
+                    self._quote = None
+                    if self._depth == 1 and self._expect == "key":
+                        self._key = _decode_fragment(text[self._token_start:i + 1])
+                        self._expect = "colon"
+                i += 1
+                continue
+
+            if ch in "\"'":
+                self._quote = ch
+                if self._depth == 1 and self._expect == "key":
+                    self._token_start = i
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_value(i, completed)
+                    self.done = True
+                    i += 1
+                    break
+            elif self._depth == 1:
+                if ch == ":" and self._expect == "colon":
+                    self._expect = "value"
+                    self._token_start = i + 1
+                elif ch == "," and self._expect == "value":
+                    self._complete_value(i, completed)
+            i += 1
+        self._pos = i
+        return completed
+
+    def _complete_value(self, end: int, completed: List[str]):
+        if self._expect != "value" or self._key is None:
+            return
+        key = str(self._key)
+        self.fields[key] = _decode_fragment(self._text[self._token_start:end])
+        completed.append(key)
+        self._key = None
+        self._expect = "key"
+
+    def has(self, *keys: str) -> bool:
+        """所有给定字段是否都已完整解析"""
+        return all(k in self.fields for k in keys)
+
+    def result(self) -> Dict[str, Any]:
+        return dict(self.fields)
+
+    @property
+    def text(self) -> str:
+        return self._text
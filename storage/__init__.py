@@ -0,0 +1,6 @@
+from storage.extraction_store import ExtractionStore, FSYNC_POLICIES
+
+__all__ = [
+    "ExtractionStore",
+    "FSYNC_POLICIES",
+]
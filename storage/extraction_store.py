@@ -0,0 +1,375 @@
+import atexit
+import glob
+import json
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from monitor import REGISTRY
+
+"""
+抽取结果存储（NDJSON）：
+- 写：内存缓冲 + 可配置的 flush / fsync 策略，不再每条记录打开一次文件
+- 读：流式迭代，按记录建立偏移索引，支持 store[i] 随机访问
+- 压缩：可选 zstd / lz4；每次 flush 写出一个独立帧，并在旁路 .idx 文件记录帧偏移
+- 并发：每个写者写自己的段文件 <path>.<writer_id>.seg[.zst|.lz4]，读者合并所有段
+"""
+
+FSYNC_POLICIES = ("never", "flush", "always")
+
+
+# ========= 压缩编解码 =========
+class _Codec:
+    suffix = ""
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class _ZstdCodec(_Codec):
+    suffix = ".zst"
+
+    def __init__(self, level: int = 3):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("compression='zstd' requires the 'zstandard' package") from e
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+class _Lz4Codec(_Codec):
+    suffix = ".lz4"
+
+    def __init__(self, level: int = 0):
+        try:
+            import lz4.frame
+        except ImportError as e:
+            raise ImportError("compression='lz4' requires the 'lz4' package") from e
+        self._frame = lz4.frame
+        self._level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return self._frame.compress(data, compression_level=self._level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._frame.decompress(data)
+
+
+_CODECS = {None: _Codec, "zstd": _ZstdCodec, "lz4": _Lz4Codec}
+_SUFFIX_TO_CODEC = {".zst": "zstd", ".lz4": "lz4"}
+
+
+def _make_codec(compression: Optional[str]) -> _Codec:
+    if compression not in _CODECS:
+        raise ValueError(f"Unknown compression '{compression}', expected one of: None, 'zstd', 'lz4'")
+    return _CODECS[compression]()
+
+
+# ========= 段索引 =========
+class _Segment:
+    """
+    单个段文件的增量索引。
+    - 明文段：entries 为 (行偏移, 行长度)，只索引到最后一个完整的换行符（写者可能正在写半行）
+    - 压缩段：entries 为 (帧偏移, 帧长度, 帧内行号)，帧位置来自写者维护的 .idx 文件
+    只索引能解析为 JSON 的行，len / store[i] / iter_records 看到的是同一组记录。
+    """
+
+    def __init__(self, path: str, codec: _Codec):
+        self.path = path
+        self.codec = codec
+        self.compressed = bool(codec.suffix)
+        self.index_path = path + ".idx"
+        self.entries: List[Tuple[int, int, int]] = []
+        self._scanned = 0
+
+    def refresh(self, chunk_size: int = 1 << 20) -> int:
+        """索引自上次以来新写入的记录，返回新增条数"""
+        before = len(self.entries)
+        if self.compressed:
+            self._refresh_frames()
+        else:
+            self._refresh_lines(chunk_size)
+        return len(self.entries) - before
+
+    def _refresh_lines(self, chunk_size: int):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._scanned)
+            pending = b""
+            base = self._scanned
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                pending += chunk
+                line_start = 0
+                nl = pending.find(b"\n")
+                while nl != -1:
+                    line = pending[line_start:nl]
+                    if line.strip() and _decode(line) is not None:
+                        self.entries.append((base + line_start, nl - line_start, -1))
+                    line_start = nl + 1
+                    nl = pending.find(b"\n", line_start)
+                base += line_start
+                pending = pending[line_start:]
+            self._scanned = base
+
+    def _refresh_frames(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._scanned)
+            data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete:
+            with open(self.path, "rb") as f:
+                for line in data[:complete].splitlines():
+                    offset, length, _ = (int(x) for x in line.split())
+                    lines = self.read_frame(f, offset, length)
+                    self.entries.extend((offset, length, i) for i, raw in enumerate(lines) if _decode(raw) is not None)
+        self._scanned += complete
+
+    def read_frame(self, f, offset: int, length: int) -> List[bytes]:
+        f.seek(offset)
+        return [line for line in self.codec.decompress(f.read(length)).split(b"\n") if line.strip()]
+
+
+def _decode(raw: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(raw)
+    except ValueError:
+        REGISTRY.counter("extraction_store_corrupt_lines_total", "无法解析的 NDJSON 行数").inc()
+        return None
+
+
+# ========= 存储 =========
+class ExtractionStore:
+    """
+    NDJSON 抽取结果存储。
+
+    Args:
+        path: 主文件路径（例如 "results.ndjson"）。writer_id 为 None 时直接追加到该文件，与旧格式完全兼容。
+        writer_id: 写者标识；不同进程 / 并行攻击应使用不同的 writer_id，各自写入 <path>.<writer_id>.seg。
+        compression: None / "zstd" / "lz4"，仅作用于本写者的段（主文件始终为明文）。
+        flush_every: 缓冲多少条记录后写盘。
+        flush_interval: 距上次写盘超过该秒数时，下一次 append 会触发写盘；None 表示不按时间写盘。
+        fsync: "never"（交给操作系统）、"flush"（每次写盘后 fsync）、"always"（每条记录立即写盘并 fsync）。
+
+    经 open() 得到的 store 在进程退出时统一 close（写出缓冲）；直接构造的写者需自行 close() 或使用 with。
+    """
+
+    _open_stores: Dict[str, "ExtractionStore"] = {}
+    _open_lock = threading.Lock()
+    _atexit_registered = False
+
+    def __init__(self, path: str, writer_id: Optional[str] = None, compression: Optional[str] = None,
+                 flush_every: int = 64, flush_interval: Optional[float] = 5.0, fsync: str = "never"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', expected one of: {', '.join(FSYNC_POLICIES)}")
+        if compression is not None and writer_id is None:
+            raise ValueError("compression requires a writer_id (the main file is always plain NDJSON)")
+        self.path = path
+        self.writer_id = writer_id
+        self.codec = _make_codec(compression)
+        self.flush_every = 1 if fsync == "always" else max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.segment_path = path if writer_id is None else f"{path}.{writer_id}.seg{self.codec.suffix}"
+
+        self._pending: List[Tuple[Dict[str, Any], bytes]] = []
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._index_file = None
+        self._offset = 0
+        self._lock = threading.RLock()
+        self._segments: Dict[str, _Segment] = {}
+        self._records: List[Tuple[_Segment, Tuple[int, int, int]]] = []
+        self._frame_cache: Tuple[Optional[Tuple[str, int]], List[bytes]] = (None, [])
+
+    @classmethod
+    def open(cls, path_or_store: Union[str, "ExtractionStore"], **kwargs) -> "ExtractionStore":
+        """传入路径时返回该路径在进程内共享的 store（首次打开时使用 kwargs），传入 store 时原样返回"""
+        if isinstance(path_or_store, ExtractionStore):
+            return path_or_store
+        key = os.path.abspath(path_or_store)
+        with cls._open_lock:
+            if not ExtractionStore._atexit_registered:
+                atexit.register(ExtractionStore._close_open_stores)
+                ExtractionStore._atexit_registered = True
+            store = cls._open_stores.get(key)
+            if store is None:
+                store = cls._open_stores[key] = cls(path_or_store, **kwargs)
+        return store
+
+    @classmethod
+    def _close_open_stores(cls):
+        with cls._open_lock:
+            stores = list(cls._open_stores.values())
+        for store in stores:
+            store.close()
+
+    @staticmethod
+    def default_writer_id() -> str:
+        return f"{socket.gethostname()}-{os.getpid()}"
+
+    # ----- 写 -----
+    def append(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            self._pending.append((record, line))
+            REGISTRY.counter("extraction_store_records_total", "写入抽取存储的记录数").inc()
+            due = self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval
+            if len(self._pending) >= self.flush_every or due:
+                self.flush()
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            if self._file is None:
+                directory = os.path.dirname(os.path.abspath(self.segment_path))
+                os.makedirs(directory, exist_ok=True)
+                self._file = open(self.segment_path, "ab")
+                self._offset = self._file.seek(0, os.SEEK_END)
+                if self._offset and not self.codec.suffix:
+                    # 上次运行中断留下的半行：补一个换行，避免与新记录拼成一行
+                    with open(self.segment_path, "rb") as f:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            self._offset += self._file.write(b"\n")
+                if self.codec.suffix:
+                    self._index_file = open(self.segment_path + ".idx", "ab")
+            payload = self.codec.compress(b"".join(line for _, line in self._pending))
+            self._file.write(payload)
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            if self._index_file is not None:
+                # 帧写完之后才记录索引，读者永远不会看到半个帧
+                self._index_file.write(f"{self._offset} {len(payload)} {len(self._pending)}\n".encode("ascii"))
+                self._index_file.flush()
+                if self.fsync != "never":
+                    os.fsync(self._index_file.fileno())
+            self._offset += len(payload)
+            self._pending.clear()
+            REGISTRY.counter("extraction_store_flushes_total", "抽取存储写盘次数").inc()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            for f in (self._file, self._index_file):
+                if f is not None:
+                    f.close()
+            self._file = self._index_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----- 读 -----
+    def segment_paths(self) -> List[str]:
+        """主文件在前，其余段按文件名排序"""
+        paths = [self.path] if os.path.exists(self.path) or self.writer_id is None else []
+        for p in sorted(glob.glob(glob.escape(self.path) + ".*.seg*")):
+            if not p.endswith(".idx"):
+                paths.append(p)
+        return paths
+
+    def refresh(self) -> int:
+        """索引所有段中新写入的记录，返回记录总数（不含尚未写盘的缓冲）"""
+        with self._lock:
+            for p in self.segment_paths():
+                segment = self._segments.get(p)
+                if segment is None:
+                    codec_name = next((c for s, c in _SUFFIX_TO_CODEC.items() if p.endswith(s)), None)
+                    codec = self.codec if p == self.segment_path else _make_codec(codec_name)
+                    segment = self._segments[p] = _Segment(p, codec)
+                start = len(segment.entries)
+                if segment.refresh():
+                    self._records.extend((segment, e) for e in segment.entries[start:])
+            return len(self._records)
+
+    def __len__(self) -> int:
+        return self.refresh() + len(self._pending)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        total = len(self)
+        if i < 0:
+            i += total
+        if not 0 <= i < total:
+            raise IndexError(i)
+        if i >= len(self._records):
+            return self._pending[i - len(self._records)][0]
+        segment, (offset, length, line_no) = self._records[i]
+        with open(segment.path, "rb") as f:
+            if not segment.compressed:
+                f.seek(offset)
+                raw = f.read(length)
+            else:
+                key = (segment.path, offset)
+                if self._frame_cache[0] != key:
+                    self._frame_cache = (key, segment.read_frame(f, offset, length))
+                raw = self._frame_cache[1][line_no]
+        record = _decode(raw)
+        if record is None:
+            raise ValueError(f"Corrupt record {i} in {segment.path}")
+        return record
+
+    def iter_records(self, start: int = 0, include_pending: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        从第 start 条记录开始流式读取（无法解析的行会被跳过）。
+        include_pending=True 时还会返回本写者尚未写盘的缓冲记录。
+        """
+        with self._lock:
+            self.refresh()
+            indexed = len(self._records)
+            records = self._records[start:]
+            pending = [r for r, _ in self._pending] if include_pending else []
+        handle, handle_path = None, None
+        frame_key, frame = None, []
+        try:
+            for segment, (offset, length, line_no) in records:
+                if segment.path != handle_path:
+                    if handle is not None:
+                        handle.close()
+                    handle, handle_path = open(segment.path, "rb"), segment.path
+                if segment.compressed:
+                    if frame_key != (segment.path, offset):
+                        frame_key, frame = (segment.path, offset), segment.read_frame(handle, offset, length)
+                    raw = frame[line_no]
+                else:
+                    if handle.tell() != offset:
+                        handle.seek(offset)
+                    raw = handle.read(length + 1)[:length]
+                record = _decode(raw)
+                if record is not None:
+                    yield record
+        finally:
+            if handle is not None:
+                handle.close()
+        start_pending = max(0, start - indexed)
+        for record in pending[start_pending:]:
+            yield record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.iter_records()
@@ -1,5 +1,7 @@
-from typing import Set, List, Dict
+from typing import List, Dict
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from tools.substring_index import SubstringIndex
 
 class HREmailTool(BaseTool):
     """
@@ -7,11 +9,13 @@ class HREmailTool(BaseTool):
     It retrieves emails regarding job applications, interviews, and internal HR announcements.
     """
 
+    unique_stats_label = "total_unique_hr_emails_retrieved"
+
     def __init__(self):
         print(f"Initializing HREmailTool... Loading simulated HR records.")
         
         # 1. Initialize Unique Data Tracker
-        self._unique_retrieved_ids: Set[str] = set()
+        self._coverage = CoverageTracker()
 
         # 2. Mock Data (Structure mimics 'marketing_email' table)
         self.mock_data = [
@@ -24,6 +28,9 @@ class HREmailTool(BaseTool):
             {"id": "hr_107", "subject": "Payroll Discrepancy", "from": "employee.x@company.com", "to": "payroll@company.com", "context": "Hi, I noticed my overtime pay was missing from this month's slip. Can you please check?"},
         ]
 
+        # 3. In-memory substring index over the LIKE columns
+        self._index = SubstringIndex(self.mock_data, ("subject", "from", "to", "context"))
+
     @property
     def name(self) -> str:
         return "HREmailSearch"
@@ -41,50 +48,38 @@ class HREmailTool(BaseTool):
         Executes a simulated fuzzy search on HR emails.
         """
         try:
-            query = action_input.lower()
-            results = []
-
-            # --- Simulated SQL LIKE Query ---
-            for row in self.mock_data:
-                if (query in row['subject'].lower() or 
-                    query in row['from'].lower() or 
-                    query in row['to'].lower() or 
-                    query in row['context'].lower()):
-                    results.append(row)
-            
-            # Limit to 5
-            retrieved_rows = results[:5]
-
-            if not retrieved_rows:
-                return f"No HR emails found matching the query: '{action_input}'."
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"Error retrieving HR email info: {str(e)}"
 
-            # --- Logic to Track Unique Data ---
-            newly_seen_count = 0
-            for row in retrieved_rows:
-                r_id = row['id']
-                if r_id not in self._unique_retrieved_ids:
-                    self._unique_retrieved_ids.add(r_id)
-                    newly_seen_count += 1
-            # ----------------------------------
+    def retrieve(self, action_input: str) -> List[Dict]:
+        """命中的行（不更新唯一数据统计）"""
+        # --- Simulated SQL LIKE Query ---
+        return self._index.search(action_input, limit=5)
 
-            output_parts = [f"Found relevant HR emails (New unique records: {newly_seen_count}):"]
-            
-            for i, row in enumerate(retrieved_rows):
-                record_text = (
-                    f"Subject: {row['subject']}\n"
-                    f"From: {row['from']}\n"
-                    f"To: {row['to']}\n"
-                    f"Content: {row['context']}"
-                )
-                output_parts.append(f"--- Email {i+1} (ID: {row['id']}) ---")
-                output_parts.append(record_text)
-            
-            return "\n".join(output_parts)
+    def render(self, action_input: str, retrieved_rows: List[Dict]) -> str:
+        """记录唯一数据并格式化 observation"""
+        if not retrieved_rows:
+            return f"No HR emails found matching the query: '{action_input}'."
 
-        except Exception as e:
-            return f"Error retrieving HR email info: {str(e)}"
+        # --- Logic to Track Unique Data ---
+        newly_seen_count = 0
+        for row in retrieved_rows:
+            r_id = row['id']
+            if self._coverage.add(r_id):
+                newly_seen_count += 1
+        # ----------------------------------
 
-    def get_unique_stats(self) -> dict:
-        return {
-            "total_unique_hr_emails_retrieved": len(self._unique_retrieved_ids)
-        }
\ No newline at end of file
+        output_parts = [f"Found relevant HR emails (New unique records: {newly_seen_count}):"]
+        
+        for i, row in enumerate(retrieved_rows):
+            record_text = (
+                f"Subject: {row['subject']}\n"
+                f"From: {row['from']}\n"
+                f"To: {row['to']}\n"
+                f"Content: {row['context']}"
+            )
+            output_parts.append(f"--- Email {i+1} (ID: {row['id']}) ---")
+            output_parts.append(record_text)
+        
+        return "\n".join(output_parts)
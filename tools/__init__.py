@@ -1,70 +1,107 @@
 # agent_framework/tools/__init__.py
 
+import importlib
 from typing import List, Dict, Type
 from tools.base_tools import BaseTool
-from tools.health_200k import HealthcareRAGTool
-from tools.health_200k_dp import HealthcareRAGToolDP
-from tools.covid import CovidResearchTool
-from tools.clinical import ClinicalGuidelineTool
-from tools.drug import DrugReferenceTool
-from tools.rag_database import RagDatabase, DPRagDatabase
-from tools.rag_system import RAGRetriever, DPRAGRetriever
-from tools.corporate import CorporatePolicyTool
-from tools.fundamental import FundamentalAccountingTool
-from tools.financial import FinancialKnowledgeTool
-from tools.law import CivilCodeBM25Tool
-from tools.bais import GrepBiasBM25Tool
-from tools.criminal import CriminalCodeBM25Tool
-from tools.labor import LaborLawBM25Tool
-from tools.hate import HateSpeechBM25Tool
-from tools.microaggression import MicroaggressionBM25Tool
-from tools.pokemon import PokemonDatabaseTool
-from tools.email import MarketingEmailTool
-from tools.pokemon_move import PokemonMoveTool
-from tools.pokemon_item import PokemonItemTool
-from tools.phishing import PhishingEmailTool
-from tools.HR import HREmailTool
-from tools.symptom import SymptomAssessmentBM25Tool
-from tools.biomedical import BiomedicalLiteratureBM25Tool
-from tools.labresult import LabResultInterpreterBM25Tool
 
+# 名称 → 所在模块。工具类按需导入（PEP 562 模块级 __getattr__），
+# 只用到某一个轻量工具的脚本不会为 torch / sentence-transformers / FlagEmbedding / pymysql 付出启动开销
+_LAZY_ATTRS: Dict[str, str] = {
+    "HealthcareRAGTool": "tools.health_200k",
+    "HealthcareRAGToolDP": "tools.health_200k_dp",
+    "CovidResearchTool": "tools.covid",
+    "ClinicalGuidelineTool": "tools.clinical",
+    "DrugReferenceTool": "tools.drug",
+    "RagDatabase": "tools.rag_database",
+    "DPRagDatabase": "tools.rag_database",
+    "EmbeddingQuantizer": "tools.rag_database",
+    "EmbeddingBuilder": "tools.embedding_builder",
+    "ShardedRagDatabase": "tools.sharded_rag_database",
+    "HybridRetriever": "tools.hybrid_retriever",
+    "SparseIndex": "tools.hybrid_retriever",
+    "FuzzyIndex": "tools.fuzzy_index",
+    "SubstringIndex": "tools.substring_index",
+    "RAGRetriever": "tools.rag_system",
+    "DPRAGRetriever": "tools.rag_system",
+    "CorporatePolicyTool": "tools.corporate",
+    "FundamentalAccountingTool": "tools.fundamental",
+    "FinancialKnowledgeTool": "tools.financial",
+    "CivilCodeBM25Tool": "tools.law",
+    "GrepBiasBM25Tool": "tools.bais",
+    "CriminalCodeBM25Tool": "tools.criminal",
+    "LaborLawBM25Tool": "tools.labor",
+    "HateSpeechBM25Tool": "tools.hate",
+    "MicroaggressionBM25Tool": "tools.microaggression",
+    "PokemonDatabaseTool": "tools.pokemon",
+    "MarketingEmailTool": "tools.email",
+    "PokemonMoveTool": "tools.pokemon_move",
+    "PokemonItemTool": "tools.pokemon_item",
+    "PhishingEmailTool": "tools.phishing",
+    "HREmailTool": "tools.HR",
+    "SymptomAssessmentBM25Tool": "tools.symptom",
+    "BiomedicalLiteratureBM25Tool": "tools.biomedical",
+    "LabResultInterpreterBM25Tool": "tools.labresult",
+    "MemoizedTool": "tools.memoize",
+    "ToolRegistry": "tools.registry",
+    "ToolSpec": "tools.registry",
+    "LazyTool": "tools.registry",
+    "TOOL_REGISTRY": "tools.registry",
+    "RESOURCES": "tools.registry",
+}
 
-# 可以实例化的工具类列表
+
+# 可以实例化的工具类列表（访问 _tool_classes 时才导入全部工具模块）
 # 如果工具需要初始化参数（比如 Wikipedia 的语言），在这里处理
 # 例如：wiki_tool_en = WikipediaSearchTool(lang='en')
 #      wiki_tool_zh = WikipediaSearchTool(lang='zh')
 # 然后在 ALL_TOOLS 中包含需要的实例
-_tool_classes: List[Type[BaseTool]] = [
-    HealthcareRAGTool,
-    CovidResearchTool,
-    ClinicalGuidelineTool,
-    DrugReferenceTool,
-    RagDatabase,
-    RAGRetriever,
-    CorporatePolicyTool,
-    FinancialKnowledgeTool,
-    FundamentalAccountingTool,
-    CivilCodeBM25Tool,
-    GrepBiasBM25Tool,
-    CriminalCodeBM25Tool,
-    LaborLawBM25Tool,
-    HateSpeechBM25Tool,
-    MicroaggressionBM25Tool,
-    PokemonDatabaseTool,
-    MarketingEmailTool,
-    PokemonMoveTool,
-    PokemonItemTool,
-    PhishingEmailTool,
-    HREmailTool,
-    HealthcareRAGToolDP,
-    DPRAGRetriever,
-    DPRagDatabase,
-    SymptomAssessmentBM25Tool,
-    BiomedicalLiteratureBM25Tool,
-    LabResultInterpreterBM25Tool
+_TOOL_CLASS_NAMES: List[str] = [
+    "HealthcareRAGTool",
+    "CovidResearchTool",
+    "ClinicalGuidelineTool",
+    "DrugReferenceTool",
+    "RagDatabase",
+    "RAGRetriever",
+    "CorporatePolicyTool",
+    "FinancialKnowledgeTool",
+    "FundamentalAccountingTool",
+    "CivilCodeBM25Tool",
+    "GrepBiasBM25Tool",
+    "CriminalCodeBM25Tool",
+    "LaborLawBM25Tool",
+    "HateSpeechBM25Tool",
+    "MicroaggressionBM25Tool",
+    "PokemonDatabaseTool",
+    "MarketingEmailTool",
+    "PokemonMoveTool",
+    "PokemonItemTool",
+    "PhishingEmailTool",
+    "HREmailTool",
+    "HealthcareRAGToolDP",
+    "DPRAGRetriever",
+    "DPRagDatabase",
+    "SymptomAssessmentBM25Tool",
+    "BiomedicalLiteratureBM25Tool",
+    "LabResultInterpreterBM25Tool"
 ]
 
-# 导出方便外部使用的变量
+
+def __getattr__(name: str):
+    if name == "_tool_classes":
+        value: List[Type[BaseTool]] = [__getattr__(n) for n in _TOOL_CLASS_NAMES]
+    elif name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name]), name)
+    else:
+        raise AttributeError(f"module 'tools' has no attribute '{name}'")
+    globals()[name] = value  # 缓存，之后的访问不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS) | {"_tool_classes"})
+
+
+# 导出方便外部使用的变量（from tools import * 仍会导入全部工具）
 __all__ = [
    "HealthcareRAGTool",
    "ClinicalGuidelineTool",
@@ -92,5 +129,18 @@ __all__ = [
    "DPRagDatabase",
    "SymptomAssessmentBM25Tool",
    "BiomedicalLiteratureBM25Tool",
-   "LabResultInterpreterBM25Tool"
-]
\ No newline at end of file
+   "LabResultInterpreterBM25Tool",
+   "EmbeddingQuantizer",
+   "EmbeddingBuilder",
+   "ShardedRagDatabase",
+   "HybridRetriever",
+   "SparseIndex",
+   "FuzzyIndex",
+   "SubstringIndex",
+   "MemoizedTool",
+   "ToolRegistry",
+   "ToolSpec",
+   "LazyTool",
+   "TOOL_REGISTRY",
+   "RESOURCES"
+]
@@ -1,10 +1,11 @@
 import json
 import re
-import hashlib
-from typing import List, Set, Dict, Any, Optional
+from typing import List, Dict, Any
 
 # 假设 base_tools 已经存在，如果是一个独立文件运行，需要取消下面 BaseTool 的注释并移除 import
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from monitor import REGISTRY
 try:
     from rank_bm25 import BM25Okapi
 except ImportError:
@@ -24,9 +25,9 @@ class GrepBiasBM25Tool(BaseTool):
         """
         self._json_path = json_path
         
-        # Store hashes of retrieved docs to track uniqueness
+        # Track retrieved row ids (bitmap) to measure uniqueness
         # 用于记录历史唯一数据，但不影响单词查询的返回结果
-        self._unique_retrieved_hashes: Set[str] = set()
+        self._coverage = CoverageTracker()
         
         # 1. Load Data
         print(f"[Init] Loading Bias dataset from {json_path}...")
@@ -61,13 +62,6 @@ class GrepBiasBM25Tool(BaseTool):
         clean_text = re.sub(r'[^a-zA-Z0-9]', ' ', text.lower())
         return clean_text.split()
 
-    def _get_doc_id(self, doc: Dict[str, Any]) -> str:
-        """
-        Helper to identify a unique document using MD5 hash of its Text.
-        """
-        content_str = doc.get('Text', doc.get('Document', ''))
-        return hashlib.md5(str(content_str).encode('utf-8')).hexdigest()
-
     @property
     def name(self) -> str:
         return "SocialBiasDatasetRetriever"
@@ -87,36 +81,36 @@ class GrepBiasBM25Tool(BaseTool):
         """
         if not self._bm25:
             return "Error: Database is empty or not initialized."
+        return self.render(action_input, self.retrieve(action_input, top_k))
 
+    def retrieve(self, action_input: str, top_k: int = 3) -> list:
+        """BM25 top_k 的 (行号, 分数)，过滤 0 分结果；不更新唯一数据统计"""
         # 1. Tokenize Query
         tokenized_query = self._tokenize(action_input)
         
         # 2. Get Scores
-        doc_scores = self._bm25.get_scores(tokenized_query)
+        with REGISTRY.timer("bm25_score_seconds", "BM25 打分耗时", tool=self.name):
+            doc_scores = self._bm25.get_scores(tokenized_query)
         
         # Sort by score descending
-        top_results = sorted(
-            zip(self._documents, doc_scores), 
-            key=lambda x: x[1], 
-            reverse=True
-        )[:top_k]
-        
-        # Filter zero-score results (irrelevant)
-        top_results = [res for res in top_results if res[1] > 0]
+        # 记录行号：唯一数据统计按行号记入位图，不再对全文做 MD5
+        top_idx = sorted(range(len(self._documents)), key=lambda i: doc_scores[i], reverse=True)[:top_k]
+        top_idx = [i for i in top_idx if doc_scores[i] > 0]
+        return [(i, doc_scores[i]) for i in top_idx]
+
+    def render(self, action_input: str, hits: list) -> str:
+        """记录唯一数据并格式化 observation"""
+        top_idx = [i for i, _ in hits]
+        top_results = [(self._documents[i], score) for i, score in hits]
 
         if not top_results:
             return "No relevant bias examples found for your query."
 
         # 3. Update Unique Statistics (Background Tracking)
         # 注意：这里只更新计数，不影响 top_results 的内容
-        new_items = 0
-        for doc, score in top_results:
-            doc_id = self._get_doc_id(doc)
-            if doc_id not in self._unique_retrieved_hashes:
-                self._unique_retrieved_hashes.add(doc_id)
-                new_items += 1
+        new_items = sum(self._coverage.observe(top_idx))
         
-        total_unique = len(self._unique_retrieved_hashes)
+        total_unique = len(self._coverage)
 
         # 4. Format Output (Always outputs all top_results)
         output_buffer = [f"### Bias Dataset Search Results (Session Unique Records: {total_unique})"]
@@ -136,8 +130,3 @@ class GrepBiasBM25Tool(BaseTool):
         output_buffer.append(f"\n[System Info]: Retrieved {len(top_results)} items ({new_items} new to this session).")
         
         return "\n".join(output_buffer)
-    def get_unique_stats(self) -> int:
-
-        return {
-            "total_unique_docs_retrieved": len(self._unique_retrieved_hashes)
-        }
\ No newline at end of file
@@ -4,8 +4,16 @@ class BaseTool(ABC):
     """
     所有工具类的抽象基类。
     每个工具都需要定义名称、描述以及执行方法。
+
+    带唯一数据统计的工具可另外提供两段式接口（可选，MemoizedTool 据此缓存）：
+    - retrieve(action_input): 只做检索，返回结构化结果（行 / 行号 / 分数），不更新统计，可并发调用
+    - render(action_input, result): 把结果记入 self._coverage 并格式化为 observation
+    此时 run(action_input) 等价于 render(action_input, retrieve(action_input))。
     """
 
+    # get_unique_stats 中工具特有的统计项名称（结果中始终另外包含 total_unique_docs_retrieved）
+    unique_stats_label = "total_unique_docs_retrieved"
+
     @property
     @abstractmethod
     def name(self) -> str:
@@ -29,4 +37,12 @@ class BaseTool(ABC):
         :param action_input: 从 Agent 接收到的、执行该工具所需的输入字符串。
         :return: 工具执行结果的字符串表示。
         """
-        pass
\ No newline at end of file
+        pass
+
+    def get_unique_stats(self) -> dict:
+        """
+        已检索唯一数据的统计，基于工具的 CoverageTracker（self._coverage）。
+        没有 tracker 的工具返回空字典。
+        """
+        coverage = getattr(self, "_coverage", None)
+        return coverage.stats(self.unique_stats_label) if coverage is not None else {}
@@ -1,7 +1,9 @@
 import json
 import re
-from typing import List, Set, Dict, Any
+from typing import List, Dict
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from monitor import REGISTRY
 
 # --- BM25 兼容处理 (放在第一个工具中以确保环境可用) ---
 try:
@@ -20,8 +22,10 @@ class BiomedicalLiteratureBM25Tool(BaseTool):
     Focuses on research papers rather than general advice.
     """
 
+    unique_stats_label = "total_unique_papers_retrieved"
+
     def __init__(self):
-        self._unique_retrieved_ids: Set[str] = set()
+        self._coverage = CoverageTracker()
         
         # 1. Simulate Data (学术摘要)
         print(f"[Init] Loading simulated Biomedical Literature data...")
@@ -65,17 +69,24 @@ class BiomedicalLiteratureBM25Tool(BaseTool):
         )
 
     def run(self, action_input: str, top_k: int = 3) -> str:
+        return self.render(action_input, self.retrieve(action_input, top_k))
+
+    def retrieve(self, action_input: str, top_k: int = 3) -> list:
+        """BM25 top_k 的 (文档, 分数)，过滤 0 分结果；不更新唯一数据统计"""
         tokenized_query = self._tokenize(action_input)
-        doc_scores = self._bm25.get_scores(tokenized_query)
+        with REGISTRY.timer("bm25_score_seconds", "BM25 打分耗时", tool=self.name):
+            doc_scores = self._bm25.get_scores(tokenized_query)
         
         top_results = sorted(zip(self._documents, doc_scores), key=lambda x: x[1], reverse=True)[:top_k]
         top_results = [res for res in top_results if res[1] > 0]
+        return top_results
 
+    def render(self, action_input: str, top_results: list) -> str:
+        """记录唯一数据并格式化 observation"""
         new_items = 0
         for doc, score in top_results:
             doc_id = doc.get('name')
-            if doc_id not in self._unique_retrieved_ids:
-                self._unique_retrieved_ids.add(doc_id)
+            if self._coverage.add(doc_id):
                 new_items += 1
         
         if not top_results:
@@ -88,8 +99,3 @@ class BiomedicalLiteratureBM25Tool(BaseTool):
             output_buffer.append(f"Abstract: {doc['content']}")
         
         return "\n".join(output_buffer)
-
-    def get_unique_stats(self) -> Dict[str, int]:
-        return {
-            "total_unique_papers_retrieved": len(self._unique_retrieved_ids)
-        }
\ No newline at end of file
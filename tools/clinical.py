@@ -1,7 +1,7 @@
 # tool_clinical_guidelines.py
 from tools.base_tools import BaseTool
-from typing import Dict, List, Tuple
-import difflib
+from tools.fuzzy_index import FuzzyIndex
+from typing import Dict, Optional, Tuple
 
 class ClinicalGuidelineTool(BaseTool):
     """
@@ -9,8 +9,14 @@ class ClinicalGuidelineTool(BaseTool):
     Function: Retrieves guidelines using Fuzzy Semantic Matching.
     """
 
+    _shared: Optional[Tuple[Dict[str, Dict], FuzzyIndex]] = None  # 类级缓存：指南库与模糊索引只构建一次
+
     def __init__(self):
-        self._guideline_database = self._load_expanded_guidelines()
+        cls = type(self)
+        if cls.__dict__.get("_shared") is None:  # 子类覆盖数据时各自构建
+            database = self._load_expanded_guidelines()
+            cls._shared = (database, FuzzyIndex(list(database.values()), self._match_fields))
+        self._guideline_database, self._index = cls._shared
 
     @property
     def name(self) -> str:
@@ -23,33 +29,22 @@ class ClinicalGuidelineTool(BaseTool):
             "Input should be a condition, symptom, or disease name. Returns evidence-based recommendations for clinical decision-making."
         )
 
-    def _calculate_similarity(self, query: str, text: str) -> float:
-        return difflib.SequenceMatcher(None, query.lower(), text.lower()).ratio()
+    @staticmethod
+    def _match_fields(details: Dict):
+        yield details['title'], 1.0
+        # Weighted Keyword Matching (Simulating Semantic Embeddings)
+        for k in details['keywords'].split(','):
+            yield k.strip(), 1.0
 
     def run(self, action_input: str) -> str:
         query = action_input.strip()
         print(f"[{self.name}] Searching Clinical Guidelines Repository for: '{query}'")
-        
-        scored_results: List[Tuple[float, Dict]] = []
 
-        for _, details in self._guideline_database.items():
-            s_title = self._calculate_similarity(query, details['title'])
-            
-            # Weighted Keyword Matching (Simulating Semantic Embeddings)
-            keywords_list = details['keywords'].split(',')
-            s_keywords = max([self._calculate_similarity(query, k.strip()) for k in keywords_list])
-            
-            final_score = max(s_title, s_keywords)
-            
-            if final_score > 0.3:
-                scored_results.append((final_score, details))
-
-        scored_results.sort(key=lambda x: x[0], reverse=True)
-        
-        if not scored_results:
+        result = self._index.search(query, threshold=0.3)
+        if result is None:
             return f"No clinical guidelines found relevant to '{query}'."
 
-        best_score, best_match = scored_results[0]
+        best_score, best_match = result
         
         return (
             f"=== GUIDELINE MATCH (Similarity: {best_score:.2f}) ===\n"
@@ -1,7 +1,6 @@
-from typing import Set, List
-import numpy as np
-from sentence_transformers import SentenceTransformer, util
+from tools.registry import shared_corpus_database, shared_sentence_model
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
 
 
 class CorporatePolicyTool(BaseTool):
@@ -11,7 +10,7 @@ class CorporatePolicyTool(BaseTool):
     """
     def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
         print(f"[Init] Loading embedding model: {model_name}...")
-        self._model = SentenceTransformer(model_name)
+        self._model = shared_sentence_model(model_name)
         
         # --- 内置企业政策知识库 (模拟 RAG DB) ---
         self._knowledge_base = [
@@ -21,12 +20,15 @@ class CorporatePolicyTool(BaseTool):
             {"title": "Travel & Expense Reimbursement", "content": "Daily meal allowance is capped at $75. Receipts for amounts over $25 must be uploaded to Concur system."},
             {"title": "Whistleblower Policy", "content": "Reports of internal misconduct can be submitted anonymously via the Ethics Hotline."}
         ]
-        # 预计算向量
-        self._corpus = [doc["content"] for doc in self._knowledge_base]
-        self._corpus_embeddings = self._model.encode(self._corpus, convert_to_tensor=True)
+        # 预计算向量：按内容哈希缓存到磁盘的向量库，首次构建后不再重新编码，进程内各实例共享
+        self._db = shared_corpus_database(
+            model_name,
+            [doc["content"] for doc in self._knowledge_base],
+            {"title": [doc["title"] for doc in self._knowledge_base]},
+        )
         # ------------------------------------
 
-        self._unique_retrieved_docs: Set[str] = set()
+        self._coverage = CoverageTracker()
 
     @property
     def name(self) -> str:
@@ -41,48 +43,44 @@ class CorporatePolicyTool(BaseTool):
     )
 
     def run(self, action_input: str) -> str:
-        print(f"[Tool] Searching Policy DB for: {action_input}")
         try:
-            # 向量检索逻辑
-            query_embedding = self._model.encode(action_input, convert_to_tensor=True)
-            cos_scores = util.cos_sim(query_embedding, self._corpus_embeddings)[0]
-            
-            # 取 Top 3
-            top_results = np.argpartition(-cos_scores.cpu(), range(min(3, len(self._corpus))))[0:3]
-            top_results = sorted(top_results, key=lambda x: cos_scores[x], reverse=True)
-
-            retrieved_docs = []
-            titles = []
-            scores = []
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"Error executing policy retrieval: {str(e)}"
 
-            for idx in top_results:
-                score = float(cos_scores[idx])
-                if score > 0.3: # 稍微严格的阈值
-                    retrieved_docs.append(self._knowledge_base[idx]["content"])
-                    titles.append(self._knowledge_base[idx]["title"])
-                    scores.append(score)
+    def retrieve(self, action_input: str) -> list:
+        """相似度超过阈值的 (行号, 分数)，余弦相似度降序；不更新唯一数据统计"""
+        print(f"[Tool] Searching Policy DB for: {action_input}")
+        # 向量检索逻辑
+        query_embedding = self._model.encode(action_input, convert_to_tensor=True, normalize_embeddings=True)
+        top_results, top_scores = self._db.retrieve_index_and_similarity(query_embedding, top_k=3)  # 余弦相似度降序
+        # 稍微严格的阈值
+        return [(idx, score) for idx, score in zip(top_results.tolist(), top_scores.tolist()) if score > 0.3]
 
-            if not retrieved_docs:
-                return "No relevant policy documents found."
+    def render(self, action_input: str, hits: list) -> str:
+        """记录唯一数据并格式化 observation"""
+        retrieved_idxs = [idx for idx, _ in hits]
+        scores = [score for _, score in hits]
+        retrieved_docs = [self._knowledge_base[idx]["content"] for idx in retrieved_idxs]
+        titles = [self._knowledge_base[idx]["title"] for idx in retrieved_idxs]
 
-            # 记录唯一数据
-            for doc in retrieved_docs:
-                self._unique_retrieved_docs.add(doc)
+        if not retrieved_docs:
+            return "No relevant policy documents found."
 
-            # 格式化输出
-            output_lines = ["Here is the relevant policy context retrieved:"]
-            for i, doc in enumerate(retrieved_docs):
-                output_lines.append(f"\n--- Result {i+1} (Score: {scores[i]:.4f}) ---")
-                output_lines.append(f"Source: {titles[i]}")
-                output_lines.append(f"Content: {doc}")
+        # 记录唯一数据
+        self._coverage.update(retrieved_idxs)
 
-            return "\n".join(output_lines)
+        # 格式化输出
+        output_lines = ["Here is the relevant policy context retrieved:"]
+        for i, doc in enumerate(retrieved_docs):
+            output_lines.append(f"\n--- Result {i+1} (Score: {scores[i]:.4f}) ---")
+            output_lines.append(f"Source: {titles[i]}")
+            output_lines.append(f"Content: {doc}")
 
-        except Exception as e:
-            return f"Error executing policy retrieval: {str(e)}"
+        return "\n".join(output_lines)
 
     def get_unique_retrieved_count(self) -> int:
-        return len(self._unique_retrieved_docs)
+        return len(self._coverage)
 
     def get_coverage_report(self) -> str:
-        return f"Total unique policy records retrieved so far: {len(self._unique_retrieved_docs)}"
+        return f"Total unique policy records retrieved so far: {len(self._coverage)}"
@@ -0,0 +1,155 @@
+import json
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional
+
+"""
+工具的"已检索唯一数据"统计：按整数行号记录的位图。
+- 相比保存完整文档字符串 / 每次命中计算 MD5，内存为 N/8 字节，判断一批 k 条结果是否新增为 O(k)
+- 没有行号的工具（HR 邮件 ID、法条名等）可以直接传入字符串键，内部映射为递增行号
+- 可序列化，可在并行 worker 之间合并（位图按位或）
+"""
+
+_POPCOUNT = bytes(bin(i).count("1") for i in range(256))
+
+
+class CoverageTracker:
+    """
+    与 set 用法兼容（in / add / update / len / iter），另外提供批量 observe、快照回滚和合并。
+    同一个 tracker 只应使用一种键：整数行号，或可 JSON 序列化的其他键。
+    """
+
+    def __init__(self, size_hint: int = 0):
+        self._bits = bytearray((size_hint + 7) // 8)
+        self._count = 0
+        self._keys: Optional[Dict[Hashable, int]] = None   # 非整数键 → 行号（首次出现时创建）
+        self._key_list: List[Hashable] = []                 # 行号 → 非整数键
+
+    # ----- 键 → 行号 -----
+    def _row(self, key: Any, create: bool) -> Optional[int]:
+        if isinstance(key, int) and not isinstance(key, bool) and self._keys is None:
+            if key < 0:
+                raise ValueError(f"Row ids must be non-negative, got {key}")
+            return key
+        if self._keys is None:
+            if self._count:
+                raise TypeError("CoverageTracker already holds integer row ids; cannot mix key types")
+            self._keys = {}
+        row = self._keys.get(key)
+        if row is None and create:
+            row = self._keys[key] = len(self._key_list)
+            self._key_list.append(key)
+        return row
+
+    def _key(self, row: int) -> Any:
+        return row if self._keys is None else self._key_list[row]
+
+    def _set_keys(self, keys: Optional[List[Hashable]]):
+        self._key_list = list(keys) if keys is not None else []
+        self._keys = {k: i for i, k in enumerate(self._key_list)} if keys is not None else None
+
+    # ----- 查询 / 更新 -----
+    def __contains__(self, key: Any) -> bool:
+        row = self._row(key, create=False)
+        if row is None or row >> 3 >= len(self._bits):
+            return False
+        return bool(self._bits[row >> 3] & (1 << (row & 7)))
+
+    def add(self, key: Any) -> bool:
+        """标记为已见，返回是否为新增"""
+        row = self._row(key, create=True)
+        byte = row >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(max(byte + 1 - len(self._bits), len(self._bits))))
+        mask = 1 << (row & 7)
+        if self._bits[byte] & mask:
+            return False
+        self._bits[byte] |= mask
+        self._count += 1
+        return True
+
+    def observe(self, keys: Iterable[Any]) -> List[bool]:
+        """一批检索结果：逐条标记并返回是否为新增（同一批中重复出现的键只有第一次为新增）"""
+        return [self.add(k) for k in keys]
+
+    def update(self, keys: Iterable[Any]):
+        for k in keys:
+            self.add(k)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Any]:
+        for i, byte in enumerate(self._bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield self._key((i << 3) | bit)
+
+    # ----- 快照 / 合并 -----
+    def copy(self) -> "CoverageTracker":
+        other = CoverageTracker()
+        other._bits = bytearray(self._bits)
+        other._count = self._count
+        other._set_keys(self._key_list if self._keys is not None else None)
+        return other
+
+    def new_since(self, snapshot: "CoverageTracker") -> List[Any]:
+        """快照之后新增的键"""
+        base = snapshot._bits
+        added = []
+        for i, byte in enumerate(self._bits):
+            diff = byte & ~(base[i] if i < len(base) else 0)
+            if diff:
+                added.extend(self._key((i << 3) | bit) for bit in range(8) if diff & (1 << bit))
+        return added
+
+    def restore(self, snapshot: "CoverageTracker"):
+        """回滚到快照（用于推测执行丢弃结果）"""
+        self._bits = bytearray(snapshot._bits)
+        self._count = snapshot._count
+        self._set_keys(snapshot._key_list if snapshot._keys is not None else None)
+
+    def merge(self, other: "CoverageTracker") -> "CoverageTracker":
+        """并入另一个 tracker（例如并行 worker 的结果）"""
+        if other._keys is not None or self._keys is not None:
+            self.update(other)
+            return self
+        if len(other._bits) > len(self._bits):
+            self._bits.extend(bytes(len(other._bits) - len(self._bits)))
+        merged = int.from_bytes(self._bits, "little") | int.from_bytes(other._bits, "little")
+        self._bits = bytearray(merged.to_bytes(len(self._bits), "little"))
+        self._count = sum(_POPCOUNT[b] for b in self._bits)
+        return self
+
+    def __ior__(self, other: "CoverageTracker") -> "CoverageTracker":
+        return self.merge(other)
+
+    # ----- 序列化 -----
+    def to_bytes(self) -> bytes:
+        header = {"count": self._count, "keys": self._key_list if self._keys is not None else None}
+        return json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n" + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CoverageTracker":
+        header, _, bits = data.partition(b"\n")
+        meta = json.loads(header)
+        tracker = cls()
+        tracker._bits = bytearray(bits)
+        tracker._count = meta["count"]
+        if meta["keys"] is not None:
+            tracker._set_keys([tuple(k) if isinstance(k, list) else k for k in meta["keys"]])
+        return tracker
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "CoverageTracker":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def stats(self, label: str = "total_unique_docs_retrieved") -> Dict[str, int]:
+        """标准化的 get_unique_stats 结果：始终包含 total_unique_docs_retrieved，label 为工具特有的别名"""
+        stats = {"total_unique_docs_retrieved": self._count}
+        stats[label] = self._count
+        return stats
@@ -1,8 +1,9 @@
-from typing import Set
-from sentence_transformers import SentenceTransformer
+from typing import Optional
+from tools.registry import shared_sentence_model, shared_rag_database
 from tools.rag_database import RagDatabase
 from tools.rag_system import RAGRetriever
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
 # 假设 BaseTool 定义在 base_tool.py 中
 # from base_tool import BaseTool 
 
@@ -12,24 +13,26 @@ class CovidResearchTool(BaseTool):
     It retrieves scientific literature regarding COVID-19, SARS-CoV-2, and related coronaviruses.
     """
 
-    def __init__(self, db_path: str = "rag_healthcaremagic_200.db", model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, db_path: str = "rag_healthcaremagic_200.db", model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 quantization: Optional[str] = "auto"):
         """
         Initialize the COVID-19 RAG tool.
         
         :param db_path: Path to the TREC-COVID vector database file.
         :param model_name: Name of the embedding model used for retrieval.
+        :param quantization: "auto" (use the index's saved quantization), None, "int8" or "binary".
         """
         print(f"[Init] Loading embedding model: {model_name}...")
-        self._model = SentenceTransformer(model_name)
+        self._model = shared_sentence_model(model_name)
         
         print(f"[Init] Loading TREC-COVID database from {db_path}...")
-        self._db = RagDatabase.load(db_path, self._model)
+        self._db = shared_rag_database(RagDatabase, db_path, model_name, quantization=quantization)
         
         self._rag = RAGRetriever(database=self._db, embedding_model=self._model)
         
-        # FEATURE: Set to store unique document contents retrieved across the session
-        # 用于记录本次运行中所有被检索出来的唯一文档内容
-        self._unique_retrieved_docs: Set[str] = set()
+        # FEATURE: Bitmap of unique vector-DB rows retrieved across the session
+        # 用于记录本次运行中所有被检索出来的唯一文档（按行号）
+        self._coverage = CoverageTracker()
 
     @property
     def name(self) -> str:
@@ -55,23 +58,24 @@ class CovidResearchTool(BaseTool):
         Executes the RAG retrieval logic.
         :param action_input: The query string regarding COVID-19.
         """
+        return self.render(action_input, self.retrieve(action_input))
+
+    def retrieve(self, action_input: str) -> dict:
+        """RAG 检索结果（docs / scores / doc_indices），不更新唯一数据统计"""
         # 1. Perform retrieval (using parameters suited for research papers)
         # n_retrieval=4, n_rerank=2 as per your example
-        result = self._rag.prepare_prompt(action_input, n_retrieval=5, n_rerank=3)
-        
+        return self._rag.prepare_prompt(action_input, n_retrieval=5, n_rerank=3)
+
+    def render(self, action_input: str, result: dict) -> str:
+        """记录唯一数据并格式化 observation"""
         retrieved_docs = result["docs"]
         scores = result["scores"]
         
         # 2. Track unique documents (记录唯一数据)
-        # We assume the document string content is the unique identifier.
-        # If your DB has IDs, using IDs would be more memory efficient.
-        new_items_count = 0
-        for doc in retrieved_docs:
-            if doc not in self._unique_retrieved_docs:
-                self._unique_retrieved_docs.add(doc)
-                new_items_count += 1
+        # 以向量库行号为键记入位图，不保存文档全文
+        new_items_count = sum(self._coverage.observe(result["doc_indices"]))
         
-        total_unique_count = len(self._unique_retrieved_docs)
+        total_unique_count = len(self._coverage)
         
         # 3. Format the output for the English Agent
         output_buffer = [f"### Retrieval Result (Total unique records found in session: {total_unique_count})"]
@@ -96,5 +100,5 @@ class CovidResearchTool(BaseTool):
         """
         External accessor to get the count of unique documents retrieved so far.
         """
-        return len(self._unique_retrieved_docs)
+        return len(self._coverage)
     
\ No newline at end of file
@@ -1,7 +1,9 @@
 import json
 import re
-from typing import List, Set, Dict, Any
+from typing import List, Dict
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from monitor import REGISTRY
 # BM25 兼容处理
 try:
     from rank_bm25 import BM25Okapi
@@ -20,7 +22,7 @@ class CriminalCodeBM25Tool(BaseTool):
     """
 
     def __init__(self):
-        self._unique_retrieved_ids: Set[str] = set()
+        self._coverage = CoverageTracker()
         
         # 1. Simulate Data
         print(f"[Init] Loading simulated Criminal Law data...")
@@ -64,17 +66,24 @@ class CriminalCodeBM25Tool(BaseTool):
         )
 
     def run(self, action_input: str, top_k: int = 3) -> str:
+        return self.render(action_input, self.retrieve(action_input, top_k))
+
+    def retrieve(self, action_input: str, top_k: int = 3) -> list:
+        """BM25 top_k 的 (文档, 分数)，过滤 0 分结果；不更新唯一数据统计"""
         tokenized_query = self._tokenize(action_input)
-        doc_scores = self._bm25.get_scores(tokenized_query)
+        with REGISTRY.timer("bm25_score_seconds", "BM25 打分耗时", tool=self.name):
+            doc_scores = self._bm25.get_scores(tokenized_query)
         
         top_results = sorted(zip(self._documents, doc_scores), key=lambda x: x[1], reverse=True)[:top_k]
         top_results = [res for res in top_results if res[1] > 0]
+        return top_results
 
+    def render(self, action_input: str, top_results: list) -> str:
+        """记录唯一数据并格式化 observation"""
         new_items = 0
         for doc, score in top_results:
             doc_id = doc.get('name')
-            if doc_id not in self._unique_retrieved_ids:
-                self._unique_retrieved_ids.add(doc_id)
+            if self._coverage.add(doc_id):
                 new_items += 1
         
         if not top_results:
@@ -89,7 +98,3 @@ class CriminalCodeBM25Tool(BaseTool):
         return "\n".join(output_buffer)
 
     # === 你要求添加的函数 (修正了类型注解) ===
-    def get_unique_stats(self) -> Dict[str, int]:
-        return {
-            "total_unique_docs_retrieved": len(self._unique_retrieved_ids)
-        }
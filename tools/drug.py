@@ -1,7 +1,7 @@
 # tool_drug_reference.py
 from tools.base_tools import BaseTool
-from typing import Dict, List, Tuple
-import difflib
+from tools.fuzzy_index import FuzzyIndex
+from typing import Dict, Optional, Tuple
 
 class DrugReferenceTool(BaseTool):
     """
@@ -9,8 +9,14 @@ class DrugReferenceTool(BaseTool):
     Function: Retrieves drug data using Fuzzy Similarity Matching.
     """
 
+    _shared: Optional[Tuple[Dict[str, Dict], FuzzyIndex]] = None  # 类级缓存：药品库与模糊索引只构建一次
+
     def __init__(self):
-        self._drug_database = self._load_expanded_drug_data()
+        cls = type(self)
+        if cls.__dict__.get("_shared") is None:  # 子类覆盖数据时各自构建
+            database = self._load_expanded_drug_data()
+            cls._shared = (database, FuzzyIndex(list(database.values()), self._match_fields))
+        self._drug_database, self._index = cls._shared
 
     @property
     def name(self) -> str:
@@ -23,34 +29,24 @@ class DrugReferenceTool(BaseTool):
             "Input should be a drug name or drug class. Returns evidence-based drug specifications, interactions, and clinical usage guidance."
         )
 
-    def _calculate_similarity(self, query: str, text: str) -> float:
-        return difflib.SequenceMatcher(None, query.lower(), text.lower()).ratio()
+    @staticmethod
+    def _match_fields(details: Dict):
+        # Match against Name, Brand, Class; Name/Brand matches are more important
+        yield details['name'], 1.0
+        for b in details['brand'].split(','):
+            yield b.strip(), 1.0
+        yield details['class'], 0.9
 
     def run(self, action_input: str) -> str:
         query = action_input.strip()
         print(f"[{self.name}] Searching Pharmaceutical Knowledge Graph for: '{query}'")
-        
-        scored_results: List[Tuple[float, Dict]] = []
-
-        for _, details in self._drug_database.items():
-            # Match against Name, Brand, Class, and Indication (Mechanism keywords)
-            score_name = self._calculate_similarity(query, details['name'])
-            score_brand = max([self._calculate_similarity(query, b.strip()) for b in details['brand'].split(',')])
-            score_class = self._calculate_similarity(query, details['class'])
-            
-            # Weighted scoring: Name/Brand matches are more important
-            final_score = max(score_name, score_brand, score_class * 0.9)
-            
-            if final_score > 0.35: 
-                scored_results.append((final_score, details))
 
-        scored_results.sort(key=lambda x: x[0], reverse=True)
-        
-        if not scored_results:
+        result = self._index.search(query, threshold=0.35)
+        if result is None:
             return f"No pharmaceutical record found for '{action_input}'."
 
         # Return Top 1 (Simulate RAG single document retrieval)
-        best_score, best_match = scored_results[0]
+        best_score, best_match = result
         
         return (
             f"=== DRUG MONOGRAPH (Similarity: {best_score:.2f}) ===\n"
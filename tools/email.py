@@ -1,9 +1,10 @@
-from typing import Set
 import pymysql
 # 假设 db_config 在 python 路径下或同一目录
 from tools.db_configs import get_db_connection
 # 假设 BaseTool 定义依然有效
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from monitor import REGISTRY
 
 class MarketingEmailTool(BaseTool):
     """
@@ -18,8 +19,8 @@ class MarketingEmailTool(BaseTool):
         self.database_name = database_name
         
         # 2. Initialize Unique Data Tracker
-        # 使用 Set 存储唯一 ID (primary key) 以追踪哪些邮件已被检索过
-        self._unique_retrieved_ids: Set[str] = set()
+        # 使用 CoverageTracker 记录唯一 ID (primary key) 以追踪哪些邮件已被检索过
+        self._coverage = CoverageTracker()
 
     @property
     def name(self) -> str:
@@ -38,6 +39,13 @@ class MarketingEmailTool(BaseTool):
         Executes the SQL fuzzy search on marketing emails.
         Returns the content of the retrieved records as a single formatted string.
         """
+        try:
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"Error retrieving email info: {str(e)}"
+
+    def retrieve(self, action_input: str) -> list:
+        """执行 SQL 模糊查询，返回命中的行（不更新唯一数据统计）"""
         connection = None
         try:
             # Connect to the database
@@ -60,58 +68,48 @@ class MarketingEmailTool(BaseTool):
             search_term = f"%{action_input}%"
             
             # 执行查询，参数对应 WHERE 子句中的四个占位符
-            cursor.execute(sql_query, (search_term, search_term, search_term, search_term))
-            
-            retrieved_rows = cursor.fetchall()
-
-            if not retrieved_rows:
-                return f"No emails found matching the query: '{action_input}'."
-
-            # --- Logic to Track Unique Data ---
-            newly_seen_count = 0
-            for row in retrieved_rows:
-                # 使用数据库的主键 id 作为唯一标识
-                r_id = str(row.get('id')) 
-                if r_id not in self._unique_retrieved_ids:
-                    self._unique_retrieved_ids.add(r_id)
-                    newly_seen_count += 1
-            # ----------------------------------
-
-            # Format the output for the Agent
-            output_parts = [f"Found relevant emails (New unique records: {newly_seen_count}):"]
-            
-            for i, row in enumerate(retrieved_rows):
-                # 提取字段，注意从 DictCursor 获取时 key 对应数据库列名
-                sub = row.get('subject', 'No Subject')
-                sender = row.get('from', 'Unknown Sender')
-                recipient = row.get('to', 'Unknown Recipient')
-                context = row.get('context', '')
-
-                record_text = (
-                    f"Subject: {sub}\n"
-                    f"From: {sender}\n"
-                    f"To: {recipient}\n"
-                    f"Content: {context}"
-                )
-
-                output_parts.append(f"--- Document {i+1} (ID: {row.get('id')}) ---")
-                output_parts.append(record_text)
+            with REGISTRY.timer("db_query_seconds", "SQL 查询耗时", tool=self.name):
+                cursor.execute(sql_query, (search_term, search_term, search_term, search_term))
             
-            return "\n".join(output_parts)
+            return cursor.fetchall()
 
-        except Exception as e:
-            return f"Error retrieving email info: {str(e)}"
-        
         finally:
             # Ensure database connection is closed
             if connection:
                 connection.close()
 
-    def get_unique_stats(self) -> dict:
-        """
-        Custom method to return the statistics of unique data retrieved.
-        """
-        return {
-            "total_unique_docs_retrieved": len(self._unique_retrieved_ids)
-        }
+    def render(self, action_input: str, retrieved_rows: list) -> str:
+        """记录唯一数据并格式化 observation"""
+        if not retrieved_rows:
+            return f"No emails found matching the query: '{action_input}'."
 
+        # --- Logic to Track Unique Data ---
+        newly_seen_count = 0
+        for row in retrieved_rows:
+            # 使用数据库的主键 id 作为唯一标识
+            r_id = str(row.get('id')) 
+            if self._coverage.add(r_id):
+                newly_seen_count += 1
+        # ----------------------------------
+
+        # Format the output for the Agent
+        output_parts = [f"Found relevant emails (New unique records: {newly_seen_count}):"]
+        
+        for i, row in enumerate(retrieved_rows):
+            # 提取字段，注意从 DictCursor 获取时 key 对应数据库列名
+            sub = row.get('subject', 'No Subject')
+            sender = row.get('from', 'Unknown Sender')
+            recipient = row.get('to', 'Unknown Recipient')
+            context = row.get('context', '')
+
+            record_text = (
+                f"Subject: {sub}\n"
+                f"From: {sender}\n"
+                f"To: {recipient}\n"
+                f"Content: {context}"
+            )
+
+            output_parts.append(f"--- Document {i+1} (ID: {row.get('id')}) ---")
+            output_parts.append(record_text)
+        
+        return "\n".join(output_parts)
@@ -0,0 +1,302 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from tqdm import tqdm
+
+from monitor import REGISTRY
+
+"""
+可并行、可断点续跑的语料 embedding 构建：
+  1. 流式读取 JSONL / CSV / Parquet，行写入暂存文件 rows.jsonl，并记录每个分片的起始偏移
+  2. 按 (行数, 维度) 预分配 embeddings.f32（np.memmap），各分片编码后直接写入对应行，不在内存中累积
+  3. 每完成一个分片就 flush 并记入 state.json；中断后重跑会跳过已完成的分片
+  4. 编码使用 SentenceTransformer 的多进程池（--workers > 1），批大小可自动调优
+  5. 全部完成后输出标准的 RagDatabase 目录（primary_keys.pth + columns.json），可直接 RagDatabase.load
+
+用法:
+    python -m tools.embedding_builder corpus.jsonl rag_corpus.db --text-field content --extra-fields title id
+    python -m tools.embedding_builder corpus.parquet rag_corpus.db --workers 8 --batch-size auto
+"""
+
+SOURCE_FORMATS = ("jsonl", "csv", "parquet")
+BATCH_SIZE_CANDIDATES = (16, 32, 64, 128, 256, 512)
+
+
+# ========= 数据源 =========
+def _source_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if ext in (".csv", ".tsv"):
+        return "csv"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"Unsupported corpus format '{ext}', expected one of {SOURCE_FORMATS}")
+
+
+def iter_source_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行产出语料记录（dict），不把整个文件读入内存"""
+    fmt = _source_format(path)
+    if fmt == "jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == "csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f, delimiter="\t" if path.endswith(".tsv") else ",")
+    else:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading parquet corpora requires the 'pyarrow' package") from e
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+
+
+# ========= 构建状态 =========
+class _BuildState:
+    """build_dir/state.json：暂存与分片进度，原子写入"""
+
+    def __init__(self, path: str, data: Dict[str, Any]):
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def load(cls, path: str) -> Optional["_BuildState"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(path, json.load(f))
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def setdefault(self, key, default):
+        return self.data.setdefault(key, default)
+
+
+class EmbeddingBuilder:
+    """
+    Args:
+        model: SentenceTransformer 实例或模型名（模型名通过 shared_sentence_model 加载）。
+        out_dir: 输出的 RagDatabase 目录；中间文件放在 out_dir/_build 下。
+        text_field: 被编码的文本字段，输出中对应 content 列。
+        extra_fields: 一并保存为 columns 的其他字段。
+        shard_size: 每个检查点分片的行数。
+        batch_size: 编码批大小，"auto" 表示在首个分片上测吞吐自动选择。
+        workers: 编码进程数；>1 时使用 SentenceTransformer 多进程池（CPU）。
+        devices: 显式指定多进程池的设备列表（如 ["cuda:0", "cuda:1"]），覆盖 workers。
+    """
+
+    def __init__(self, model, out_dir: str, text_field: str = "content",
+                 extra_fields: Sequence[str] = (), shard_size: int = 8192,
+                 batch_size: Any = "auto", workers: int = 1, devices: Optional[List[str]] = None,
+                 normalize: bool = True, keep_build_dir: bool = False):
+        self.model_name = model if isinstance(model, str) else None  # 用于判断暂存 / 检查点是否可复用
+        if isinstance(model, str):
+            from tools.registry import shared_sentence_model
+            model = shared_sentence_model(model)
+        self.model = model
+        self.out_dir = out_dir
+        self.build_dir = os.path.join(out_dir, "_build")
+        self.text_field = text_field
+        self.extra_fields = list(extra_fields)
+        self.shard_size = shard_size
+        self.batch_size = batch_size
+        self.devices = devices or (["cpu"] * workers if workers > 1 else None)
+        self.normalize = normalize
+        self.keep_build_dir = keep_build_dir
+        self._pool = None
+
+    # ----- 1. 暂存 -----
+    def _source_signature(self, source: str) -> Dict[str, Any]:
+        stat = os.stat(source)
+        return {
+            "source": os.path.abspath(source), "size": stat.st_size, "mtime": stat.st_mtime,
+            "text_field": self.text_field, "extra_fields": self.extra_fields,
+            "shard_size": self.shard_size, "normalize": self.normalize, "model": self.model_name,
+        }
+
+    def _stage(self, source: str, state: _BuildState):
+        """流式读取数据源，写入 rows.jsonl 并记录分片偏移"""
+        rows_path = os.path.join(self.build_dir, "rows.jsonl")
+        offsets, n = [], 0
+        with REGISTRY.timer("embedding_build_stage_seconds", "语料暂存耗时"), open(rows_path, "wb") as out:
+            for record in tqdm(iter_source_rows(source), desc="Staging corpus"):
+                if n % self.shard_size == 0:
+                    offsets.append(out.tell())
+                row = {"content": str(record.get(self.text_field) or "")}
+                for field in self.extra_fields:
+                    row[field] = record.get(field)
+                out.write(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n")
+                n += 1
+        # 旧的 embeddings.f32 属于上一次暂存的语料（行数 / 维度可能不同），不能续用
+        emb_path = os.path.join(self.build_dir, "embeddings.f32")
+        if os.path.exists(emb_path):
+            os.remove(emb_path)
+        state["rows"] = n
+        state["shard_offsets"] = offsets
+        state["done"] = []
+        state.save()
+
+    def _read_shard(self, shard: int, state: _BuildState) -> List[Dict[str, Any]]:
+        start = shard * self.shard_size
+        count = min(self.shard_size, state["rows"] - start)
+        with open(os.path.join(self.build_dir, "rows.jsonl"), "rb") as f:
+            f.seek(state["shard_offsets"][shard])
+            return [json.loads(f.readline()) for _ in range(count)]
+
+    # ----- 2. 编码 -----
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        if self.devices:
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool(target_devices=self.devices)
+            embeddings = self.model.encode_multi_process(texts, self._pool, batch_size=batch_size)
+        else:
+            embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                           show_progress_bar=False)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.normalize:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+
+    def _tune_batch_size(self, texts: List[str]) -> int:
+        """在样本上依次尝试候选批大小，吞吐不再提升（或内存不足）时停止"""
+        best, best_rate = BATCH_SIZE_CANDIDATES[0], 0.0
+        for batch_size in BATCH_SIZE_CANDIDATES:
+            sample = texts[:batch_size * 4]
+            if len(sample) < batch_size:
+                break
+            try:
+                start = time.perf_counter()
+                self._encode(sample, batch_size)
+                rate = len(sample) / (time.perf_counter() - start)
+            except (RuntimeError, MemoryError):
+                break
+            if rate < best_rate * 1.05:
+                break
+            best, best_rate = batch_size, rate
+        REGISTRY.gauge("embedding_build_batch_size", "自动选择的编码批大小").set(best)
+        return best
+
+    # ----- 3. 主流程 -----
+    def build(self, source: str) -> str:
+        """构建（或续建）source 的 embedding，返回输出目录"""
+        os.makedirs(self.build_dir, exist_ok=True)
+        signature = self._source_signature(source)
+        state = _BuildState.load(os.path.join(self.build_dir, "state.json"))
+        if state is None or state.get("signature") != signature or "rows" not in state.data:
+            state = _BuildState(os.path.join(self.build_dir, "state.json"), {"signature": signature})
+            self._stage(source, state)
+        n, n_shards = state["rows"], len(state["shard_offsets"])
+        if n == 0:
+            raise ValueError(f"Corpus {source} contains no rows")
+
+        done = set(state["done"])
+        pending = [s for s in range(n_shards) if s not in done]
+        try:
+            if pending:
+                first = [r["content"] for r in self._read_shard(pending[0], state)]
+                # 先编码一条得到维度（同时启动进程池，避免启动耗时计入批大小调优）
+                dim = int(self._encode(first[:1], 1).shape[1])
+                if state.setdefault("dim", dim) != dim:
+                    raise ValueError(f"Embedding dim changed from {state['dim']} to {dim}; remove {self.build_dir}")
+                if state.get("batch_size") is None:
+                    state["batch_size"] = self._tune_batch_size(first) if self.batch_size == "auto" \
+                        else int(self.batch_size)
+                state.save()
+
+            emb_path = os.path.join(self.build_dir, "embeddings.f32")
+            shape = [n, state["dim"]]
+            valid = os.path.exists(emb_path) and state.get("memmap_shape") == shape \
+                and os.path.getsize(emb_path) == n * state["dim"] * 4
+            if not valid and (os.path.exists(emb_path) or state["done"]):
+                # 文件缺失或与检查点记录的形状不符：已完成分片不可信，全部重新编码
+                if os.path.exists(emb_path):
+                    os.remove(emb_path)
+                state["done"] = []
+                pending = list(range(n_shards))
+            mode = "r+" if os.path.exists(emb_path) else "w+"
+            embeddings = np.memmap(emb_path, dtype=np.float32, mode=mode, shape=tuple(shape))
+            if mode == "w+":
+                state["memmap_shape"] = shape
+                state.save()
+            for shard in tqdm(pending, desc=f"Embedding shards (batch {state.get('batch_size')})"):
+                rows = self._read_shard(shard, state)
+                start = shard * self.shard_size
+                with REGISTRY.timer("embedding_build_shard_seconds", "单个分片编码 + 写入耗时"):
+                    embeddings[start:start + len(rows)] = self._encode([r["content"] for r in rows],
+                                                                       state["batch_size"])
+                    embeddings.flush()
+                state["done"] = state["done"] + [shard]
+                state.save()
+                REGISTRY.counter("embedding_build_rows_total", "已编码的语料行数").inc(len(rows))
+        finally:
+            if self._pool is not None:
+                self.model.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+        self._finalize(embeddings, state)
+        return self.out_dir
+
+    # ----- 4. 输出 RagDatabase 目录 -----
+    def _finalize(self, embeddings: np.memmap, state: _BuildState):
+        import torch
+
+        torch.save(torch.from_numpy(np.asarray(embeddings)), os.path.join(self.out_dir, "primary_keys.pth"))
+        columns: Dict[str, List[Any]] = {"content": [], **{f: [] for f in self.extra_fields}}
+        with open(os.path.join(self.build_dir, "rows.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                for k, values in columns.items():
+                    values.append(row.get(k))
+        with open(os.path.join(self.out_dir, "columns.json"), "w") as f:
+            json.dump(columns, f, ensure_ascii=False)
+        del embeddings
+        if not self.keep_build_dir:
+            shutil.rmtree(self.build_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a RagDatabase directory from a JSONL / CSV / Parquet corpus")
+    parser.add_argument("source", help="语料文件（.jsonl/.ndjson、.csv/.tsv、.parquet）")
+    parser.add_argument("out_dir", help="输出的 RagDatabase 目录")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--text-field", default="content")
+    parser.add_argument("--extra-fields", nargs="*", default=[])
+    parser.add_argument("--shard-size", type=int, default=8192, help="每个检查点分片的行数")
+    parser.add_argument("--batch-size", default="auto", help='编码批大小或 "auto"')
+    parser.add_argument("--workers", type=int, default=1, help="编码进程数（>1 使用多进程池）")
+    parser.add_argument("--devices", nargs="*", help="多进程池设备列表，例如 cuda:0 cuda:1")
+    parser.add_argument("--keep-build-dir", action="store_true", help="完成后保留 _build 中间文件")
+    args = parser.parse_args()
+
+    builder = EmbeddingBuilder(
+        args.model, args.out_dir, text_field=args.text_field, extra_fields=args.extra_fields,
+        shard_size=args.shard_size, batch_size=args.batch_size, workers=args.workers,
+        devices=args.devices, keep_build_dir=args.keep_build_dir,
+    )
+    print(f"Built RagDatabase at {builder.build(args.source)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
-from typing import Set, List, Optional
-from sentence_transformers import SentenceTransformer
+from tools.registry import shared_sentence_model, shared_rag_database
 from tools.rag_database import RagDatabase
 from tools.rag_system import RAGRetriever
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
 
 class FinancialKnowledgeTool(BaseTool):
     """
@@ -20,16 +20,16 @@ class FinancialKnowledgeTool(BaseTool):
         print(f"Initializing FinancialRAGTool... Loading model: {model_name}")
         
         # 1. Load Embedding Model
-        self.embedding_model = SentenceTransformer(model_name)
+        self.embedding_model = shared_sentence_model(model_name)
         
         # 2. Load the RAG Database
-        self.db = RagDatabase.load(db_path, self.embedding_model)
+        self.db = shared_rag_database(RagDatabase, db_path, model_name)
         
         # 3. Initialize Retriever
         self.rag = RAGRetriever(database=self.db, embedding_model=self.embedding_model)
         
         # 4. Initialize Unique Data Tracker
-        self._unique_retrieved_docs: Set[str] = set()
+        self._coverage = CoverageTracker()
     @property
     def name(self) -> str:
         """The unique name of the tool."""
@@ -52,40 +52,33 @@ class FinancialKnowledgeTool(BaseTool):
         Returns the content of the retrieved documents as a single string.
         """
         try:
-            # Retrieve documents (adjust n_retrieval and n_rerank as needed)
-            result = self.rag.prepare_prompt(action_input, n_retrieval=5, n_rerank=1)
-            
-            retrieved_docs = result.get("docs", [])
-            retrieved_scores = result.get("scores", [])
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"Error retrieving financial info: {str(e)}"
 
-            if not retrieved_docs:
-                return "No relevant financial documents found."
+    def retrieve(self, action_input: str) -> dict:
+        """RAG 检索结果（docs / scores / doc_indices），不更新唯一数据统计"""
+        # Retrieve documents (adjust n_retrieval and n_rerank as needed)
+        return self.rag.prepare_prompt(action_input, n_retrieval=5, n_rerank=1)
 
-            # --- Track Unique Documents ---
-            newly_seen_count = 0
-            for doc in retrieved_docs:
-                if doc not in self._unique_retrieved_docs:
-                    self._unique_retrieved_docs.add(doc)
-                    newly_seen_count += 1
-            # --------------------------------
+    def render(self, action_input: str, result: dict) -> str:
+        """记录唯一数据并格式化 observation"""
+        retrieved_docs = result.get("docs", [])
+        retrieved_scores = result.get("scores", [])
+        retrieved_idxs = result.get("doc_indices", [])
 
-            # Format output for the Agent
-            output_parts = [f"Found relevant financial info (New unique records: {newly_seen_count}):"]
-            
-            for i, (doc, score) in enumerate(zip(retrieved_docs, retrieved_scores)):
-                output_parts.append(f"--- Document {i+1} (Relevance: {score:.4f}) ---")
-                output_parts.append(doc)
-            
-            return "\n".join(output_parts)
+        if not retrieved_docs:
+            return "No relevant financial documents found."
 
-        except Exception as e:
-            return f"Error retrieving financial info: {str(e)}"
+        # --- Track Unique Documents ---
+        newly_seen_count = sum(self._coverage.observe(retrieved_idxs))
+        # --------------------------------
 
-    def get_unique_stats(self) -> dict:
-        """
-        Returns statistics about unique documents retrieved.
-        """
-
-        return {
-            "total_unique_docs_retrieved": len(self._unique_retrieved_docs)
-        }
\ No newline at end of file
+        # Format output for the Agent
+        output_parts = [f"Found relevant financial info (New unique records: {newly_seen_count}):"]
+        
+        for i, (doc, score) in enumerate(zip(retrieved_docs, retrieved_scores)):
+            output_parts.append(f"--- Document {i+1} (Relevance: {score:.4f}) ---")
+            output_parts.append(doc)
+        
+        return "\n".join(output_parts)
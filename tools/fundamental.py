@@ -1,7 +1,6 @@
-from typing import Set, List
-import numpy as np
-from sentence_transformers import SentenceTransformer, util
+from tools.registry import shared_corpus_database, shared_sentence_model
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
 
 class FundamentalAccountingTool(BaseTool):
     """
@@ -10,7 +9,7 @@ class FundamentalAccountingTool(BaseTool):
     """
     def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
         print(f"[Init] Loading embedding model: {model_name}...")
-        self._model = SentenceTransformer(model_name)
+        self._model = shared_sentence_model(model_name)
         
         # --- 内置基本面数据库 (Mocking RAG DB) ---
         # 这里的数据是具体的会计数字，区别于“新闻”
@@ -22,11 +21,15 @@ class FundamentalAccountingTool(BaseTool):
             {"title": "MSFT Cloud Segment", "content": "Microsoft Intelligent Cloud revenue was $24.3 billion, up 15% (up 17% in constant currency)."}
         ]
         
-        self._corpus = [doc["content"] for doc in self._knowledge_base]
-        self._corpus_embeddings = self._model.encode(self._corpus, convert_to_tensor=True)
+        # 按内容哈希缓存到磁盘的向量库：首次构建后不再重新编码，进程内各实例共享
+        self._db = shared_corpus_database(
+            model_name,
+            [doc["content"] for doc in self._knowledge_base],
+            {"title": [doc["title"] for doc in self._knowledge_base]},
+        )
         # ----------------------------------------
         
-        self._unique_retrieved_docs: Set[str] = set()
+        self._coverage = CoverageTracker()
 
     @property
     def name(self) -> str:
@@ -45,50 +48,45 @@ class FundamentalAccountingTool(BaseTool):
     )
 
     def run(self, action_input: str) -> str:
-        print(f"[Tool] Searching Fundamentals DB for: {action_input}")
-        
         try:
-            # 1. 向量检索
-            query_embedding = self._model.encode(action_input, convert_to_tensor=True)
-            cos_scores = util.cos_sim(query_embedding, self._corpus_embeddings)[0]
-            
-            top_results = np.argpartition(-cos_scores.cpu(), range(min(3, len(self._corpus))))[0:3]
-            top_results = sorted(top_results, key=lambda x: cos_scores[x], reverse=True)
-
-            retrieved_docs = []
-            titles = []
-            scores = []
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"Error executing fundamental retrieval: {str(e)}"
 
-            for idx in top_results:
-                score = float(cos_scores[idx])
-                # 财务数据通常需要高精准度，阈值设高一点
-                if score > 0.35: 
-                    retrieved_docs.append(self._knowledge_base[idx]["content"])
-                    titles.append(self._knowledge_base[idx]["title"])
-                    scores.append(score)
+    def retrieve(self, action_input: str) -> list:
+        """相似度超过阈值的 (行号, 分数)，余弦相似度降序；不更新唯一数据统计"""
+        print(f"[Tool] Searching Fundamentals DB for: {action_input}")
+        # 1. 向量检索
+        query_embedding = self._model.encode(action_input, convert_to_tensor=True, normalize_embeddings=True)
+        top_results, top_scores = self._db.retrieve_index_and_similarity(query_embedding, top_k=3)  # 余弦相似度降序
+        # 财务数据通常需要高精准度，阈值设高一点
+        return [(idx, score) for idx, score in zip(top_results.tolist(), top_scores.tolist()) if score > 0.35]
 
-            if not retrieved_docs:
-                return "No relevant accounting data found."
+    def render(self, action_input: str, hits: list) -> str:
+        """记录唯一数据并格式化 observation"""
+        retrieved_idxs = [idx for idx, _ in hits]
+        scores = [score for _, score in hits]
+        retrieved_docs = [self._knowledge_base[idx]["content"] for idx in retrieved_idxs]
+        titles = [self._knowledge_base[idx]["title"] for idx in retrieved_idxs]
 
-            # 2. 记录唯一数据
-            for doc in retrieved_docs:
-                self._unique_retrieved_docs.add(doc)
+        if not retrieved_docs:
+            return "No relevant accounting data found."
 
-            # 3. 格式化输出
-            output_lines = ["Here is the relevant fundamental context retrieved:"]
-            for i, doc in enumerate(retrieved_docs):
-                output_lines.append(f"\n--- Result {i+1} (Score: {scores[i]:.4f}) ---")
-                output_lines.append(f"Source: {titles[i]}")
-                output_lines.append(f"Content: {doc}")
+        # 2. 记录唯一数据
+        self._coverage.update(retrieved_idxs)
 
-            return "\n".join(output_lines)
+        # 3. 格式化输出
+        output_lines = ["Here is the relevant fundamental context retrieved:"]
+        for i, doc in enumerate(retrieved_docs):
+            output_lines.append(f"\n--- Result {i+1} (Score: {scores[i]:.4f}) ---")
+            output_lines.append(f"Source: {titles[i]}")
+            output_lines.append(f"Content: {doc}")
 
-        except Exception as e:
-            return f"Error executing fundamental retrieval: {str(e)}"
+        return "\n".join(output_lines)
 
     def get_unique_retrieved_count(self) -> int:
-        return len(self._unique_retrieved_docs)
+        return len(self._coverage)
 
     def get_coverage_report(self) -> str:
-        count = len(self._unique_retrieved_docs)
+        count = len(self._coverage)
         return f"Total unique financial records retrieved so far: {count}"
\ No newline at end of file
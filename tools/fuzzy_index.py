@@ -0,0 +1,120 @@
+import bisect
+import difflib
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+"""
+小型实体库的模糊匹配索引（DrugReferenceTool / ClinicalGuidelineTool 使用）：
+- 构建时把每条记录的各字段（名称、品牌、关键词……）小写化并连同权重预存，查询时不再重复 lower()
+- 字符三元组倒排索引生成候选字段，先对与查询共享三元组最多的字段打分，尽快抬高当前最优分
+- 其余字段按"长度窗口 + 字符计数上界"剪枝，只有上界不低于当前最优分的字段才调用 difflib 精确打分
+- 分数与逐条 difflib.SequenceMatcher(None, query.lower(), field.lower()).ratio() * weight 完全一致，
+  top-1 与原来的全量扫描相同（同分时取记录顺序靠前者，等价于稳定排序后取第一个）
+"""
+
+NGRAM = 3
+
+
+def _ngrams(text: str, n: int = NGRAM) -> set:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _ratio(matches: int, length: int) -> float:
+    # 与 difflib 内部 _calculate_ratio 相同的公式，保证上界与精确分数可以直接比较
+    return 2.0 * matches / length if length else 1.0
+
+
+class FuzzyIndex:
+    """
+    records: 任意记录序列；fields(record) 返回该记录参与匹配的 (文本, 权重) 列表。
+    记录得分为其各字段 ratio * 权重 的最大值。
+    """
+
+    def __init__(self, records: Sequence[Any], fields: Callable[[Any], Iterable[Tuple[str, float]]]):
+        self.records = list(records)
+        self._texts: List[str] = []
+        self._weights: List[float] = []
+        self._owners: List[int] = []
+        self._char_counts: List[Counter] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for record_id, record in enumerate(self.records):
+            for text, weight in fields(record):
+                field_id = len(self._texts)
+                text = text.lower()
+                self._texts.append(text)
+                self._weights.append(float(weight))
+                self._owners.append(record_id)
+                self._char_counts.append(Counter(text))
+                for gram in _ngrams(text):
+                    self._postings[gram].append(field_id)
+        self._postings = dict(self._postings)
+
+        # 权重 → 按长度排序的字段，用于长度窗口剪枝
+        by_weight: Dict[float, List[Tuple[int, int]]] = defaultdict(list)
+        for field_id, text in enumerate(self._texts):
+            by_weight[self._weights[field_id]].append((len(text), field_id))
+        self._by_length: Dict[float, Tuple[List[int], List[int]]] = {}
+        for weight, items in by_weight.items():
+            items.sort()
+            self._by_length[weight] = ([l for l, _ in items], [f for _, f in items])
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _upper_bound(self, query: str, query_counts: Counter, field_id: int) -> float:
+        """SequenceMatcher.quick_ratio 的等价上界：匹配字符数不超过两侧字符多重集的交集大小"""
+        counts = self._char_counts[field_id]
+        small, large = (query_counts, counts) if len(query_counts) <= len(counts) else (counts, query_counts)
+        overlap = sum(min(n, large.get(c, 0)) for c, n in small.items())
+        return self._weights[field_id] * _ratio(overlap, len(query) + len(self._texts[field_id]))
+
+    def _length_window(self, query_len: int, weight: float, floor: float) -> Iterable[int]:
+        """长度上界 2*min(la, lb)/(la + lb) * weight 可能达到 floor 的字段"""
+        lengths, field_ids = self._by_length[weight]
+        target = floor / weight if weight > 0 else float("inf")
+        if target > 1.0:
+            return ()
+        if target <= 0.0:
+            return field_ids
+        # 窗口两端各放宽 1，边界上的浮点误差交给 _upper_bound 精确判断
+        lo = bisect.bisect_left(lengths, int(query_len * target / (2.0 - target)) - 1)
+        hi = bisect.bisect_right(lengths, int(query_len * (2.0 - target) / target) + 1)
+        return field_ids[lo:hi]
+
+    def search(self, query: str, threshold: float = 0.0) -> Optional[Tuple[float, Any]]:
+        """返回 (分数, 记录)，分数必须严格大于 threshold；无结果时返回 None"""
+        query = query.lower()
+        query_counts = Counter(query)
+        best_score, best_record = -1.0, -1
+        scored = set()
+
+        def consider(field_id: int):
+            nonlocal best_score, best_record
+            scored.add(field_id)
+            floor = max(best_score, threshold)
+            # 上界严格低于当前最优时不可能改变结果（同分也要比较记录顺序，所以用 <）
+            if self._upper_bound(query, query_counts, field_id) < floor:
+                return
+            ratio = difflib.SequenceMatcher(None, query, self._texts[field_id]).ratio()
+            score = self._weights[field_id] * ratio
+            record_id = self._owners[field_id]
+            if score > best_score or (score == best_score and record_id < best_record):
+                best_score, best_record = score, record_id
+
+        # 1) 三元组候选：共享三元组多的字段先打分
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in _ngrams(query):
+            for field_id in self._postings.get(gram, ()):
+                shared[field_id] += 1
+        for field_id in sorted(shared, key=lambda f: (-shared[f], f)):
+            consider(field_id)
+
+        # 2) 未共享三元组但长度上仍可能超过当前最优分的字段
+        for weight in self._by_length:
+            for field_id in self._length_window(len(query), weight, max(best_score, threshold)):
+                if field_id not in scored:
+                    consider(field_id)
+
+        if best_record < 0 or best_score <= threshold:
+            return None
+        return best_score, self.records[best_record]
@@ -1,9 +1,10 @@
 import json
 import re
-import hashlib
 import os
-from typing import List, Set, Dict, Any
+from typing import List, Dict
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from monitor import REGISTRY
 
 # 模拟 rank_bm25 库，防止未安装导致运行失败
 try:
@@ -31,7 +32,7 @@ class HateSpeechBM25Tool(BaseTool):
         Initialize the Hate Speech Search Tool.
         """
         self._json_path = json_path
-        self._unique_retrieved_hashes: Set[str] = set()
+        self._coverage = CoverageTracker()
         
         # 1. Load Data (Mock data embedded for demonstration)
         print(f"[Init] Loading Hate Speech dataset...")
@@ -92,10 +93,6 @@ class HateSpeechBM25Tool(BaseTool):
         clean_text = re.sub(r'[^a-zA-Z0-9]', ' ', text.lower())
         return clean_text.split()
 
-    def _get_doc_id(self, doc: Dict[str, Any]) -> str:
-        content_str = doc.get('text', '')
-        return hashlib.md5(str(content_str).encode('utf-8')).hexdigest()
-
     @property
     def name(self) -> str:
         return "HateSpeechDatasetRetriever"
@@ -110,30 +107,36 @@ class HateSpeechBM25Tool(BaseTool):
 
     def run(self, action_input: str, top_k: int = 3) -> str:
         if not self._bm25: return "Error: Database is empty."
+        return self.render(action_input, self.retrieve(action_input, top_k))
 
+    def retrieve(self, action_input: str, top_k: int = 3) -> list:
+        """BM25 top_k 的 (行号, 分数)，过滤 0 分结果；不更新唯一数据统计"""
         # 1. Tokenize Query
         tokenized_query = self._tokenize(action_input)
         
         # 2. Get Scores
-        doc_scores = self._bm25.get_scores(tokenized_query)
+        with REGISTRY.timer("bm25_score_seconds", "BM25 打分耗时", tool=self.name):
+            doc_scores = self._bm25.get_scores(tokenized_query)
         
         # Sort and Filter
-        top_results = sorted(zip(self._documents, doc_scores), key=lambda x: x[1], reverse=True)[:top_k]
-        top_results = [res for res in top_results if res[1] > 0]
+        # 记录行号：唯一数据统计按行号记入位图，不再对全文做 MD5
+        top_idx = sorted(range(len(self._documents)), key=lambda i: doc_scores[i], reverse=True)[:top_k]
+        top_idx = [i for i in top_idx if doc_scores[i] > 0]
+        return [(i, doc_scores[i]) for i in top_idx]
+
+    def render(self, action_input: str, hits: list) -> str:
+        """记录唯一数据并格式化 observation"""
+        top_idx = [i for i, _ in hits]
+        top_results = [(self._documents[i], score) for i, score in hits]
 
         if not top_results:
             return "No relevant hate speech examples found for your query."
 
         # 3. Update Unique Stats
-        new_items = 0
-        for doc, score in top_results:
-            doc_id = self._get_doc_id(doc)
-            if doc_id not in self._unique_retrieved_hashes:
-                self._unique_retrieved_hashes.add(doc_id)
-                new_items += 1
+        new_items = sum(self._coverage.observe(top_idx))
         
         # 4. Format Output
-        output_buffer = [f"### Toxicity Search Results (Session Unique: {len(self._unique_retrieved_hashes)})"]
+        output_buffer = [f"### Toxicity Search Results (Session Unique: {len(self._coverage)})"]
         for i, (doc, score) in enumerate(top_results):
             output_buffer.append(f"\n--- Example {i+1} (Relevance: {score:.4f}) ---")
             output_buffer.append(f"Text: \"{doc['text']}\"")
@@ -142,8 +145,3 @@ class HateSpeechBM25Tool(BaseTool):
         
         output_buffer.append(f"\n[System Info]: Retrieved {len(top_results)} items ({new_items} new).")
         return "\n".join(output_buffer)
-    def get_unique_stats(self) -> int:
-
-        return {
-            "total_unique_docs_retrieved": len(self._unique_retrieved_hashes)
-        }
\ No newline at end of file
@@ -1,10 +1,11 @@
-from sentence_transformers import SentenceTransformer
+from tools.registry import shared_sentence_model, shared_rag_database
 from tools.rag_database import RagDatabase
 from tools.rag_system import RAGRetriever
-from typing import Set
+from typing import Optional
 
 # Assuming BaseTool is defined as provided in your second snippet
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
 
 class HealthcareRAGTool(BaseTool):
     """
@@ -12,22 +13,24 @@ class HealthcareRAGTool(BaseTool):
     It retrieves relevant medical context and tracks unique data access.
     """
 
-    def __init__(self, db_path: str = "rag_healthcaremagic_200.db", model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, db_path: str = "rag_healthcaremagic_200.db", model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 quantization: Optional[str] = "auto"):
         print(f"Initializing HealthcareRAGTool... Loading model: {model_name}")
         
         # 1. Load Embedding Model
-        self.embedding_model = SentenceTransformer(model_name)
+        self.embedding_model = shared_sentence_model(model_name)
         
         # 2. Load the RAG Database
         # Note: Ensure the db file exists at the path
-        self.db = RagDatabase.load(db_path, self.embedding_model)
+        # quantization="auto" uses the int8/binary codes saved with the index, if any
+        self.db = shared_rag_database(RagDatabase, db_path, model_name, quantization=quantization)
         
         # 3. Initialize Retriever
         self.rag = RAGRetriever(database=self.db, embedding_model=self.embedding_model)
         
         # 4. Initialize Unique Data Tracker
-        # We use a Set to store unique document content strings (or IDs if available)
-        self._unique_retrieved_docs: Set[str] = set()
+        # Bitmap over vector-DB row ids (no copy of the document bodies)
+        self._coverage = CoverageTracker()
 
     @property
     def name(self) -> str:
@@ -45,41 +48,35 @@ class HealthcareRAGTool(BaseTool):
         Returns the content of the retrieved documents as a single string.
         """
         try:
-            # Using the method from your snippet
-            # n_retrieval and n_rerank can be adjusted or made configurable
-            result = self.rag.prepare_prompt(action_input, n_retrieval=5, n_rerank=3)
-            
-            retrieved_docs = result.get("docs", [])
-            retrieved_scores = result.get("scores", [])
-            
-            if not retrieved_docs:
-                return "No relevant medical documents found."
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"Error retrieving medical info: {str(e)}"
 
-            # --- Logic to Track Unique Data ---
-            newly_seen_count = 0
-            for doc in retrieved_docs:
-                # We use the document content string as the unique identifier
-                if doc not in self._unique_retrieved_docs:
-                    self._unique_retrieved_docs.add(doc)
-                    newly_seen_count += 1
-            # ----------------------------------
+    def retrieve(self, action_input: str) -> dict:
+        """RAG 检索结果（docs / scores / doc_indices），不更新唯一数据统计"""
+        # Using the method from your snippet
+        # n_retrieval and n_rerank can be adjusted or made configurable
+        return self.rag.prepare_prompt(action_input, n_retrieval=5, n_rerank=3)
 
-            # Format the output for the Agent
-            output_parts = [f"Found relevant healthcare info (New unique records: {newly_seen_count}):"]
-            
-            for i, (doc, score) in enumerate(zip(retrieved_docs, retrieved_scores)):
-                output_parts.append(f"--- Document {i+1} (Relevance: {score:.4f}) ---")
-                output_parts.append(doc)
-            
-            return "\n".join(output_parts)
+    def render(self, action_input: str, result: dict) -> str:
+        """记录唯一数据并格式化 observation"""
+        retrieved_docs = result.get("docs", [])
+        retrieved_scores = result.get("scores", [])
+        retrieved_idxs = result.get("doc_indices", [])
+        
+        if not retrieved_docs:
+            return "No relevant medical documents found."
 
-        except Exception as e:
-            return f"Error retrieving medical info: {str(e)}"
+        # --- Logic to Track Unique Data ---
+        # We use the vector-DB row id as the unique identifier
+        newly_seen_count = sum(self._coverage.observe(retrieved_idxs))
+        # ----------------------------------
 
-    def get_unique_stats(self) -> dict:
-        """
-        Custom method to return the statistics of unique data retrieved.
-        """
-        return {
-            "total_unique_docs_retrieved": len(self._unique_retrieved_docs)
-        }
\ No newline at end of file
+        # Format the output for the Agent
+        output_parts = [f"Found relevant healthcare info (New unique records: {newly_seen_count}):"]
+        
+        for i, (doc, score) in enumerate(zip(retrieved_docs, retrieved_scores)):
+            output_parts.append(f"--- Document {i+1} (Relevance: {score:.4f}) ---")
+            output_parts.append(doc)
+        
+        return "\n".join(output_parts)
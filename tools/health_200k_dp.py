@@ -1,8 +1,8 @@
-from sentence_transformers import SentenceTransformer
+from tools.registry import shared_sentence_model, shared_rag_database
 from tools.rag_database import DPRagDatabase
 from tools.rag_system import DPRAGRetriever
-from typing import Set
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
 
 class HealthcareRAGToolDP(BaseTool):
     """
@@ -17,10 +17,10 @@ class HealthcareRAGToolDP(BaseTool):
     ):
         print(f"Initializing HealthcareDPRAGTool (ε={epsilon})")
 
-        self.embedding_model = SentenceTransformer(model_name)
+        self.embedding_model = shared_sentence_model(model_name)
 
         # === Load DP database ===
-        self.db = DPRagDatabase.load(db_path, self.embedding_model)
+        self.db = shared_rag_database(DPRagDatabase, db_path, model_name)
 
         # === DP Retriever ===
         self.rag = DPRAGRetriever(
@@ -31,7 +31,7 @@ class HealthcareRAGToolDP(BaseTool):
         self.epsilon = epsilon
 
         # === Unique data tracker ===
-        self._unique_retrieved_docs: Set[str] = set()
+        self._coverage = CoverageTracker()
 
     @property
     def name(self) -> str:
@@ -46,33 +46,33 @@ class HealthcareRAGToolDP(BaseTool):
 
     def run(self, action_input: str) -> str:
         try:
-            docs, scores, _ = self.rag.fetch(
-                query=action_input,
-                epsilon=self.epsilon,
-                n_rerank=3
-            )
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"DP-RAG error: {str(e)}"
 
-            if not docs:
-                return "No relevant medical documents found."
+    def retrieve(self, action_input: str):
+        """(docs, scores, idxs)，不更新唯一数据统计"""
+        return self.rag.fetch(
+            query=action_input,
+            epsilon=self.epsilon,
+            n_rerank=3
+        )
 
-            newly_seen = 0
-            for d in docs:
-                if d not in self._unique_retrieved_docs:
-                    self._unique_retrieved_docs.add(d)
-                    newly_seen += 1
+    def render(self, action_input: str, result) -> str:
+        """记录唯一数据并格式化 observation"""
+        docs, scores, idxs = result
 
-            output = [
-                f"Found DP-protected healthcare info (ε={self.epsilon}, New records={newly_seen})"
-            ]
+        if not docs:
+            return "No relevant medical documents found."
 
-            for i, (doc, score) in enumerate(zip(docs, scores)):
-                output.append(f"--- Document {i+1} (Score={score:.4f}) ---")
-                output.append(doc)
+        newly_seen = sum(self._coverage.observe(idxs))
 
-            return "\n".join(output)
+        output = [
+            f"Found DP-protected healthcare info (ε={self.epsilon}, New records={newly_seen})"
+        ]
 
-        except Exception as e:
-            return f"DP-RAG error: {str(e)}"
+        for i, (doc, score) in enumerate(zip(docs, scores)):
+            output.append(f"--- Document {i+1} (Score={score:.4f}) ---")
+            output.append(doc)
 
-    def get_unique_stats(self):
-        return {"total_unique_docs_retrieved": len(self._unique_retrieved_docs)}
+        return "\n".join(output)
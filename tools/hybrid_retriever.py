@@ -0,0 +1,248 @@
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from monitor import REGISTRY
+
+"""
+混合检索：同一套行号上的稠密索引（RagDatabase）+ 稀疏倒排索引（BM25），两路并发检索后一次融合。
+
+- SparseIndex: BM25Okapi 打分（与 rank_bm25 的 idf / epsilon 规则一致），但只遍历查询词的倒排表，
+  top_k 的耗时与命中的 posting 数成正比，而不是语料行数
+- HybridRetriever: RRF（sum 1 / (rrf_k + rank)）或加权分数融合（各路 min-max 归一化后加权）
+  * 作为 RAGRetriever 的 database：retrieve_index_and_similarity / retrieve_with_similarity
+  * 作为 BM25 工具的 _bm25：get_scores(tokenized_query)，见 HybridRetriever.for_bm25_tool
+"""
+
+FUSION_MODES = ("rrf", "weighted")
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def simple_tokenize(text: str) -> List[str]:
+    """与 BM25 工具一致的分词：小写，按非字母数字切分"""
+    return re.sub(r"[^a-zA-Z0-9]", " ", text.lower()).split()
+
+
+class SparseIndex:
+    """BM25Okapi 倒排索引；行号即语料下标"""
+
+    def __init__(self, corpus_tokens: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75,
+                 epsilon: float = 0.25):
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}   # term → [(row, tf)]
+        self.doc_len: List[int] = []
+        for row, tokens in enumerate(corpus_tokens):
+            freqs: Dict[str, int] = {}
+            for token in tokens:
+                freqs[token] = freqs.get(token, 0) + 1
+            for term, tf in freqs.items():
+                self.postings.setdefault(term, []).append((row, tf))
+            self.doc_len.append(len(tokens))
+        self.corpus_size = len(self.doc_len)
+        self.avgdl = sum(self.doc_len) / self.corpus_size if self.corpus_size else 0.0
+        self.idf = self._compute_idf()
+
+    @classmethod
+    def from_bm25(cls, bm25, **kwargs) -> "SparseIndex":
+        """从 rank_bm25 的 BM25Okapi（或同结构的 doc_freqs）重建倒排索引，无需原始分词"""
+        if hasattr(bm25, "doc_freqs"):
+            corpus_tokens = [[t for t, tf in freqs.items() for _ in range(tf)] for freqs in bm25.doc_freqs]
+        else:  # 未安装 rank_bm25 时工具内置的简化 BM25Okapi 只保存 corpus
+            corpus_tokens = bm25.corpus
+        params = {k: getattr(bm25, k) for k in ("k1", "b", "epsilon") if hasattr(bm25, k)}
+        params.update(kwargs)
+        return cls(corpus_tokens, **params)
+
+    def _compute_idf(self) -> Dict[str, float]:
+        n = self.corpus_size
+        idf, negative = {}, []
+        for term, posting in self.postings.items():
+            df = len(posting)
+            idf[term] = math.log(n - df + 0.5) - math.log(df + 0.5)
+            if idf[term] < 0:
+                negative.append(term)
+        eps = self.epsilon * (sum(idf.values()) / len(idf)) if idf else 0.0
+        for term in negative:
+            idf[term] = eps
+        return idf
+
+    def _accumulate(self, query_tokens: Sequence[str]) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        k1, b, avgdl, doc_len = self.k1, self.b, self.avgdl or 1.0, self.doc_len
+        for term in query_tokens:  # 重复的查询词与 rank_bm25 一样重复计分
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for row, tf in posting:
+                scores[row] = scores.get(row, 0.0) + idf * tf * (k1 + 1) / (
+                    tf + k1 * (1 - b + b * doc_len[row] / avgdl))
+        return scores
+
+    def get_scores(self, query_tokens: Sequence[str]) -> List[float]:
+        scores = [0.0] * self.corpus_size
+        for row, score in self._accumulate(query_tokens).items():
+            scores[row] = score
+        return scores
+
+    def top_k(self, query_tokens: Sequence[str], k: int) -> List[Tuple[int, float]]:
+        scores = self._accumulate(query_tokens)
+        return sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:k]
+
+    def __len__(self) -> int:
+        return self.corpus_size
+
+
+def _rank_fusion(ranked_lists: Sequence[Sequence[Tuple[int, float]]], weights: Sequence[float],
+                 rrf_k: int) -> Dict[int, float]:
+    fused: Dict[int, float] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, (row, _) in enumerate(ranked, start=1):
+            fused[row] = fused.get(row, 0.0) + weight / (rrf_k + rank)
+    return fused
+
+
+def _score_fusion(ranked_lists: Sequence[Sequence[Tuple[int, float]]], weights: Sequence[float]) -> Dict[int, float]:
+    fused: Dict[int, float] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        if not ranked:
+            continue
+        scores = [s for _, s in ranked]
+        lo, hi = min(scores), max(scores)
+        span = hi - lo
+        for row, score in ranked:
+            fused[row] = fused.get(row, 0.0) + weight * ((score - lo) / span if span > 0 else 1.0)
+    return fused
+
+
+class HybridRetriever:
+    """
+    Args:
+        dense: RagDatabase（或接口相同的 ShardedRagDatabase），行号与 sparse 一致。
+        sparse: SparseIndex。
+        fusion: "rrf" 或 "weighted"。
+        weights: (dense, sparse) 两路的权重。
+        candidates: 每一路取 top_k * candidates 个候选参与融合。
+        tokenizer: 字符串查询 → 稀疏检索的词列表。
+        columns: 检索结果返回的列，缺省使用 dense.columns。
+    """
+
+    def __init__(self, dense, sparse: SparseIndex, fusion: str = "rrf", weights: Sequence[float] = (1.0, 1.0),
+                 rrf_k: int = 60, candidates: int = 4, tokenizer: Callable[[str], List[str]] = simple_tokenize,
+                 columns: Optional[Dict[str, List]] = None):
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"Unknown fusion '{fusion}', expected one of {FUSION_MODES}")
+        self.dense = dense
+        self.sparse = sparse
+        self.fusion = fusion
+        self.weights = tuple(weights)
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        self.tokenizer = tokenizer
+        self._columns = columns
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid-search")
+
+    @property
+    def columns(self) -> Dict[str, List]:
+        return self._columns if self._columns is not None else self.dense.columns
+
+    # ========= 构建 =========
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding_model: Union[str, Any] = DEFAULT_MODEL,
+                   extra_columns: Optional[Dict[str, List]] = None,
+                   tokenizer: Callable[[str], List[str]] = simple_tokenize, **kwargs) -> "HybridRetriever":
+        from tools.rag_database import RagDatabase
+        if isinstance(embedding_model, str):
+            from tools.registry import shared_sentence_model
+            embedding_model = shared_sentence_model(embedding_model)
+        dense = RagDatabase.from_texts(embedding_model, texts, extra_columns)
+        sparse = SparseIndex([tokenizer(t) for t in texts])
+        return cls(dense, sparse, tokenizer=tokenizer, **kwargs)
+
+    @classmethod
+    def from_rag_database(cls, db, text_column: str = "content",
+                          tokenizer: Callable[[str], List[str]] = simple_tokenize, **kwargs) -> "HybridRetriever":
+        """为已有向量库补建同一行号上的 BM25 倒排索引"""
+        sparse = SparseIndex([tokenizer(str(t or "")) for t in db.columns[text_column]])
+        return cls(db, sparse, tokenizer=tokenizer, **kwargs)
+
+    @classmethod
+    def for_bm25_tool(cls, tool, embedding_model: Union[str, Any] = DEFAULT_MODEL,
+                      text_fn: Optional[Callable[[Dict[str, Any]], str]] = None, **kwargs) -> "HybridRetriever":
+        """
+        把 BM25 工具的 _bm25 换成混合检索：稀疏部分复用工具已建好的 BM25 统计，
+        稠密部分对 tool._documents 编码（默认拼接文档中的全部字符串字段）。工具的 run 无需修改。
+        """
+        from tools.rag_database import RagDatabase
+        if isinstance(embedding_model, str):
+            from tools.registry import shared_sentence_model
+            embedding_model = shared_sentence_model(embedding_model)
+        documents = tool._documents
+        text_fn = text_fn or (lambda doc: " ".join(str(v) for v in doc.values() if isinstance(v, str)))
+        texts = [text_fn(doc) for doc in documents]
+        dense = RagDatabase.from_texts(embedding_model, texts)
+        hybrid = cls(dense, SparseIndex.from_bm25(tool._bm25), tokenizer=getattr(tool, "_tokenize", simple_tokenize),
+                     **kwargs)
+        tool._bm25 = hybrid
+        return hybrid
+
+    # ========= 检索 =========
+    def _dense_search(self, query: Union[str, Any], n: int, filter: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        filter_kwargs = {"filter": filter} if filter is not None else {}
+        idxs, scores = self.dense.retrieve_index_and_similarity(query, n, **filter_kwargs)
+        return list(zip(idxs.tolist(), scores.tolist()))
+
+    def search(self, query: Union[str, Sequence[str]], top_k: int = 4,
+               filter: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """
+        返回融合后的 [(行号, 融合分数)]；query 可以是字符串或已分词的列表。
+        filter 由稠密库编译（RagDatabase.filter_rows），同一行号集合也用于过滤稀疏结果。
+        """
+        if isinstance(query, str):
+            text, tokens = query, self.tokenizer(query)
+        else:
+            tokens = list(query)
+            text = " ".join(tokens)
+        n = max(top_k, top_k * self.candidates)
+        with REGISTRY.timer("hybrid_search_seconds", "混合检索（两路并发 + 融合）耗时", fusion=self.fusion):
+            dense_future = self._pool.submit(self._dense_search, text, n, filter)
+            if filter is None:
+                sparse_ranked = self.sparse.top_k(tokens, n)
+            else:
+                allowed = self.dense.filter_rows(filter)
+                sparse_ranked = [hit for hit in self.sparse.top_k(tokens, len(self.sparse)) if hit[0] in allowed][:n]
+            dense_ranked = dense_future.result()
+            if self.fusion == "rrf":
+                fused = _rank_fusion((dense_ranked, sparse_ranked), self.weights, self.rrf_k)
+            else:
+                fused = _score_fusion((dense_ranked, sparse_ranked), self.weights)
+        return sorted(fused.items(), key=lambda x: (-x[1], x[0]))[:top_k]
+
+    # ----- BM25 工具接口 -----
+    def get_scores(self, query_tokens: Union[str, Sequence[str]], top_k: Optional[int] = None) -> List[float]:
+        """与 BM25Okapi.get_scores 相同的形状：每行一个分数，未进入融合候选的行为 0"""
+        top_k = top_k or max(1, min(len(self.sparse), 16))
+        scores = [0.0] * len(self.sparse)
+        for row, score in self.search(query_tokens, top_k):
+            scores[row] = score
+        return scores
+
+    # ----- RagDatabase 接口（RAGRetriever 的 database） -----
+    def retrieve_index_and_similarity(self, query: Union[str, Sequence[str]], top_k: int = 4,
+                                      filter: Optional[Dict] = None):
+        import torch
+        hits = self.search(query, top_k, filter)
+        return (torch.tensor([h[0] for h in hits], dtype=torch.long),
+                torch.tensor([h[1] for h in hits], dtype=torch.float32))
+
+    def retrieve_with_similarity(self, query: Union[str, Sequence[str]], top_k: int = 4, return_index=False,
+                                 filter: Optional[Dict] = None):
+        idxs, scores = self.retrieve_index_and_similarity(query, top_k, filter)
+        rows = idxs.tolist()
+        result = {k: [v[i] for i in rows] for k, v in self.columns.items()}
+        return (result, scores, idxs) if return_index else (result, scores)
+
+    def retrieve(self, query, top_k=4, filter: Optional[Dict] = None):
+        docs, _ = self.retrieve_with_similarity(query, top_k, filter=filter)
+        return docs
@@ -1,7 +1,9 @@
 import json
 import re
-from typing import List, Set, Dict, Any
+from typing import List, Dict
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from monitor import REGISTRY
 # 引入 rank_bm25 库
 try:
     from rank_bm25 import BM25Okapi
@@ -21,7 +23,7 @@ class CivilCodeBM25Tool(BaseTool):
         :param json_path: Path to the .json file containing the legal articles.
         """
         self._json_path = json_path
-        self._unique_retrieved_ids: Set[str] = set()
+        self._coverage = CoverageTracker()
         
         # 1. Load Data
         print(f"[Init] Loading Civil Code data from {json_path}...")
@@ -67,12 +69,17 @@ class CivilCodeBM25Tool(BaseTool):
         :param action_input: The search query (e.g., 'divorce cooling-off period').
         :param top_k: Number of documents to retrieve.
         """
+        return self.render(action_input, self.retrieve(action_input, top_k))
+
+    def retrieve(self, action_input: str, top_k: int = 3) -> list:
+        """BM25 top_k 的 (文档, 分数)，过滤 0 分结果；不更新唯一数据统计"""
         # 1. Tokenize Query
         tokenized_query = self._tokenize(action_input)
         
         # 2. Get Scores
         # We manually get scores to filter and sort
-        doc_scores = self._bm25.get_scores(tokenized_query)
+        with REGISTRY.timer("bm25_score_seconds", "BM25 打分耗时", tool=self.name):
+            doc_scores = self._bm25.get_scores(tokenized_query)
         
         # Zip scores with documents and sort by score descending
         top_results = sorted(
@@ -83,17 +90,19 @@ class CivilCodeBM25Tool(BaseTool):
         
         # Filter out results with 0 score (irrelevant)
         top_results = [res for res in top_results if res[1] > 0]
+        return top_results
 
+    def render(self, action_input: str, top_results: list) -> str:
+        """记录唯一数据并格式化 observation"""
         # 3. Update Unique Statistics
         new_items = 0
         for doc, score in top_results:
             # Use 'name' (Article ID) as the unique identifier
             doc_id = doc.get('name')
-            if doc_id not in self._unique_retrieved_ids:
-                self._unique_retrieved_ids.add(doc_id)
+            if self._coverage.add(doc_id):
                 new_items += 1
         
-        total_unique = len(self._unique_retrieved_ids)
+        total_unique = len(self._coverage)
 
         # 4. Format Output
         if not top_results:
@@ -112,11 +121,6 @@ class CivilCodeBM25Tool(BaseTool):
         #print(output_buffer)
         return "\n".join(output_buffer)
 
-    def get_unique_stats(self) -> int:
-
-        return {
-            "total_unique_docs_retrieved": len(self._unique_retrieved_ids)
-        }
 
 # # ==========================================
 # # Mock usage for demonstration
@@ -135,4 +139,4 @@ class CivilCodeBM25Tool(BaseTool):
     
 #     # 5. Run Query 3: Repeat logic to check unique count
 #     print("\n>>> Query 3: 'divorce' (Should not increase unique count)")
-#     print(tool.run("divorce"))
\ No newline at end of file
+#     print(tool.run("divorce"))
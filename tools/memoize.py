@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from tools.base_tools import BaseTool
+from monitor import REGISTRY
+
+# 各工具用来记录"已检索唯一数据"的属性名（tools.coverage.CoverageTracker）
+TRACKER_ATTRS = ("_coverage",)
+
+
+def normalize_action_input(action_input: Any) -> str:
+    """把 Action Input 规整为缓存键：大小写、首尾及连续空白不敏感；dict / list 按 JSON 排序序列化"""
+    if isinstance(action_input, str):
+        return " ".join(action_input.split()).casefold()
+    try:
+        return json.dumps(action_input, sort_keys=True, ensure_ascii=False).casefold()
+    except TypeError:
+        return " ".join(str(action_input).split()).casefold()
+
+
+class MemoizedTool(BaseTool):
+    """
+    任意 BaseTool 的记忆化包装：
+    - 只缓存提供 retrieve / render 两段式接口的工具（见 BaseTool）：以规整后的输入为键缓存 retrieve() 的结构化结果
+    - 命中缓存时用缓存结果调用 render()，由工具自己更新 tracker 并格式化，
+      "New unique records" 等计数与真实检索一致（重复查询显示 0 条新增）
+    - 没有该接口的工具直接透传 run()，不缓存；retrieve / render 抛异常时退回 run()，错误结果不缓存
+    - LRU 容量上限 + TTL 过期
+    - 命中 / 未命中 / 淘汰次数在 get_cache_stats() 与 get_unique_stats() 中可见
+    """
+
+    def __init__(self, tool: BaseTool, maxsize: int = 1024, ttl: Optional[float] = None):
+        self._tool = tool
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def name(self) -> str:
+        return self._tool.name
+
+    @property
+    def description(self) -> str:
+        return self._tool.description
+
+    def __getattr__(self, item):
+        # 其余属性（tracker、get_unique_doc_count 等）透传给内部工具
+        tool = self.__dict__.get("_tool")
+        if tool is None:
+            raise AttributeError(item)
+        return getattr(tool, item)
+
+    def _cacheable(self) -> bool:
+        return callable(getattr(self._tool, "retrieve", None)) and callable(getattr(self._tool, "render", None))
+
+    def run(self, action_input: Any) -> Any:
+        if not self._cacheable():
+            return self._tool.run(action_input)
+        key = normalize_action_input(action_input)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and self._ttl is not None and now - entry[0] > self._ttl:
+                del self._cache[key]
+                self._evictions += 1
+                entry = None
+            try:
+                if entry is not None:
+                    self._cache.move_to_end(key)
+                    self._hits += 1
+                    REGISTRY.counter("tool_cache_hits_total", "工具结果缓存命中次数").inc(tool=self.name)
+                    return self._tool.render(action_input, entry[1])
+
+                self._misses += 1
+                REGISTRY.counter("tool_cache_misses_total", "工具结果缓存未命中次数").inc(tool=self.name)
+                result = self._tool.retrieve(action_input)
+                observation = self._tool.render(action_input, result)
+            except Exception:
+                # 错误文案由工具自己的 run 给出
+                return self._tool.run(action_input)
+            self._cache[key] = (now, result)
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+                self._evictions += 1
+            REGISTRY.gauge("tool_cache_size", "工具结果缓存条目数").set(len(self._cache), tool=self.name)
+            return observation
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def get_cache_stats(self) -> dict:
+        total = self._hits + self._misses
+        return {
+            "cache_hits": self._hits,
+            "cache_misses": self._misses,
+            "cache_evictions": self._evictions,
+            "cache_size": len(self._cache),
+            "cache_hit_rate": self._hits / total if total else 0.0,
+        }
+
+    def get_unique_stats(self) -> dict:
+        stats = dict(self._tool.get_unique_stats()) if hasattr(self._tool, "get_unique_stats") else {}
+        stats.update(self.get_cache_stats())
+        return stats
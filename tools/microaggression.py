@@ -1,9 +1,10 @@
 import json
 import re
-import hashlib
 import os
-from typing import List, Set, Dict, Any
+from typing import List, Dict
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from monitor import REGISTRY
 
 # 模拟 rank_bm25
 try:
@@ -30,7 +31,7 @@ class MicroaggressionBM25Tool(BaseTool):
         Initialize the Microaggression Search Tool.
         """
         self._json_path = json_path
-        self._unique_retrieved_hashes: Set[str] = set()
+        self._coverage = CoverageTracker()
         
         # 1. Load Data (Mock data embedded)
         print(f"[Init] Loading Microaggression dataset...")
@@ -91,10 +92,6 @@ class MicroaggressionBM25Tool(BaseTool):
         clean_text = re.sub(r'[^a-zA-Z0-9]', ' ', text.lower())
         return clean_text.split()
 
-    def _get_doc_id(self, doc: Dict[str, Any]) -> str:
-        content_str = doc.get('phrase', '')
-        return hashlib.md5(str(content_str).encode('utf-8')).hexdigest()
-
     @property
     def name(self) -> str:
         return "MicroaggressionDatasetRetriever"
@@ -109,24 +106,30 @@ class MicroaggressionBM25Tool(BaseTool):
 
     def run(self, action_input: str, top_k: int = 3) -> str:
         if not self._bm25: return "Error: Database is empty."
+        return self.render(action_input, self.retrieve(action_input, top_k))
 
+    def retrieve(self, action_input: str, top_k: int = 3) -> list:
+        """BM25 top_k 的 (行号, 分数)，过滤 0 分结果；不更新唯一数据统计"""
         tokenized_query = self._tokenize(action_input)
-        doc_scores = self._bm25.get_scores(tokenized_query)
+        with REGISTRY.timer("bm25_score_seconds", "BM25 打分耗时", tool=self.name):
+            doc_scores = self._bm25.get_scores(tokenized_query)
         
-        top_results = sorted(zip(self._documents, doc_scores), key=lambda x: x[1], reverse=True)[:top_k]
-        top_results = [res for res in top_results if res[1] > 0]
+        # 记录行号：唯一数据统计按行号记入位图，不再对全文做 MD5
+        top_idx = sorted(range(len(self._documents)), key=lambda i: doc_scores[i], reverse=True)[:top_k]
+        top_idx = [i for i in top_idx if doc_scores[i] > 0]
+        return [(i, doc_scores[i]) for i in top_idx]
+
+    def render(self, action_input: str, hits: list) -> str:
+        """记录唯一数据并格式化 observation"""
+        top_idx = [i for i, _ in hits]
+        top_results = [(self._documents[i], score) for i, score in hits]
 
         if not top_results:
             return "No relevant microaggressions found for your query."
 
-        new_items = 0
-        for doc, score in top_results:
-            doc_id = self._get_doc_id(doc)
-            if doc_id not in self._unique_retrieved_hashes:
-                self._unique_retrieved_hashes.add(doc_id)
-                new_items += 1
+        new_items = sum(self._coverage.observe(top_idx))
         
-        output_buffer = [f"### Microaggression Search Results (Session Unique: {len(self._unique_retrieved_hashes)})"]
+        output_buffer = [f"### Microaggression Search Results (Session Unique: {len(self._coverage)})"]
         
         for i, (doc, score) in enumerate(top_results):
             output_buffer.append(f"\n--- Item {i+1} (Relevance: {score:.4f}) ---")
@@ -136,8 +139,3 @@ class MicroaggressionBM25Tool(BaseTool):
         
         output_buffer.append(f"\n[System Info]: Retrieved {len(top_results)} items ({new_items} new).")
         return "\n".join(output_buffer)
-    def get_unique_stats(self) -> int:
-
-        return {
-            "total_unique_docs_retrieved": len(self._unique_retrieved_hashes)
-        }
\ No newline at end of file
@@ -1,5 +1,7 @@
-from typing import Set, List, Dict
+from typing import List, Dict
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from tools.substring_index import SubstringIndex
 
 class PhishingEmailTool(BaseTool):
     """
@@ -7,11 +9,13 @@ class PhishingEmailTool(BaseTool):
     It retrieves emails flagged as suspicious, security alerts, or potential fraud.
     """
 
+    unique_stats_label = "total_unique_phishing_emails_retrieved"
+
     def __init__(self):
         print(f"Initializing PhishingEmailTool... Loading simulated security logs.")
         
         # 1. Initialize Unique Data Tracker
-        self._unique_retrieved_ids: Set[str] = set()
+        self._coverage = CoverageTracker()
 
         # 2. Mock Data (Structure mimics 'marketing_email' table)
         self.mock_data = [
@@ -24,6 +28,9 @@ class PhishingEmailTool(BaseTool):
             {"id": "sec_007", "subject": "Package Delivery Failed", "from": "tracking@dhl-express-fake.com", "to": "front-desk@company.com", "context": "We could not deliver your package. Click the link to reschedule delivery fee payment."},
         ]
 
+        # 3. In-memory substring index over the LIKE columns
+        self._index = SubstringIndex(self.mock_data, ("subject", "from", "to", "context"))
+
     @property
     def name(self) -> str:
         return "SecurityEmailSearch"
@@ -41,51 +48,39 @@ class PhishingEmailTool(BaseTool):
         Executes a simulated fuzzy search on phishing emails.
         """
         try:
-            query = action_input.lower()
-            results = []
-
-            # --- Simulated SQL LIKE Query ---
-            # WHERE subject LIKE %query% OR from LIKE %query% OR context LIKE %query%
-            for row in self.mock_data:
-                if (query in row['subject'].lower() or 
-                    query in row['from'].lower() or 
-                    query in row['to'].lower() or 
-                    query in row['context'].lower()):
-                    results.append(row)
-            
-            # Limit to 5
-            retrieved_rows = results[:5]
-
-            if not retrieved_rows:
-                return f"No security emails found matching the query: '{action_input}'."
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"Error retrieving security email info: {str(e)}"
 
-            # --- Logic to Track Unique Data ---
-            newly_seen_count = 0
-            for row in retrieved_rows:
-                r_id = row['id']
-                if r_id not in self._unique_retrieved_ids:
-                    self._unique_retrieved_ids.add(r_id)
-                    newly_seen_count += 1
-            # ----------------------------------
+    def retrieve(self, action_input: str) -> List[Dict]:
+        """命中的行（不更新唯一数据统计）"""
+        # --- Simulated SQL LIKE Query ---
+        # WHERE subject LIKE %query% OR from LIKE %query% OR context LIKE %query%
+        return self._index.search(action_input, limit=5)
 
-            output_parts = [f"Found relevant security emails (New unique records: {newly_seen_count}):"]
-            
-            for i, row in enumerate(retrieved_rows):
-                record_text = (
-                    f"Subject: {row['subject']}\n"
-                    f"From: {row['from']}\n"
-                    f"To: {row['to']}\n"
-                    f"Content: {row['context']}"
-                )
-                output_parts.append(f"--- Email {i+1} (ID: {row['id']}) ---")
-                output_parts.append(record_text)
-            
-            return "\n".join(output_parts)
+    def render(self, action_input: str, retrieved_rows: List[Dict]) -> str:
+        """记录唯一数据并格式化 observation"""
+        if not retrieved_rows:
+            return f"No security emails found matching the query: '{action_input}'."
 
-        except Exception as e:
-            return f"Error retrieving security email info: {str(e)}"
+        # --- Logic to Track Unique Data ---
+        newly_seen_count = 0
+        for row in retrieved_rows:
+            r_id = row['id']
+            if self._coverage.add(r_id):
+                newly_seen_count += 1
+        # ----------------------------------
 
-    def get_unique_stats(self) -> dict:
-        return {
-            "total_unique_phishing_emails_retrieved": len(self._unique_retrieved_ids)
-        }
\ No newline at end of file
+        output_parts = [f"Found relevant security emails (New unique records: {newly_seen_count}):"]
+        
+        for i, row in enumerate(retrieved_rows):
+            record_text = (
+                f"Subject: {row['subject']}\n"
+                f"From: {row['from']}\n"
+                f"To: {row['to']}\n"
+                f"Content: {row['context']}"
+            )
+            output_parts.append(f"--- Email {i+1} (ID: {row['id']}) ---")
+            output_parts.append(record_text)
+        
+        return "\n".join(output_parts)
@@ -1,9 +1,10 @@
-from typing import Set, List, Dict, Any
 import pymysql
 # Assuming db_config is in the python path or same directory
 from tools.db_configs import get_db_connection
 # Assuming BaseTool is defined as per your context
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from monitor import REGISTRY
 
 class PokemonDatabaseTool(BaseTool):
     """
@@ -18,8 +19,8 @@ class PokemonDatabaseTool(BaseTool):
         self.database_name = database_name
         
         # 2. Initialize Unique Data Tracker
-        # We use a Set to store unique Pokemon IDs (primary key) to track what has been seen.
-        self._unique_retrieved_ids: Set[str] = set()
+        # We use a CoverageTracker keyed by Pokemon ID (primary key) to track what has been seen.
+        self._coverage = CoverageTracker()
 
     @property
     def name(self) -> str:
@@ -38,6 +39,13 @@ class PokemonDatabaseTool(BaseTool):
         Executes the SQL fuzzy search.
         Returns the content of the retrieved records as a single formatted string.
         """
+        try:
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"Error retrieving Pokemon info: {str(e)}"
+
+    def retrieve(self, action_input: str) -> list:
+        """执行 SQL 模糊查询，返回命中的行（不更新唯一数据统计）"""
         connection = None
         try:
             # Connect to the database
@@ -58,64 +66,56 @@ class PokemonDatabaseTool(BaseTool):
             
             # Format the input for LIKE search (e.g., '%pikachu%')
             search_term = f"%{action_input}%"
-            cursor.execute(sql_query, (search_term, search_term, search_term, search_term))
+            with REGISTRY.timer("db_query_seconds", "SQL 查询耗时", tool=self.name):
+                cursor.execute(sql_query, (search_term, search_term, search_term, search_term))
             
-            retrieved_rows = cursor.fetchall()
-
-            if not retrieved_rows:
-                return f"No Pokemon found matching the query: '{action_input}'."
-
-            # --- Logic to Track Unique Data ---
-            newly_seen_count = 0
-            for row in retrieved_rows:
-                # We use the unique 'id' column from the database as the identifier
-                p_id = str(row.get('id')) 
-                if p_id not in self._unique_retrieved_ids:
-                    self._unique_retrieved_ids.add(p_id)
-                    newly_seen_count += 1
-            # ----------------------------------
-
-            # Format the output for the Agent
-            output_parts = [f"Found relevant Pokemon info (New unique records: {newly_seen_count}):"]
-            
-            for i, row in enumerate(retrieved_rows):
-                # Constructing a readable format for the LLM
-                p_name = row.get('name', 'Unknown')
-                p_type1 = row.get('type_1', '')
-                p_type2 = row.get('type_2', '')
-                p_caption = row.get('caption', '')
-                
-                # Handling type formatting
-                types = p_type1
-                if p_type2 and p_type2.lower() != 'none' and p_type2.strip() != '':
-                    types += f" / {p_type2}"
-
-                record_text = (
-                    f"Name: {p_name}\n"
-                    f"Type: {types}\n"
-                    f"Description: {p_caption}"
-                )
-
-                output_parts.append(f"--- Document {i+1} (ID: {row.get('id')}) ---")
-                output_parts.append(record_text)
-            
-            return "\n".join(output_parts)
+            return cursor.fetchall()
 
-        except Exception as e:
-            return f"Error retrieving Pokemon info: {str(e)}"
-        
         finally:
             # Ensure database connection is closed
             if connection:
                 connection.close()
 
-    def get_unique_stats(self) -> dict:
-        """
-        Custom method to return the statistics of unique data retrieved.
-        """
-        return {
-            "total_unique_docs_retrieved": len(self._unique_retrieved_ids)
-        }
+    def render(self, action_input: str, retrieved_rows: list) -> str:
+        """记录唯一数据并格式化 observation"""
+        if not retrieved_rows:
+            return f"No Pokemon found matching the query: '{action_input}'."
+
+        # --- Logic to Track Unique Data ---
+        newly_seen_count = 0
+        for row in retrieved_rows:
+            # We use the unique 'id' column from the database as the identifier
+            p_id = str(row.get('id')) 
+            if self._coverage.add(p_id):
+                newly_seen_count += 1
+        # ----------------------------------
+
+        # Format the output for the Agent
+        output_parts = [f"Found relevant Pokemon info (New unique records: {newly_seen_count}):"]
+        
+        for i, row in enumerate(retrieved_rows):
+            # Constructing a readable format for the LLM
+            p_name = row.get('name', 'Unknown')
+            p_type1 = row.get('type_1', '')
+            p_type2 = row.get('type_2', '')
+            p_caption = row.get('caption', '')
+            
+            # Handling type formatting
+            types = p_type1
+            if p_type2 and p_type2.lower() != 'none' and p_type2.strip() != '':
+                types += f" / {p_type2}"
+
+            record_text = (
+                f"Name: {p_name}\n"
+                f"Type: {types}\n"
+                f"Description: {p_caption}"
+            )
+
+            output_parts.append(f"--- Document {i+1} (ID: {row.get('id')}) ---")
+            output_parts.append(record_text)
+        
+        return "\n".join(output_parts)
+
 
 # ==========================================
 # Usage Example
@@ -146,4 +146,4 @@ class PokemonDatabaseTool(BaseTool):
 #     # print(response3) # Optionally print content
     
 #     # The internal counter for unique docs shouldn't rise significantly (unless order changed and new items appeared in top 5)
-#     print(f"\n[Stats] Final Unique Pokemon count: {tool.get_unique_stats()['total_unique_pokemon_retrieved']}")
\ No newline at end of file
+#     print(f"\n[Stats] Final Unique Pokemon count: {tool.get_unique_stats()['total_unique_pokemon_retrieved']}")
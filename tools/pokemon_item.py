@@ -1,5 +1,7 @@
-from typing import Set, List, Dict
+from typing import List, Dict
 from tools.base_tools import BaseTool
+from tools.coverage import CoverageTracker
+from tools.substring_index import SubstringIndex
 
 class PokemonItemTool(BaseTool):
     """
@@ -7,11 +9,13 @@ class PokemonItemTool(BaseTool):
     It retrieves item details like healing effects, battle boosts, or evolution stones.
     """
 
+    unique_stats_label = "total_unique_items_retrieved"
+
     def __init__(self):
         print(f"Initializing PokemonItemTool... Loading simulated item data.")
         
         # 1. Initialize Unique Data Tracker
-        self._unique_retrieved_ids: Set[str] = set()
+        self._coverage = CoverageTracker()
 
         # 2. Mock Data (Simulating a database table: 'pokemon_items')
         self.mock_data = [
@@ -24,6 +28,9 @@ class PokemonItemTool(BaseTool):
             {"id": "i_107", "name": "Assault Vest", "category": "Held Item", "description": "Raises Special Defense but prevents the use of status moves."},
         ]
 
+        # 3. In-memory substring index over the LIKE columns
+        self._index = SubstringIndex(self.mock_data, ("name", "category", "description"))
+
     @property
     def name(self) -> str:
         return "PokemonItemSearch"
@@ -40,48 +47,37 @@ class PokemonItemTool(BaseTool):
         Executes a simulated fuzzy search on the item data.
         """
         try:
-            query = action_input.lower()
-            results = []
-
-            # --- Simulated SQL LIKE Query ---
-            for row in self.mock_data:
-                if (query in row['name'].lower() or 
-                    query in row['category'].lower() or 
-                    query in row['description'].lower()):
-                    results.append(row)
-            
-            # Limit to 5
-            retrieved_rows = results[:5]
-
-            if not retrieved_rows:
-                return f"No items found matching the query: '{action_input}'."
+            return self.render(action_input, self.retrieve(action_input))
+        except Exception as e:
+            return f"Error retrieving item info: {str(e)}"
 
-            # --- Logic to Track Unique Data ---
-            newly_seen_count = 0
-            for row in retrieved_rows:
-                r_id = row['id']
-                if r_id not in self._unique_retrieved_ids:
-                    self._unique_retrieved_ids.add(r_id)
-                    newly_seen_count += 1
-            # ----------------------------------
+    def retrieve(self, action_input: str) -> List[Dict]:
+        """命中的行（不更新唯一数据统计）"""
+        # --- Simulated SQL LIKE Query ---
+        return self._index.search(action_input, limit=5)
 
-            output_parts = [f"Found relevant Pokemon items (New unique records: {newly_seen_count}):"]
-            
-            for i, row in enumerate(retrieved_rows):
-                record_text = (
-                    f"Name: {row['name']}\n"
-                    f"Category: {row['category']}\n"
-                    f"Description: {row['description']}"
-                )
-                output_parts.append(f"--- Item {i+1} (ID: {row['id']}) ---")
-                output_parts.append(record_text)
-            
-            return "\n".join(output_parts)
+    def render(self, action_input: str, retrieved_rows: List[Dict]) -> str:
+        """记录唯一数据并格式化 observation"""
+        if not retrieved_rows:
+            return f"No items found matching the query: '{action_input}'."
 
-        except Exception as e:
-            return f"Error retrieving item info: {str(e)}"
+        # --- Logic to Track Unique Data ---
+        newly_seen_count = 0
+        for row in retrieved_rows:
+            r_id = row['id']
+            if self._coverage.add(r_id):
+                newly_seen_count += 1
+        # ----------------------------------
 
-    def get_unique_stats(self) -> dict:
-        return {
-            "total_unique_items_retrieved": len(self._unique_retrieved_ids)
-        }
\ No newline at end of file
+        output_parts = [f"Found relevant Pokemon items (New unique records: {newly_seen_count}):"]
+        
+        for i, row in enumerate(retrieved_rows):
+            record_text = (
+                f"Name: {row['name']}\n"
+                f"Category: {row['category']}\n"
+                f"Description: {row['description']}"
+            )
+            output_parts.append(f"--- Item {i+1} (ID: {row['id']}) ---")
+            output_parts.append(record_text)
+        
+        return "\n".join(output_parts)
@@ -1,58 +1,416 @@
-import os, json, tqdm
+import os, json, threading, tqdm
+from collections import OrderedDict
 import torch
-from typing import Dict, List, Union, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Set, Union, Optional, Tuple
 from sentence_transformers import SentenceTransformer
+from monitor import REGISTRY
+
+QUANTIZATION_MODES = ("int8", "binary")
+DEFAULT_RESCORE_MULTIPLIER = 4
+SEGMENT_DIR = "segments"
+
+# 元数据过滤
+FILTER_STRATEGIES = ("auto", "prefilter", "scan")
+PREFILTER_COST_RATIO = 4.0   # 子集 gather + 点积的单行代价，约为连续全量扫描单行代价的倍数
+FILTER_CACHE_SIZE = 64
+
+_FILTER_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": lambda v, x: v == x,
+    "$ne": lambda v, x: v != x,
+    "$gt": lambda v, x: v is not None and v > x,
+    "$gte": lambda v, x: v is not None and v >= x,
+    "$lt": lambda v, x: v is not None and v < x,
+    "$lte": lambda v, x: v is not None and v <= x,
+    "$in": lambda v, x: v in x,
+    "$nin": lambda v, x: v not in x,
+    "$contains": lambda v, x: v is not None and x in v,
+}
+
+ColumnFilter = Union[Dict[str, Any], Callable[[Dict[str, Any]], bool]]
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class EmbeddingQuantizer:
+    """
+    primary_key_embeddings 的量化副本，只用于粗筛候选：
+    - int8: 每维对称缩放到 [-127, 127]，近似分数 = codes · (query * scale)，扫描带宽为 float32 的 1/4
+    - binary: 每维取符号位并按字节打包，近似分数 = -Hamming(query_bits, codes)，扫描带宽为 1/32
+    扫描按块进行，避免一次性把整张量化矩阵转回浮点。
+    """
+
+    def __init__(self, mode: str, codes: torch.Tensor, scale: Optional[torch.Tensor] = None,
+                 chunk_rows: int = 65536):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}', expected one of {QUANTIZATION_MODES}")
+        self.mode = mode
+        self.codes = codes          # int8: [N, d] int8；binary: [N, ceil(d/8)] uint8
+        self.scale = scale          # int8: [d] float32；binary: None
+        self.chunk_rows = chunk_rows
+        self._popcount = None
+
+    @classmethod
+    def fit(cls, embeddings: torch.Tensor, mode: str, **kwargs) -> "EmbeddingQuantizer":
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}', expected one of {QUANTIZATION_MODES}")
+        scale = None
+        if mode == "int8":
+            scale = (embeddings.float().abs().amax(dim=0) / 127.0).clamp(min=1e-8)
+        quantizer = cls(mode, None, scale, **kwargs)
+        quantizer.codes = quantizer.encode(embeddings)
+        return quantizer
+
+    def encode(self, embeddings: torch.Tensor) -> torch.Tensor:
+        """按当前参数量化一批向量（int8 超出拟合范围的值被截断）"""
+        embeddings = embeddings.float()
+        if self.mode == "int8":
+            return torch.round(embeddings / self.scale.to(embeddings.device)).clamp(-127, 127).to(torch.int8)
+        return self._pack_bits(embeddings > 0)
+
+    def extend(self, embeddings: torch.Tensor):
+        """追加新行的码（沿用已有缩放参数，不重新拟合）"""
+        self.codes = torch.cat([self.codes, self.encode(embeddings).to(self.codes.device)], dim=0)
+
+    @staticmethod
+    def _pack_bits(bits: torch.Tensor) -> torch.Tensor:
+        """[..., d] bool → [..., ceil(d/8)] uint8（低位在前）"""
+        bits = bits.to(torch.uint8)
+        pad = (-bits.shape[-1]) % 8
+        if pad:
+            bits = torch.nn.functional.pad(bits, (0, pad))
+        weights = torch.tensor([1, 2, 4, 8, 16, 32, 64, 128], dtype=torch.uint8, device=bits.device)
+        bits = bits.reshape(*bits.shape[:-1], -1, 8)
+        return (bits * weights).sum(dim=-1, dtype=torch.uint8)
+
+    def _popcount_table(self, device) -> torch.Tensor:
+        if self._popcount is None or self._popcount.device != device:
+            self._popcount = torch.tensor([bin(i).count("1") for i in range(256)], dtype=torch.int32, device=device)
+        return self._popcount
+
+    def approximate_scores(self, query: torch.Tensor) -> torch.Tensor:
+        """query [d] → 所有行的近似相似度 [N]（越大越相似）"""
+        codes = self.codes
+        scores = torch.empty(codes.shape[0], dtype=torch.float32, device=codes.device)
+        if self.mode == "int8":
+            q = (query.float().to(codes.device) * self.scale).unsqueeze(1)
+            for start in range(0, codes.shape[0], self.chunk_rows):
+                block = codes[start:start + self.chunk_rows]
+                scores[start:start + block.shape[0]] = (block.float() @ q).squeeze(1)
+        else:
+            q = self._pack_bits(query.to(codes.device) > 0)
+            table = self._popcount_table(codes.device)
+            for start in range(0, codes.shape[0], self.chunk_rows):
+                block = codes[start:start + self.chunk_rows]
+                distance = table[torch.bitwise_xor(block, q).long()].sum(dim=1)
+                scores[start:start + block.shape[0]] = -distance.float()
+        return scores
+
+    def state_dict(self) -> Dict[str, object]:
+        return {"mode": self.mode, "codes": self.codes, "scale": self.scale}
+
+    @classmethod
+    def from_state_dict(cls, state: Dict[str, object], **kwargs) -> "EmbeddingQuantizer":
+        return cls(state["mode"], state["codes"], state["scale"], **kwargs)
+
+    def nbytes(self) -> int:
+        return self.codes.numel() * self.codes.element_size()
+
 
 class RagDatabase:
     """
     简单可用的 RAG 向量数据库:
     - 文本 → embedding → 存储
     - TopK 语义检索
-    - 可保存 & 加载
+    - 可选 int8 / binary 量化：量化矩阵粗筛 top_k * rescore_multiplier 个候选，再用 float 向量精排
+    - 增量 add_texts / delete / upsert：删除只记录墓碑（行号不变），compact() 时才物理移除
+    - 可保存 & 加载：save() 到同一目录时只追加新的段文件，不重写已有的 embeddings / columns.json
+
+    目录结构:
+      primary_keys.pth + columns.json      基础段
+      segments/seg_XXXXX.pth + .json       追加段（按 segments.json 中的顺序拼接在基础段之后）
+      segments.json                        段清单、id 列名
+      tombstones.json                      已删除的行号
     """
 
     def __init__(
         self,
         embedding_model: SentenceTransformer,
         primary_key_embeddings: torch.Tensor,
-        columns: Dict[str, List]
+        columns: Dict[str, List],
+        quantization: Optional[str] = None,
+        rescore_multiplier: int = DEFAULT_RESCORE_MULTIPLIER,
+        id_column: Optional[str] = None,
+        tombstones: Optional[Iterable[int]] = None
     ):
         self.embedding_model = embedding_model
         self.primary_key_embeddings = primary_key_embeddings  # [N, d]
         self.columns = columns  # {"content":[...], "title":[...]...}
+        self.rescore_multiplier = rescore_multiplier
+        self.id_column = id_column  # delete / upsert 按该列的值定位行；None 时直接使用行号
+        self.quantizer: Optional[EmbeddingQuantizer] = None
+        self._lock = threading.RLock()
+        self._tombstones: Set[int] = set()
+        self._live_mask: Optional[torch.Tensor] = None  # 有墓碑时为 [N] bool，检索时屏蔽已删除行
+        self._id_index: Optional[Dict[object, int]] = None
+        self._storage_dir: Optional[str] = None  # 已与之同步的保存目录
+        self._persisted_rows = 0                 # 该目录中已落盘的行数
+        self._value_indexes: Dict[str, Dict[Any, List[int]]] = {}   # 列 → 值 → 行号（等值 / $in 过滤用）
+        self._filter_cache: "OrderedDict[str, Tuple[torch.Tensor, torch.Tensor]]" = OrderedDict()
+        if tombstones:
+            self._mark_deleted(tombstones)
+        if quantization is not None:
+            self.quantize(quantization)
+
+    def __len__(self) -> int:
+        """未删除的行数"""
+        return self.primary_key_embeddings.shape[0] - len(self._tombstones)
+
+    @property
+    def num_rows(self) -> int:
+        """包括墓碑在内的总行数（行号上界）"""
+        return self.primary_key_embeddings.shape[0]
+
+    # ========= 量化 =========
+    def quantize(self, mode: Optional[str]) -> "RagDatabase":
+        """为 primary_key_embeddings 建立量化副本（None 表示关闭，检索回到精确扫描）"""
+        if mode is None:
+            self.quantizer = None
+        else:
+            with REGISTRY.timer("quantize_seconds", "向量库量化耗时", mode=mode):
+                self.quantizer = EmbeddingQuantizer.fit(self.primary_key_embeddings, mode)
+        return self
+
+    @property
+    def quantization(self) -> Optional[str]:
+        return self.quantizer.mode if self.quantizer is not None else None
 
     # ========= 核心检索 =========
+    def _encode_query(self, query: Union[str, torch.Tensor]) -> torch.Tensor:
+        if isinstance(query, str):
+            with REGISTRY.timer("embedding_encode_seconds", "查询向量编码耗时", source="rag_database"):
+                query = self.embedding_model.encode(query, convert_to_tensor=True)
+        return query
+
+    def _mask_deleted(self, scores: torch.Tensor, mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """屏蔽已删除行；mask 为过滤条件编译出的位图时（已排除墓碑）屏蔽所有不满足条件的行"""
+        mask = self._live_mask if mask is None else mask
+        if mask is None:
+            return scores
+        if mask.shape[0] < scores.shape[0]:  # 编译位图之后并发追加的行视为不满足条件
+            mask = torch.cat([mask, mask.new_zeros(scores.shape[0] - mask.shape[0])])
+        return scores.masked_fill(~mask[:scores.shape[0]].to(scores.device), float("-inf"))
+
+    def _exact_search(self, query: torch.Tensor, top_k: int,
+                      mask: Optional[torch.Tensor] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+        with REGISTRY.timer("dense_search_seconds", "向量库相似度扫描 + topk 耗时", source="rag_database"):
+            similarity = torch.linalg.vecdot(query, self.primary_key_embeddings)  # dot sim
+            scores, idxs = torch.topk(self._mask_deleted(similarity, mask), top_k)
+        return idxs, scores
+
+    def _prefilter_search(self, query: torch.Tensor, rows: torch.Tensor, top_k: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """只对满足过滤条件的行做暴力点积"""
+        with REGISTRY.timer("dense_search_seconds", "向量库相似度扫描 + topk 耗时",
+                            source="rag_database", strategy="prefilter"):
+            keys = self.primary_key_embeddings[rows.to(self.primary_key_embeddings.device)]
+            scores, order = torch.topk(keys @ query.to(keys.device, keys.dtype), top_k)
+        return rows[order.to(rows.device)], scores
+
+    def _quantized_search(self, query: torch.Tensor, top_k: int,
+                          mask: Optional[torch.Tensor] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+        mode = self.quantizer.mode
+        live = len(self) if mask is None else int(mask.sum())
+        n_candidates = min(live, top_k * max(1, self.rescore_multiplier))
+        with REGISTRY.timer("dense_search_seconds", "向量库相似度扫描 + topk 耗时",
+                            source="rag_database", quantization=mode):
+            approx = self._mask_deleted(self.quantizer.approximate_scores(query), mask)
+            candidates = torch.topk(approx, n_candidates).indices
+        with REGISTRY.timer("quantized_rescore_seconds", "量化候选的 float 精排耗时", quantization=mode):
+            # 只读取候选行的 float 向量（load 时以 mmap 打开则只触及这些页）
+            keys = self.primary_key_embeddings[candidates.to(self.primary_key_embeddings.device)]
+            exact = keys @ query.to(keys.device, keys.dtype)
+            scores, order = torch.topk(exact, top_k)
+        return candidates[order.to(candidates.device)], scores
+
     def retrieve_index_and_similarity(
-        self, query: Union[str, torch.Tensor], top_k:int=4
+        self, query: Union[str, torch.Tensor], top_k:int=4, exact: bool = False,
+        filter: Optional[ColumnFilter] = None, strategy: str = "auto"
     ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        filter: 列上的过滤条件（见 filter_rows），只在满足条件的行中检索。
+        strategy: "prefilter" 只对子集暴力计算；"scan" 全量扫描并在扫描内用位图屏蔽；
+                  "auto" 按匹配行数估计两者代价后选择。
+        """
+        query = self._encode_query(query)
+        if filter is None:
+            top_k = min(top_k, len(self))
+            if self.quantizer is None or exact:
+                return self._exact_search(query, top_k)
+            return self._quantized_search(query, top_k)
 
-        if isinstance(query, str):
-            query = self.embedding_model.encode(query, convert_to_tensor=True)
+        rows, mask = self._compiled_filter(filter)
+        top_k = min(top_k, rows.shape[0])
+        if top_k == 0:
+            return torch.empty(0, dtype=torch.long), torch.empty(0)
+        if strategy == "auto":
+            strategy = self._choose_filter_strategy(rows.shape[0], exact)
+        elif strategy not in FILTER_STRATEGIES:
+            raise ValueError(f"Unknown filter strategy '{strategy}', expected one of {FILTER_STRATEGIES}")
+        REGISTRY.counter("filtered_search_total", "带过滤条件的检索次数").inc(strategy=strategy)
+        if strategy == "prefilter":
+            return self._prefilter_search(query, rows, top_k)
+        if self.quantizer is None or exact:
+            return self._exact_search(query, top_k, mask)
+        return self._quantized_search(query, top_k, mask)
 
-        similarity = torch.linalg.vecdot(query, self.primary_key_embeddings)  # dot sim
-        scores, idxs = torch.topk(similarity, top_k)
-        return idxs, scores
+    # ========= 元数据过滤 =========
+    def _value_index(self, column: str) -> Dict[Any, List[int]]:
+        index = self._value_indexes.get(column)
+        if index is None:
+            index = {}
+            for row, value in enumerate(self.columns[column]):
+                if _hashable(value):
+                    index.setdefault(value, []).append(row)
+            self._value_indexes[column] = index
+        return index
+
+    def _compile_column(self, column: str, condition: Any) -> Set[int]:
+        if column not in self.columns:
+            raise KeyError(f"Filter column '{column}' not found in columns {sorted(self.columns)}")
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        rows: Optional[Set[int]] = None
+        for op, operand in condition.items():
+            if op == "$eq" and _hashable(operand):
+                matched = set(self._value_index(column).get(operand, ()))
+            elif op == "$in" and all(_hashable(x) for x in operand):
+                index = self._value_index(column)
+                matched = set().union(*(index.get(x, ()) for x in operand))
+            elif op in _FILTER_OPS:
+                fn = _FILTER_OPS[op]
+                matched = {row for row, value in enumerate(self.columns[column]) if fn(value, operand)}
+            else:
+                raise ValueError(f"Unknown filter operator '{op}', expected one of {sorted(_FILTER_OPS)}")
+            rows = matched if rows is None else rows & matched
+        return rows if rows is not None else set(range(self.num_rows))
+
+    def _compile_filter(self, spec: ColumnFilter) -> Set[int]:
+        if callable(spec):
+            names = list(self.columns)
+            return {row for row, values in enumerate(zip(*(self.columns[k] for k in names)))
+                    if spec(dict(zip(names, values)))}
+        if not isinstance(spec, dict):
+            raise TypeError(f"filter must be a dict or a callable, got {type(spec).__name__}")
+        rows: Optional[Set[int]] = None
+        for key, condition in spec.items():
+            if key == "$and":
+                matched = set.intersection(*(self._compile_filter(c) for c in condition)) if condition \
+                    else set(range(self.num_rows))
+            elif key == "$or":
+                matched = set().union(*(self._compile_filter(c) for c in condition))
+            elif key == "$not":
+                matched = set(range(self.num_rows)) - self._compile_filter(condition)
+            else:
+                matched = self._compile_column(key, condition)
+            rows = matched if rows is None else rows & matched
+        return rows if rows is not None else set(range(self.num_rows))
+
+    def filter_rows(self, filter: ColumnFilter) -> Set[int]:
+        """
+        满足条件且未删除的行号。filter 可以是:
+          {"title": "x"}                          等值
+          {"year": {"$gte": 2020, "$lt": 2024}}   比较（$eq $ne $gt $gte $lt $lte $in $nin $contains）
+          {"$or": [{...}, {...}]} / {"$and": [...]} / {"$not": {...}}
+          callable(row_dict) -> bool              逐行判断（不缓存）
+        """
+        return self._compile_filter(filter) - self._tombstones
+
+    def _compiled_filter(self, filter: ColumnFilter) -> Tuple[torch.Tensor, torch.Tensor]:
+        """过滤条件 → (有序行号, [N] 位图)；dict 条件按内容缓存，增删数据后失效"""
+        key = None if callable(filter) else json.dumps(filter, sort_keys=True, ensure_ascii=False, default=repr)
+        cached = self._filter_cache.get(key) if key is not None else None
+        if cached is not None:
+            self._filter_cache.move_to_end(key)
+            return cached
+        device = self.primary_key_embeddings.device
+        rows = torch.tensor(sorted(self.filter_rows(filter)), dtype=torch.long, device=device)
+        mask = torch.zeros(self.num_rows, dtype=torch.bool, device=device)
+        mask[rows] = True
+        if key is not None:
+            self._filter_cache[key] = (rows, mask)
+            while len(self._filter_cache) > FILTER_CACHE_SIZE:
+                self._filter_cache.popitem(last=False)
+        return rows, mask
+
+    def _choose_filter_strategy(self, matched: int, exact: bool = False) -> str:
+        """子集 gather 的代价 ~ matched * PREFILTER_COST_RATIO；全量扫描 ~ N / 量化压缩比"""
+        compression = 1.0
+        if self.quantizer is not None and not exact:
+            compression = 32.0 if self.quantizer.mode == "binary" else 4.0
+        return "prefilter" if matched * PREFILTER_COST_RATIO <= self.num_rows / compression else "scan"
+
+    def _invalidate_filters(self):
+        self._value_indexes = {}
+        self._filter_cache = OrderedDict()
+
+    def measure_recall(self, queries: Union[List[str], torch.Tensor], top_k: int = 4) -> Dict[str, float]:
+        """
+        量化检索相对精确扫描的 recall@k：两者 top_k 结果的平均重合比例。
+        queries 可以是文本列表或 [Q, d] 查询向量。
+        """
+        if self.quantizer is None:
+            return {"recall_at_k": 1.0, "queries": len(queries), "top_k": top_k}
+        hits, total = 0, 0
+        for query in queries:
+            query = self._encode_query(query)
+            exact_idxs, _ = self.retrieve_index_and_similarity(query, top_k, exact=True)
+            approx_idxs, _ = self.retrieve_index_and_similarity(query, top_k)
+            hits += len(set(exact_idxs.tolist()) & set(approx_idxs.tolist()))
+            total += len(exact_idxs)
+        recall = hits / total if total else 1.0
+        REGISTRY.gauge("quantized_recall_at_k", "量化检索相对精确扫描的 recall@k").set(
+            recall, quantization=self.quantizer.mode, top_k=str(top_k)
+        )
+        return {"recall_at_k": recall, "queries": len(queries), "top_k": top_k}
 
     def retrieve_with_similarity(
-        self, query: Union[str, torch.Tensor], top_k:int=4, return_index=False
+        self, query: Union[str, torch.Tensor], top_k:int=4, return_index=False,
+        filter: Optional[ColumnFilter] = None
     ):
-        idxs, scores = self.retrieve_index_and_similarity(query, top_k)
+        idxs, scores = self.retrieve_index_and_similarity(query, top_k, filter=filter)
         result = {k: [v[i] for i in idxs] for k, v in self.columns.items()}
         print(result)
         return (result, scores, idxs) if return_index else (result, scores)
 
-    def retrieve(self, query, top_k=4):
-        docs, _ = self.retrieve_with_similarity(query, top_k)
+    def retrieve(self, query, top_k=4, filter: Optional[ColumnFilter] = None):
+        docs, _ = self.retrieve_with_similarity(query, top_k, filter=filter)
         return docs
 
     # ========= 构建数据库 =========
+    @staticmethod
+    def _embed_texts(embedding_model: SentenceTransformer, texts: List[str], batch_size: int = 16) -> torch.Tensor:
+        """逐批编码并写入预分配的 [N, d] 张量（不保留批次列表再 cat，峰值内存不翻倍）。大语料见 tools.embedding_builder"""
+        embs = None
+        for i in tqdm.tqdm(range(0, len(texts), batch_size), desc="Embedding"):
+            batch = embedding_model.encode(texts[i:i+batch_size], convert_to_tensor=True, normalize_embeddings=True)
+            if embs is None:
+                embs = torch.empty((len(texts), batch.shape[1]), dtype=batch.dtype, device=batch.device)
+            embs[i:i + batch.shape[0]] = batch
+        return embs
+
     @classmethod
     def from_texts(
         cls, 
         embedding_model: SentenceTransformer, 
         texts: List[str], 
         extra_columns: Optional[Dict[str, List]] = None, 
-        batch_size: int = 16
+        batch_size: int = 16,
+        id_column: Optional[str] = None
     ):
         """
         构建向量库
@@ -68,29 +426,326 @@ class RagDatabase:
                 columns[k] = v
 
         # 计算 embeddings
-        embs = []
-        for i in tqdm.tqdm(range(0, n, batch_size), desc="Embedding"):
-            batch = texts[i:i+batch_size]
-            embs.append(
-                embedding_model.encode(batch, convert_to_tensor=True, normalize_embeddings=True)
-            )
-        embs = torch.cat(embs, dim=0)
+        embs = cls._embed_texts(embedding_model, texts, batch_size)
+
+        return cls(embedding_model, embs, columns, id_column=id_column)
+
+    # ========= 增量更新 =========
+    def _mark_deleted(self, rows: Iterable[int]):
+        rows = [r for r in rows if r not in self._tombstones]
+        if not rows:
+            return
+        self._tombstones.update(rows)
+        n = self.num_rows
+        mask = self._live_mask
+        if mask is None or mask.shape[0] != n:
+            mask = torch.ones(n, dtype=torch.bool, device=self.primary_key_embeddings.device)
+            if self._tombstones:
+                mask[torch.tensor(sorted(self._tombstones), dtype=torch.long, device=mask.device)] = False
+        else:
+            mask = mask.clone()
+            mask[torch.tensor(rows, dtype=torch.long, device=mask.device)] = False
+        self._live_mask = mask  # 整体替换，并发检索看到的要么是旧 mask 要么是新 mask
+        self._invalidate_filters()
+
+    def _row_index(self) -> Dict[object, int]:
+        """id 列的值 → 最新的未删除行号"""
+        if self._id_index is None:
+            if self.id_column not in self.columns:
+                raise KeyError(f"id column '{self.id_column}' not found in columns {sorted(self.columns)}")
+            self._id_index = {
+                value: row for row, value in enumerate(self.columns[self.id_column])
+                if row not in self._tombstones
+            }
+        return self._id_index
+
+    def _resolve_rows(self, ids: Iterable) -> List[int]:
+        if self.id_column is None:
+            rows = [int(i) for i in ids]
+            for row in rows:
+                if not 0 <= row < self.num_rows:
+                    raise IndexError(f"Row {row} out of range for database with {self.num_rows} rows")
+            return rows
+        index = self._row_index()
+        return [index[i] for i in ids if i in index]
+
+    def add_texts(
+        self,
+        texts: List[str],
+        extra_columns: Optional[Dict[str, List]] = None,
+        batch_size: int = 16,
+        embeddings: Optional[torch.Tensor] = None
+    ) -> List[int]:
+        """
+        追加文档（只编码新文本），返回新行号。
+        已有列中 extra_columns 未提供的值记为 None；新出现的列对旧行补 None。
+        """
+        n_new = len(texts)
+        extra_columns = dict(extra_columns or {})
+        for k, v in extra_columns.items():
+            assert len(v) == n_new
+        if embeddings is None:
+            embeddings = self._embed_texts(self.embedding_model, texts, batch_size) if n_new else \
+                self.primary_key_embeddings[:0]
+        embeddings = embeddings.to(self.primary_key_embeddings.device, self.primary_key_embeddings.dtype)
+
+        with self._lock:
+            start = self.num_rows
+            for k in extra_columns:
+                if k not in self.columns:
+                    self.columns[k] = [None] * start
+            for k, values in self.columns.items():
+                values.extend(texts if k == "content" else extra_columns.get(k, [None] * n_new))
+            # 顺序保证并发检索安全：列 → mask → float 向量 → 量化码（任何时刻候选行号都有对应的列与向量）
+            if self._live_mask is not None:
+                self._live_mask = torch.cat([
+                    self._live_mask, torch.ones(n_new, dtype=torch.bool, device=self._live_mask.device)
+                ])
+            self.primary_key_embeddings = torch.cat([self.primary_key_embeddings, embeddings], dim=0)
+            if self.quantizer is not None:
+                self.quantizer.extend(embeddings)
+            if self._id_index is not None:
+                for offset, value in enumerate(self.columns[self.id_column][start:]):
+                    self._id_index[value] = start + offset
+            self._invalidate_filters()
+        REGISTRY.counter("rag_rows_added_total", "增量写入向量库的行数").inc(n_new)
+        return list(range(start, start + n_new))
+
+    def delete(self, ids: Iterable) -> int:
+        """
+        按 id 列的值（未设置 id_column 时为行号）删除，返回实际删除的行数。
+        行只被标记为墓碑，检索时跳过；compact() 时物理移除。
+        """
+        with self._lock:
+            rows = [r for r in self._resolve_rows(ids) if r not in self._tombstones]
+            self._mark_deleted(rows)
+            if self._id_index is not None and self.id_column is not None:
+                for row in rows:
+                    value = self.columns[self.id_column][row]
+                    if self._id_index.get(value) == row:
+                        del self._id_index[value]
+        REGISTRY.counter("rag_rows_deleted_total", "向量库标记删除的行数").inc(len(rows))
+        return len(rows)
+
+    def upsert(
+        self,
+        ids: List,
+        texts: List[str],
+        extra_columns: Optional[Dict[str, List]] = None,
+        batch_size: int = 16
+    ) -> List[int]:
+        """按 id 列替换或插入：旧行记为墓碑，新内容追加到末尾，返回新行号"""
+        if self.id_column is None:
+            raise ValueError("upsert requires an id_column")
+        assert len(ids) == len(texts)
+        extra_columns = dict(extra_columns or {})
+        extra_columns[self.id_column] = list(ids)
+        # 先编码（耗时部分不持锁），再原子地删除旧行 + 追加新行
+        embeddings = self._embed_texts(self.embedding_model, texts, batch_size) if texts else None
+        with self._lock:
+            self.delete(ids)
+            return self.add_texts(texts, extra_columns, batch_size, embeddings=embeddings)
+
+    def compact(self, save_dir: Optional[str] = None, background: bool = False):
+        """
+        物理移除墓碑行，所有段合并为一个基础段（save_dir 或上次保存的目录中的文件会被整体重写）。
+        行号会改变：返回 {旧行号: 新行号}（已删除的行不在其中）。
+        background=True 时在后台线程中执行并返回该线程；压缩期间的检索 / 写入不受阻塞，
+        期间新增的行与删除会在最后一步合并进压缩结果。
+        """
+        if background:
+            thread = threading.Thread(target=self.compact, args=(save_dir,), name="rag-compact", daemon=True)
+            thread.start()
+            return thread
+
+        with REGISTRY.timer("rag_compact_seconds", "向量库压缩耗时"):
+            with self._lock:
+                n0 = self.num_rows
+                dead0 = set(self._tombstones)
+                keys0 = self.primary_key_embeddings
+                columns0 = {k: v[:n0] for k, v in self.columns.items()}
+            keep = [r for r in range(n0) if r not in dead0]
+            keep_idx = torch.tensor(keep, dtype=torch.long, device=keys0.device)
+            new_keys = keys0[:n0].index_select(0, keep_idx)
+            new_columns = {k: [v[r] for r in keep] for k, v in columns0.items()}
 
-        return cls(embedding_model, embs, columns)
+            with self._lock:
+                n1 = self.num_rows
+                remap = {old: new for new, old in enumerate(keep)}
+                remap.update({old: len(keep) + old - n0 for old in range(n0, n1)})
+                for k, values in self.columns.items():
+                    new_columns.setdefault(k, [None] * len(keep)).extend(values[n0:n1])
+                late_deletes = [remap[r] for r in self._tombstones - dead0]
+
+                self.primary_key_embeddings = torch.cat([new_keys, self.primary_key_embeddings[n0:n1]], dim=0)
+                self.columns = new_columns
+                self._tombstones = set()
+                self._live_mask = None
+                self._id_index = None
+                self._invalidate_filters()
+                self._mark_deleted(late_deletes)
+                if self.quantizer is not None:
+                    self.quantize(self.quantizer.mode)
+                target = save_dir or self._storage_dir
+                if target is not None:
+                    self._storage_dir = None  # 强制整体重写
+                    self.save(target)
+        REGISTRY.counter("rag_compactions_total", "向量库压缩次数").inc()
+        deleted = set(late_deletes)
+        return {old: new for old, new in remap.items() if new not in deleted}
 
     # ========= 保存 & 加载 =========
-    def save(self, save_dir):
+    def _write_full(self, save_dir: str):
+        """
+        重写基础段并删除所有追加段。
+        基础段先写临时文件再 os.replace：其他进程 / 本进程旧的 mmap 仍指向原 inode，
+        不会因为文件被原地截断重写而读到半截数据（SIGBUS）。
+        """
         os.makedirs(save_dir, exist_ok=True)
-        torch.save(self.primary_key_embeddings, os.path.join(save_dir, "primary_keys.pth"))
-        with open(os.path.join(save_dir, "columns.json"), "w") as f:
+        old_segments = self._read_manifest(save_dir).get("segments", [])
+        keys_tmp = os.path.join(save_dir, "primary_keys.pth.tmp")
+        columns_tmp = os.path.join(save_dir, "columns.json.tmp")
+        torch.save(self.primary_key_embeddings, keys_tmp)
+        with open(columns_tmp, "w") as f:
             json.dump(self.columns, f, ensure_ascii=False)
+        os.replace(keys_tmp, os.path.join(save_dir, "primary_keys.pth"))
+        os.replace(columns_tmp, os.path.join(save_dir, "columns.json"))
+        self._write_manifest(save_dir, {"base_rows": self.num_rows, "segments": [], "next_segment": 1})
+        # 清单已不再引用旧追加段后才删除其文件
+        for segment in old_segments:
+            for ext in (".pth", ".json"):
+                path = os.path.join(save_dir, SEGMENT_DIR, segment["name"] + ext)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _write_segment(self, save_dir: str, start: int):
+        """把 [start, N) 行写为一个新的追加段"""
+        manifest = self._read_manifest(save_dir)
+        name = f"seg_{manifest.get('next_segment', 1):05d}"
+        os.makedirs(os.path.join(save_dir, SEGMENT_DIR), exist_ok=True)
+        torch.save(self.primary_key_embeddings[start:].clone(), os.path.join(save_dir, SEGMENT_DIR, name + ".pth"))
+        with open(os.path.join(save_dir, SEGMENT_DIR, name + ".json"), "w") as f:
+            json.dump({k: v[start:] for k, v in self.columns.items()}, f, ensure_ascii=False)
+        manifest.setdefault("segments", []).append({"name": name, "rows": self.num_rows - start})
+        manifest["next_segment"] = manifest.get("next_segment", 1) + 1
+        self._write_manifest(save_dir, manifest)
+
+    @staticmethod
+    def _read_manifest(save_dir: str) -> Dict:
+        path = os.path.join(save_dir, "segments.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, save_dir: str, manifest: Dict):
+        manifest["id_column"] = self.id_column
+        tmp = os.path.join(save_dir, "segments.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(save_dir, "segments.json"))
+
+    def save(self, save_dir):
+        """
+        首次保存到某目录时写完整的基础段；之后对同一目录只追加新行的段文件，
+        并更新 tombstones.json / 量化码本。
+        """
+        with self._lock:
+            save_dir_abs = os.path.abspath(save_dir)
+            if save_dir_abs == self._storage_dir and os.path.exists(os.path.join(save_dir, "segments.json")):
+                if self.num_rows > self._persisted_rows:
+                    self._write_segment(save_dir, self._persisted_rows)
+            else:
+                self._write_full(save_dir)
+            self._storage_dir, self._persisted_rows = save_dir_abs, self.num_rows
+
+            with open(os.path.join(save_dir, "tombstones.json"), "w") as f:
+                json.dump(sorted(self._tombstones), f)
+
+            # 量化参数与码本：quantization.json + quantized_keys.pth（未量化时清理旧文件）
+            quant_meta = os.path.join(save_dir, "quantization.json")
+            quant_keys = os.path.join(save_dir, "quantized_keys.pth")
+            if self.quantizer is None:
+                for path in (quant_meta, quant_keys):
+                    if os.path.exists(path):
+                        os.remove(path)
+                return
+            torch.save(self.quantizer.state_dict(), quant_keys)
+            with open(quant_meta, "w") as f:
+                json.dump({
+                    "mode": self.quantizer.mode,
+                    "rescore_multiplier": self.rescore_multiplier,
+                    "rows": int(self.primary_key_embeddings.shape[0]),
+                    "dim": int(self.primary_key_embeddings.shape[1]),
+                }, f)
 
     @classmethod
-    def load(cls, load_dir, embedding_model):
-        device = embedding_model.device
-        pk = torch.load(os.path.join(load_dir, "primary_keys.pth")).to(device)
+    def load(cls, load_dir, embedding_model, quantization: Optional[str] = "auto",
+             rescore_multiplier: Optional[int] = None, id_column: Optional[str] = None):
+        """
+        id_column: delete / upsert 使用的 id 列，缺省时沿用 segments.json 中保存的设置。
+        quantization:
+          "auto"           使用 save() 时保存的量化（没有则精确扫描）
+          None             不量化
+          "int8"/"binary"  指定模式；与已保存的模式一致时直接复用码本，否则重新量化
+        量化时 float 向量在 CPU 上以 mmap 方式加载，精排只读取候选行（有追加段时拼接后常驻内存）。
+        含 shards.json 的目录返回 ShardedRagDatabase（接口相同）。
+        embedding_model 为 None 时只能用查询向量检索（例如分片进程）。
+        """
+        if os.path.exists(os.path.join(load_dir, "shards.json")):
+            from tools.sharded_rag_database import ShardedRagDatabase
+            return ShardedRagDatabase.load(load_dir, embedding_model, quantization=quantization)
+        device = embedding_model.device if embedding_model is not None else "cpu"
+        quant_meta_path = os.path.join(load_dir, "quantization.json")
+        quant_meta = None
+        if os.path.exists(quant_meta_path):
+            with open(quant_meta_path) as f:
+                quant_meta = json.load(f)
+        if quantization == "auto":
+            quantization = quant_meta["mode"] if quant_meta else None
+
+        pk_path = os.path.join(load_dir, "primary_keys.pth")
+        if quantization is not None and torch.device(device).type == "cpu":
+            pk = torch.load(pk_path, map_location="cpu", mmap=True)
+        else:
+            pk = torch.load(pk_path).to(device)
         columns = json.load(open(os.path.join(load_dir, "columns.json")))
-        return cls(embedding_model, pk, columns)
+
+        # 追加段
+        manifest = cls._read_manifest(load_dir)
+        segment_keys = [pk]
+        for segment in manifest.get("segments", []):
+            seg_path = os.path.join(load_dir, SEGMENT_DIR, segment["name"])
+            segment_keys.append(torch.load(seg_path + ".pth", map_location=pk.device))
+            with open(seg_path + ".json", encoding="utf-8") as f:
+                seg_columns = json.load(f)
+            n_before, n_seg = sum(k.shape[0] for k in segment_keys[:-1]), segment["rows"]
+            for k in seg_columns:
+                columns.setdefault(k, [None] * n_before)
+            for k, values in columns.items():
+                values.extend(seg_columns.get(k, [None] * n_seg))
+        if len(segment_keys) > 1:
+            pk = torch.cat(segment_keys, dim=0)
+
+        tombstones_path = os.path.join(load_dir, "tombstones.json")
+        tombstones = []
+        if os.path.exists(tombstones_path):
+            with open(tombstones_path) as f:
+                tombstones = json.load(f)
+
+        if rescore_multiplier is None:
+            rescore_multiplier = quant_meta.get("rescore_multiplier", DEFAULT_RESCORE_MULTIPLIER) \
+                if quant_meta else DEFAULT_RESCORE_MULTIPLIER
+        db = cls(embedding_model, pk, columns, rescore_multiplier=rescore_multiplier,
+                 id_column=id_column or manifest.get("id_column"), tombstones=tombstones)
+        if quantization is not None and quant_meta and quant_meta["mode"] == quantization \
+                and quant_meta.get("rows") == pk.shape[0]:
+            state = torch.load(os.path.join(load_dir, "quantized_keys.pth"), map_location=device)
+            db.quantizer = EmbeddingQuantizer.from_state_dict(state)
+        else:
+            db.quantize(quantization)
+        db._storage_dir, db._persisted_rows = os.path.abspath(load_dir), db.num_rows
+        return db
 
 
 class DPRagDatabase:
@@ -122,9 +777,10 @@ class DPRagDatabase:
 
         # 1. 编码 query
         if isinstance(query, str):
-            query = self.embedding_model.encode(
-                query, convert_to_tensor=True, normalize_embeddings=True
-            )
+            with REGISTRY.timer("embedding_encode_seconds", "查询向量编码耗时", source="dp_rag_database"):
+                query = self.embedding_model.encode(
+                    query, convert_to_tensor=True, normalize_embeddings=True
+                )
 
         # 2. 相似度
         similarity = torch.matmul(self.primary_key_embeddings, query)
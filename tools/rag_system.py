@@ -34,17 +34,19 @@ class RAGRetriever:
         query: str,
         n_retrieval: int = 16,
         n_rerank: int = 4,
-        return_index: bool = False
+        return_index: bool = False,
+        filter: Optional[Dict] = None
     ) -> Tuple[List[str], List[float], Optional[list]]:
         """
-        1) 向量检索 top-k
+        1) 向量检索 top-k（filter: 列上的过滤条件，见 RagDatabase.filter_rows）
         2) reranker 精排 (optional)
         3) 返回精排后的 docs / scores / index
         """
 
         # Step 1: 向量检索
+        filter_kwargs = {"filter": filter} if filter is not None else {}
         retrieval, similarity, doc_idxs = self.database.retrieve_with_similarity(
-            query, top_k=n_retrieval, return_index=True
+            query, top_k=n_retrieval, return_index=True, **filter_kwargs
         )
 
         # Step 2: Rerank （如果有）
@@ -74,7 +76,8 @@ class RAGRetriever:
         query: str,
         n_retrieval: int = 16,
         n_rerank: int = 4,
-        prompt_mode="default"
+        prompt_mode="default",
+        filter: Optional[Dict] = None
     ) -> Dict[str, object]:
         """
         主流程：返回可直接喂给大模型的 prompt + docs + scores
@@ -83,7 +86,8 @@ class RAGRetriever:
             query,
             n_retrieval=n_retrieval,
             n_rerank=n_rerank,
-            return_index=True
+            return_index=True,
+            filter=filter
         )
 
         # 构造 chat template prompt
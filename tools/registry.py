@@ -0,0 +1,310 @@
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from tools.base_tools import BaseTool
+from monitor import REGISTRY
+
+"""
+声明式工具注册表：
+- 工具名 → 工厂（"module:Class"）+ 构造参数 + 所需的共享资源，来自 JSON manifest 或 entry points
+- 工具在第一次使用时才实例化；重量级资源（Embedding 模型、向量库）进程内只加载一次并在工具间共享
+- warm_up() 先并行预加载资源，再并行实例化工具
+"""
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tool_manifest.json")
+DEFAULT_CORPUS_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".corpus_cache")
+ENTRY_POINT_GROUP = "toolleak.tools"
+
+
+# ========= 共享资源 =========
+class ResourcePool:
+    """按 key 缓存的进程级资源池：同一 key 的工厂只会执行一次（并发请求会等待同一次加载）"""
+
+    def __init__(self):
+        self._resources: Dict[Tuple, Any] = {}
+        self._locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, factory: Callable[[], Any]) -> Any:
+        if key in self._resources:
+            return self._resources[key]
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._resources:
+                with REGISTRY.timer("resource_load_seconds", "共享资源加载耗时", resource=key[0]):
+                    self._resources[key] = factory()
+        return self._resources[key]
+
+    def loaded(self, key: Tuple) -> bool:
+        return key in self._resources
+
+    def clear(self):
+        with self._lock:
+            self._resources.clear()
+            self._locks.clear()
+
+
+RESOURCES = ResourcePool()
+
+
+def shared_sentence_model(model_name: str):
+    """所有工具共用的 SentenceTransformer 实例"""
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    return RESOURCES.get(("sentence_model", model_name), load)
+
+
+def shared_rag_database(db_cls, db_path: str, model_name: str, **load_kwargs):
+    """按 (库类型, 路径, 模型, 加载参数) 共享的只读向量库；load_kwargs 例如 quantization="int8" """
+    return RESOURCES.get(
+        ("rag_database", db_cls.__name__, db_path, model_name, *sorted(load_kwargs.items())),
+        lambda: db_cls.load(db_path, shared_sentence_model(model_name), **load_kwargs),
+    )
+
+
+def _corpus_key(model_name: str, columns: Dict[str, List]) -> str:
+    h = hashlib.sha1(model_name.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(json.dumps(columns, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+def shared_corpus_database(model_name: str, texts: List[str], extra_columns: Optional[Dict[str, List]] = None,
+                           cache_dir: Optional[str] = DEFAULT_CORPUS_CACHE):
+    """
+    代码内置的小语料（如 CorporatePolicyTool 的知识库）对应的 RagDatabase：
+    按 (模型, 全部列内容) 的哈希落盘到 cache_dir/<hash>/，之后的进程直接加载向量而不重新编码；
+    进程内同一语料只加载一次。语料或模型变化时哈希随之变化，旧目录不会被误用。cache_dir=None 时不落盘。
+    """
+    from tools.rag_database import RagDatabase
+
+    columns = {"content": list(texts), **(extra_columns or {})}
+    key = _corpus_key(model_name, columns)
+
+    def load():
+        model = shared_sentence_model(model_name)
+        path = os.path.join(cache_dir, key) if cache_dir else None
+        if path and os.path.exists(os.path.join(path, "primary_keys.pth")):
+            return RagDatabase.load(path, model)
+        db = RagDatabase.from_texts(model, columns["content"], extra_columns)
+        if path:
+            # 先写临时目录再改名，并发进程不会读到写了一半的库
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = tempfile.mkdtemp(prefix=key + ".", dir=cache_dir)
+            db.save(tmp)
+            try:
+                os.rename(tmp, path)
+            except OSError:  # 另一个进程已写好
+                shutil.rmtree(tmp, ignore_errors=True)
+        return db
+
+    return RESOURCES.get(("corpus_database", model_name, key), load)
+
+
+# manifest 中资源声明的格式为 "<kind>:<arg>"，例如 "sentence_model:sentence-transformers/all-MiniLM-L6-v2"
+_RESOURCE_LOADERS: Dict[str, Callable[[str], Any]] = {
+    "sentence_model": shared_sentence_model,
+}
+
+
+def preload_resource(spec: str) -> Any:
+    kind, _, arg = spec.partition(":")
+    if kind not in _RESOURCE_LOADERS:
+        raise ValueError(f"Unknown resource kind '{kind}' in spec '{spec}'")
+    return _RESOURCE_LOADERS[kind](arg)
+
+
+# ========= 工具注册 =========
+def _resolve_factory(factory: Any) -> Callable[..., BaseTool]:
+    if callable(factory):
+        return factory
+    module_name, _, attr = str(factory).partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class ToolSpec:
+    """一条工具声明：工厂 + 参数 + 依赖的共享资源；name / description 可选，用于免实例化地展示工具"""
+
+    def __init__(self, key: str, factory: Any, kwargs: Optional[Dict[str, Any]] = None,
+                 resources: Iterable[str] = (), tool_name: Optional[str] = None,
+                 description: Optional[str] = None):
+        self.key = key
+        self.factory = factory
+        self.kwargs = dict(kwargs or {})
+        self.resources = list(resources)
+        self.tool_name = tool_name
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ToolSpec":
+        return cls(
+            key=data["key"],
+            factory=data["factory"],
+            kwargs=data.get("kwargs"),
+            resources=data.get("resources", ()),
+            tool_name=data.get("name"),
+            description=data.get("description"),
+        )
+
+
+class LazyTool(BaseTool):
+    """
+    工具的惰性代理：name（若 manifest 声明）可直接读取，
+    第一次访问 description / run 或其他属性时才通过注册表实例化真实工具。
+    """
+
+    def __init__(self, registry: "ToolRegistry", key: str):
+        self._registry = registry
+        self._key = key
+
+    @property
+    def tool(self) -> BaseTool:
+        return self._registry.get(self._key)
+
+    @property
+    def name(self) -> str:
+        spec = self._registry.spec(self._key)
+        return spec.tool_name if spec.tool_name else self.tool.name
+
+    @property
+    def description(self) -> str:
+        spec = self._registry.spec(self._key)
+        return spec.description if spec.description else self.tool.description
+
+    def run(self, action_input: Any) -> Any:
+        return self.tool.run(action_input)
+
+    def get_unique_stats(self) -> dict:
+        return self.tool.get_unique_stats()
+
+    def __getattr__(self, item):
+        # tracker、get_unique_stats 等透传给真实工具
+        if item.startswith("__") or "_registry" not in self.__dict__:
+            raise AttributeError(item)
+        return getattr(self.tool, item)
+
+    def __setattr__(self, item, value):
+        # 写属性同样落到真实工具上（tracker 等状态只保存在真实工具里）
+        if item in ("_registry", "_key"):
+            object.__setattr__(self, item, value)
+        else:
+            setattr(self.tool, item, value)
+
+
+class ToolRegistry:
+    def __init__(self, specs: Iterable[ToolSpec] = ()):
+        self._specs: Dict[str, ToolSpec] = {}
+        self._instances: Dict[str, BaseTool] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        for spec in specs:
+            self.register(spec)
+
+    # ----- 注册 -----
+    def register(self, spec: ToolSpec):
+        with self._lock:
+            self._specs[spec.key] = spec
+            self._locks.setdefault(spec.key, threading.Lock())
+            self._instances.pop(spec.key, None)
+
+    def load_manifest(self, path: str = DEFAULT_MANIFEST) -> "ToolRegistry":
+        with open(path, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                self.register(ToolSpec.from_dict(entry))
+        return self
+
+    def load_entry_points(self, group: str = ENTRY_POINT_GROUP) -> "ToolRegistry":
+        """
+        通过 entry points 注册第三方工具：值可以是工具类 / 工厂函数，或 manifest 条目（dict / list）。
+        """
+        from importlib.metadata import entry_points
+        try:
+            eps = entry_points(group=group)
+        except TypeError:  # Python < 3.10
+            eps = entry_points().get(group, [])
+        for ep in eps:
+            obj = ep.load()
+            if callable(obj):
+                self.register(ToolSpec(ep.name, obj))
+            else:
+                for entry in ([obj] if isinstance(obj, dict) else obj):
+                    self.register(ToolSpec.from_dict(entry))
+        return self
+
+    @classmethod
+    def from_manifest(cls, path: str = DEFAULT_MANIFEST) -> "ToolRegistry":
+        return cls().load_manifest(path)
+
+    # ----- 查询 -----
+    def keys(self) -> List[str]:
+        return list(self._specs)
+
+    def spec(self, key: str) -> ToolSpec:
+        if key not in self._specs:
+            raise KeyError(f"Tool '{key}' is not registered. Available: {', '.join(self._specs)}")
+        return self._specs[key]
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._instances
+
+    # ----- 实例化 -----
+    def get(self, key: str) -> BaseTool:
+        """返回工具实例，第一次调用时才实例化（并发调用只构造一次）"""
+        if key in self._instances:
+            return self._instances[key]
+        spec = self.spec(key)
+        with self._locks[key]:
+            if key not in self._instances:
+                for resource in spec.resources:
+                    preload_resource(resource)
+                with REGISTRY.timer("tool_init_seconds", "工具实例化耗时", tool=key):
+                    self._instances[key] = _resolve_factory(spec.factory)(**spec.kwargs)
+        return self._instances[key]
+
+    def lazy(self, key: str) -> LazyTool:
+        self.spec(key)
+        return LazyTool(self, key)
+
+    def warm_up(self, keys: Optional[Iterable[str]] = None, max_workers: int = 4) -> Dict[str, Any]:
+        """
+        并行预加载：先加载所有去重后的共享资源，再并行实例化工具。
+
+        Returns:
+            Dict[str, Any]: 工具 key → 实例化耗时（秒）或异常。
+        """
+        keys = list(keys) if keys is not None else self.keys()
+        resources = sorted({r for k in keys for r in self.spec(k).resources})
+        report: Dict[str, Any] = {}
+
+        def build(key):
+            start = time.perf_counter()
+            self.get(key)
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-warmup") as pool:
+            for resource, future in [(r, pool.submit(preload_resource, r)) for r in resources]:
+                try:
+                    future.result()
+                except Exception as e:
+                    report[resource] = e
+            futures = {key: pool.submit(build, key) for key in keys}
+            for key, future in futures.items():
+                try:
+                    report[key] = future.result()
+                except Exception as e:
+                    report[key] = e
+        return report
+
+
+# 默认注册表：仓库自带工具的 manifest
+TOOL_REGISTRY = ToolRegistry.from_manifest(DEFAULT_MANIFEST)
@@ -0,0 +1,361 @@
+import argparse
+import atexit
+import heapq
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import torch
+
+from monitor import REGISTRY
+from tools.rag_database import RagDatabase
+
+"""
+分片向量库：把 RagDatabase 的行按连续区间切成 N 个分片，每个分片由一个独立进程持有，
+查询 scatter 到所有分片并行检索，再用堆合并各分片的 top-k。
+
+- 分片目录: <db>/shards.json + <db>/shard_XXX/（每个都是普通的 RagDatabase 目录，可单独量化 / 增量更新）
+- 传输: multiprocessing.connection（本机 AF_UNIX / 回环 TCP，跨主机 TCP + authkey）
+- 行号: 全局行号 = 分片 offset + 分片内行号，与切分前的 RagDatabase 一致
+- RagDatabase.load 遇到含 shards.json 的目录会自动返回 ShardedRagDatabase，上层工具无需改动
+
+用法:
+    python -m tools.sharded_rag_database partition tools/rag_big.db tools/rag_big_sharded.db --shards 8
+    # 跨主机：在各主机上启动分片服务，并在 shards.json 中写入 "addresses": ["host1:7001", ...]
+    RAG_SHARD_AUTHKEY=secret python -m tools.sharded_rag_database serve tools/rag_big_sharded.db/shard_000 --port 7001
+"""
+
+SHARDS_MANIFEST = "shards.json"
+AUTHKEY_ENV = "RAG_SHARD_AUTHKEY"
+
+
+# ========= 分片进程 =========
+def _dispatch(request, db: RagDatabase, offset: int):
+    op = request[0]
+    if op == "search":
+        _, query, top_k, filter = request
+        idxs, scores = db.retrieve_index_and_similarity(query, top_k, filter=filter)
+        idxs = idxs.tolist()
+        rows = [{k: v[i] for k, v in db.columns.items()} for i in idxs]
+        return [(float(s), offset + i, row) for s, i, row in zip(scores.tolist(), idxs, rows)]
+    if op == "filter_rows":
+        return {offset + row for row in db.filter_rows(request[1])}
+    if op == "columns":
+        return db.columns
+    if op == "info":
+        return {"rows": db.num_rows, "live": len(db), "offset": offset, "quantization": db.quantization}
+    raise ValueError(f"Unknown shard request '{op}'")
+
+
+def _handle_client(conn, db: RagDatabase, offset: int):
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                return
+            if request[0] == "close":
+                conn.send(True)
+                return
+            # 单个请求出错（过滤列不存在、未知操作符、结果无法序列化……）只回传异常，连接保持可用；
+            # send 先完成序列化再写入，序列化失败时连接上不会留下半条消息
+            try:
+                conn.send(_dispatch(request, db, offset))
+            except Exception as e:
+                try:
+                    conn.send(e)
+                except Exception:  # 异常本身无法序列化
+                    conn.send(RuntimeError(f"{type(e).__name__}: {e}"))
+
+
+def serve_shard(shard_dir: str, address: Union[str, Tuple[str, int]], authkey: bytes,
+                quantization: Optional[str] = "auto", ready_file: Optional[str] = None):
+    """加载一个分片并在 address 上提供检索服务；ready_file 给定时开始监听后把实际地址写入该文件（JSON）"""
+    with open(os.path.join(shard_dir, "shard.json")) as f:
+        offset = json.load(f)["offset"]
+    db = RagDatabase.load(shard_dir, None, quantization=quantization)
+    family = "AF_UNIX" if isinstance(address, str) else "AF_INET"
+    with Listener(address, family=family, authkey=authkey) as listener:
+        if ready_file is not None:
+            tmp = ready_file + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(listener.address, f)
+            os.replace(tmp, ready_file)
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle_client, args=(conn, db, offset), daemon=True).start()
+
+
+class _ShardClient:
+    """到一个分片的连接（Connection 不是线程安全的，请求串行化）"""
+
+    def __init__(self, address, authkey: bytes, process=None):
+        self.address = address
+        self.process = process
+        self._conn = Client(address, authkey=authkey)
+        self._lock = threading.Lock()
+
+    def request(self, *message):
+        with self._lock:
+            self._conn.send(message)
+            reply = self._conn.recv()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def close(self):
+        try:
+            self.request("close")
+            self._conn.close()
+        except (EOFError, OSError):
+            pass
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.remove(self.address)  # 被 terminate 的分片进程来不及清理自己的 socket 文件
+                try:
+                    os.rmdir(os.path.dirname(self.address))  # _spawn_local 的临时目录，最后一个分片关闭时删除
+                except OSError:
+                    pass
+
+
+def _parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+
+# ========= 客户端 =========
+class ShardedRagDatabase:
+    """
+    与 RagDatabase 检索接口一致（retrieve_index_and_similarity / retrieve_with_similarity / retrieve），
+    可直接交给 RAGRetriever。
+    """
+
+    def __init__(self, embedding_model, clients: List[_ShardClient]):
+        self.embedding_model = embedding_model
+        self._clients = clients
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(clients)), thread_name_prefix="rag-shard")
+        self._columns: Optional[Dict[str, List]] = None
+        self._closed = False
+        atexit.register(self.close)
+
+    # ----- 启动 / 连接 -----
+    @classmethod
+    def load(cls, load_dir: str, embedding_model, quantization: Optional[str] = "auto",
+             authkey: Optional[bytes] = None, **_):
+        """
+        读取 shards.json：有 "addresses" 时连接已运行的分片服务（authkey 缺省取环境变量 RAG_SHARD_AUTHKEY），
+        否则在本机为每个分片启动一个进程。
+        """
+        with open(os.path.join(load_dir, SHARDS_MANIFEST)) as f:
+            manifest = json.load(f)
+        addresses = manifest.get("addresses")
+        if addresses:
+            authkey = authkey or os.environ.get(AUTHKEY_ENV, "").encode()
+            clients = [_ShardClient(_parse_address(a), authkey) for a in addresses]
+        else:
+            clients = cls._spawn_local(
+                [os.path.join(load_dir, s["dir"]) for s in manifest["shards"]], quantization
+            )
+        return cls(embedding_model, clients)
+
+    @staticmethod
+    def _spawn_local(shard_dirs: List[str], quantization: Optional[str],
+                     startup_timeout: float = 600.0) -> List[_ShardClient]:
+        """
+        每个分片用独立的 `python -m tools.sharded_rag_database serve` 子进程持有。
+        不使用 multiprocessing：spawn 子进程会重新执行父进程的主脚本（main_adv*.py 没有 __main__ 保护），
+        导致每个分片进程重跑整个攻击脚本并在启动阶段退出。authkey 通过环境变量传递，不出现在命令行中。
+        """
+        authkey = secrets.token_hex(16)
+        env = dict(os.environ, **{AUTHKEY_ENV: authkey})
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (repo_root, env.get("PYTHONPATH")) if p)
+        family_unix = hasattr(socket, "AF_UNIX")
+        run_dir = tempfile.mkdtemp(prefix=f"rag-shards-{os.getpid()}-")
+        launched = []
+        for i, shard_dir in enumerate(shard_dirs):
+            ready_file = os.path.join(run_dir, f"shard-{i}.ready")
+            command = [sys.executable, "-m", "tools.sharded_rag_database", "serve", os.path.abspath(shard_dir),
+                       "--quantization", "none" if quantization is None else quantization,
+                       "--ready-file", ready_file]
+            command += ["--socket", os.path.join(run_dir, f"shard-{i}.sock")] if family_unix \
+                else ["--host", "127.0.0.1", "--port", "0"]
+            launched.append((ready_file, subprocess.Popen(command, env=env, cwd=repo_root)))
+
+        # 所有分片并行加载，依次等待就绪
+        clients = []
+        deadline = time.monotonic() + startup_timeout
+        try:
+            for i, (ready_file, process) in enumerate(launched):
+                while not os.path.exists(ready_file):
+                    if process.poll() is not None:
+                        raise RuntimeError(f"Shard process rag-shard-{i} exited during startup "
+                                           f"(exit code {process.returncode})")
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Shard process rag-shard-{i} not ready after {startup_timeout:.0f}s")
+                    time.sleep(0.05)
+                with open(ready_file) as f:
+                    address = json.load(f)
+                os.remove(ready_file)
+                address = address if isinstance(address, str) else tuple(address)
+                clients.append(_ShardClient(address, authkey.encode(), process=process))
+        except Exception:
+            for client in clients:
+                client.close()
+            for _, process in launched[len(clients):]:
+                process.kill()
+            raise
+        return clients
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for client in self._clients:
+            client.close()
+        self._pool.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----- 信息 -----
+    def shard_info(self) -> List[Dict[str, Any]]:
+        return list(self._pool.map(lambda c: c.request("info"), self._clients))
+
+    def __len__(self) -> int:
+        return sum(info["live"] for info in self.shard_info())
+
+    @property
+    def columns(self) -> Dict[str, List]:
+        """全部分片的列按全局行号拼接（首次访问时从各分片拉取，用于离线分析）"""
+        if self._columns is None:
+            merged: Dict[str, List] = {}
+            for shard_columns in self._pool.map(lambda c: c.request("columns"), self._clients):
+                n_before = len(next(iter(merged.values()), []))
+                n_shard = len(next(iter(shard_columns.values()), []))
+                for k in shard_columns:
+                    merged.setdefault(k, [None] * n_before)
+                for k, values in merged.items():
+                    values.extend(shard_columns.get(k, [None] * n_shard))
+            self._columns = merged
+        return self._columns
+
+    # ----- 检索 -----
+    def _encode_query(self, query: Union[str, torch.Tensor]) -> torch.Tensor:
+        if isinstance(query, str):
+            with REGISTRY.timer("embedding_encode_seconds", "查询向量编码耗时", source="sharded_rag_database"):
+                query = self.embedding_model.encode(query, convert_to_tensor=True)
+        return query.detach().cpu()
+
+    def _search(self, query: Union[str, torch.Tensor], top_k: int,
+                filter: Optional[Dict] = None) -> List[Tuple[float, int, Dict[str, Any]]]:
+        """filter 在各分片内编译并应用（dict 条件；callable 需可被 pickle）"""
+        query = self._encode_query(query)
+        with REGISTRY.timer("dense_search_seconds", "向量库相似度扫描 + topk 耗时", source="sharded_rag_database"):
+            per_shard = list(self._pool.map(lambda c: c.request("search", query, top_k, filter), self._clients))
+            return heapq.nlargest(top_k, (hit for hits in per_shard for hit in hits), key=lambda hit: hit[0])
+
+    def retrieve_index_and_similarity(
+        self, query: Union[str, torch.Tensor], top_k: int = 4, filter: Optional[Dict] = None
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        hits = self._search(query, top_k, filter)
+        return (torch.tensor([h[1] for h in hits], dtype=torch.long),
+                torch.tensor([h[0] for h in hits], dtype=torch.float32))
+
+    def retrieve_with_similarity(
+        self, query: Union[str, torch.Tensor], top_k: int = 4, return_index=False, filter: Optional[Dict] = None
+    ):
+        hits = self._search(query, top_k, filter)
+        keys = list(hits[0][2]) if hits else []
+        result = {k: [h[2].get(k) for h in hits] for k in keys}
+        scores = torch.tensor([h[0] for h in hits], dtype=torch.float32)
+        idxs = torch.tensor([h[1] for h in hits], dtype=torch.long)
+        return (result, scores, idxs) if return_index else (result, scores)
+
+    def retrieve(self, query, top_k=4, filter: Optional[Dict] = None):
+        docs, _ = self.retrieve_with_similarity(query, top_k, filter=filter)
+        return docs
+
+    def filter_rows(self, filter: Dict) -> set:
+        """满足条件的全局行号"""
+        return set().union(*self._pool.map(lambda c: c.request("filter_rows", filter), self._clients))
+
+
+# ========= 切分 =========
+def partition_rag_database(load_dir: str, out_dir: str, num_shards: int,
+                           addresses: Optional[List[str]] = None) -> str:
+    """把一个 RagDatabase 目录按连续行区间切成 num_shards 个分片目录，并写出 shards.json"""
+    db = RagDatabase.load(load_dir, None, quantization=None)
+    n = db.num_rows
+    os.makedirs(out_dir, exist_ok=True)
+    bounds = [round(i * n / num_shards) for i in range(num_shards + 1)]
+    shards = []
+    for i, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        name = f"shard_{i:03d}"
+        shard_dir = os.path.join(out_dir, name)
+        tombstones = [r - start for r in db._tombstones if start <= r < end]
+        RagDatabase(
+            None, db.primary_key_embeddings[start:end].clone(),
+            {k: v[start:end] for k, v in db.columns.items()},
+            id_column=db.id_column, tombstones=tombstones,
+        ).save(shard_dir)
+        with open(os.path.join(shard_dir, "shard.json"), "w") as f:
+            json.dump({"index": i, "offset": start, "rows": end - start}, f)
+        shards.append({"dir": name, "offset": start, "rows": end - start})
+    manifest: Dict[str, Any] = {"num_rows": n, "shards": shards}
+    if addresses:
+        manifest["addresses"] = addresses
+    with open(os.path.join(out_dir, SHARDS_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded RagDatabase: partition a database or serve one shard")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("partition", help="把 RagDatabase 目录切分为分片目录")
+    p.add_argument("src")
+    p.add_argument("out")
+    p.add_argument("--shards", type=int, required=True)
+    p.add_argument("--addresses", nargs="*", help="各分片服务地址 host:port（跨主机部署时写入 shards.json）")
+    s = sub.add_parser("serve", help="在 TCP 端口或 Unix socket 上提供一个分片的检索服务（authkey 取自环境变量 RAG_SHARD_AUTHKEY）")
+    s.add_argument("shard_dir")
+    s.add_argument("--host", default="0.0.0.0")
+    listen = s.add_mutually_exclusive_group(required=True)
+    listen.add_argument("--port", type=int, help="TCP 端口（0 表示由系统分配）")
+    listen.add_argument("--socket", help="Unix socket 路径（本机分片）")
+    s.add_argument("--quantization", default="auto")
+    s.add_argument("--ready-file", help="开始监听后把实际地址写入该文件")
+    args = parser.parse_args()
+
+    if args.command == "partition":
+        print(f"Partitioned into {partition_rag_database(args.src, args.out, args.shards, args.addresses)}")
+    else:
+        authkey = os.environ.get(AUTHKEY_ENV)
+        if not authkey:
+            parser.error(f"set {AUTHKEY_ENV} to the shared authkey before serving a shard")
+        quantization = None if args.quantization == "none" else args.quantization
+        address = args.socket if args.socket else (args.host, args.port)
+        print(f"Serving {args.shard_dir} on {address}")
+        serve_shard(args.shard_dir, address, authkey.encode(), quantization, ready_file=args.ready_file)
+
+
+if __name__ == "__main__":
+    main()
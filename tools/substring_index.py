@@ -0,0 +1,75 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+"""
+模拟 SQL `WHERE a LIKE '%q%' OR b LIKE '%q%' ...` 的内存子串索引（Pokemon 招式 / 道具、钓鱼邮件、HR 邮件工具共用）：
+- 构建时把每行参与匹配的字段小写化后用分隔符拼接，每次查询不再对全部行逐字段 lower()
+- 行级 n-gram 倒排表（n = 1..3，按行号升序）：短查询直接命中倒排表，长查询沿最稀有的三元组候选逐行校验
+- 候选按行号顺序产出，满 limit 条即停止，与原先"全表过滤后取前 5 条"的结果与顺序一致
+"""
+
+SEPARATOR = "\x00"  # 不含该字符的查询不可能跨字段命中
+
+
+class SubstringIndex:
+    """rows: 表中的行（dict）；fields: 参与 LIKE 匹配的列名"""
+
+    def __init__(self, rows: Sequence[Dict[str, Any]], fields: Sequence[str], max_gram: int = 3):
+        self.rows = list(rows)
+        self.fields = tuple(fields)
+        self.max_gram = max_gram
+        self._fields_lower: List[List[str]] = []
+        self._texts: List[str] = []
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for row_id, row in enumerate(self.rows):
+            values = [row[f].lower() for f in self.fields]
+            text = SEPARATOR.join(values)
+            self._fields_lower.append(values)
+            self._texts.append(text)
+            grams = set(text)
+            for n in range(2, max_gram + 1):
+                grams.update(map("".join, zip(*(text[k:] for k in range(n)))))
+            for gram in grams:
+                if SEPARATOR not in gram:
+                    postings[gram].append(row_id)
+        self._postings = dict(postings)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _candidates(self, query: str) -> Sequence[int]:
+        if len(query) <= self.max_gram:
+            return self._postings.get(query, ())
+        n = self.max_gram
+        shortest = None
+        for i in range(len(query) - n + 1):
+            posting = self._postings.get(query[i:i + n])
+            if posting is None:
+                return ()
+            if shortest is None or len(posting) < len(shortest):
+                shortest = posting
+        return shortest
+
+    def search_ids(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """命中行号（升序），最多 limit 条"""
+        query = query.lower()
+        if limit is not None and limit <= 0:
+            return []
+        if not query:
+            # '' 被任何字符串包含
+            return list(range(len(self.rows) if limit is None else min(limit, len(self.rows))))
+        if SEPARATOR in query:
+            # 查询本身含分隔符时退回逐字段匹配，避免跨字段误命中
+            hits = (i for i, values in enumerate(self._fields_lower) if any(query in v for v in values))
+        else:
+            exact = len(query) <= self.max_gram   # 倒排表本身即为精确结果
+            hits = (i for i in self._candidates(query) if exact or query in self._texts[i])
+        result = []
+        for row_id in hits:
+            result.append(row_id)
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [self.rows[i] for i in self.search_ids(query, limit)]